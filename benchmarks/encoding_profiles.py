@@ -0,0 +1,83 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# >>
+#     vivint-selenium-docker, 2017
+# <<
+""" Compare the cost of recording with each encoding profile.
+
+For every profile a video driver is started, the container's CPU time is
+measured while the browser idles on a page without recording and again
+while recording for the same amount of time. The difference is the cost of
+the encoder; the size of the recorded file gives the disk and export cost.
+
+Usage::
+
+    python benchmarks/encoding_profiles.py [--seconds 30] [--url URL]
+"""
+
+from __future__ import print_function
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from selenium_docker.base import ContainerFactory
+from selenium_docker.drivers import VideoDriver
+from selenium_docker.drivers.chrome import ChromeVideoDriver
+from selenium_docker.video import PROFILES
+
+
+def cpu_seconds(container):
+    """ Total CPU time used by the container so far. """
+    stats = container.stats(stream=False)
+    return stats['cpu_stats']['cpu_usage']['total_usage'] / 1e9
+
+
+def measure(driver, seconds):
+    start = cpu_seconds(driver.container)
+    time.sleep(seconds)
+    return cpu_seconds(driver.container) - start
+
+
+def benchmark(name, url, seconds, folder):
+    driver = ChromeVideoDriver(
+        folder, profile=name, segment_time=VideoDriver.SEGMENT_PER_TASK)
+    try:
+        driver.get(url)
+        idle = measure(driver, seconds)
+        driver.start_segment()
+        recording = measure(driver, seconds)
+        driver.stop_segment()
+        paths = driver.fetch_segments(folder, shard_by_date=False)
+        size = sum(os.path.getsize(p) for p in paths)
+    finally:
+        driver.quit()
+    per_minute = 60.0 / seconds
+    return (recording - idle) * per_minute, size * per_minute
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--seconds', type=float, default=30.0,
+                        help='length of each measurement')
+    parser.add_argument('--url', default='https://www.python.org',
+                        help='page shown while recording')
+    parser.add_argument('profiles', nargs='*', default=sorted(PROFILES),
+                        help='profiles to compare, defaults to all')
+    args = parser.parse_args()
+
+    ContainerFactory.get_default_factory('benchmark')
+    folder = tempfile.mkdtemp()
+    print('%-10s %18s %18s' % ('profile', 'cpu sec/min', 'MB/min'))
+    try:
+        for name in args.profiles:
+            cpu, size = benchmark(name, args.url, args.seconds, folder)
+            print('%-10s %18.2f %18.2f' % (name, cpu, size / 1024.0 ** 2))
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == '__main__':
+    main()
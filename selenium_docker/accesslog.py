@@ -0,0 +1,695 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# >>
+#   Copyright 2018 Vivint, inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+#    vivint-selenium-docker, 20017
+# <<
+
+import math
+import time
+from collections import namedtuple
+from datetime import datetime
+from logging import getLogger
+
+import gevent
+from six.moves.urllib.parse import urlparse
+
+from selenium_docker import __version__
+from selenium_docker.meta import config
+from selenium_docker.proxy import ACCESS_LOG, site_key
+
+__all__ = [
+    'AccessLog',
+    'HarCapture',
+    'Histogram',
+    'LogEntry',
+    'Tracker',
+    'TrafficStats',
+    'parse_entry'
+]
+
+OTHER = '(other)'
+"""str: key aggregating the domains or clients over the tracking limit."""
+
+
+class LogEntry(namedtuple('LogEntry', [
+        'timestamp', 'elapsed', 'client', 'cache_status', 'status', 'size',
+        'method', 'url', 'peer', 'content_type'])):
+    """ A request from Squid's access log, in its native format.
+
+    Attributes:
+        timestamp (float): UNIX timestamp when the response was finished.
+        elapsed (int): milliseconds spent on the request.
+        client (str): IP address of the browser.
+        cache_status (str): Squid result code, ie. ``TCP_MISS`` or
+            ``TCP_MEM_HIT``.
+        status (int): HTTP status code sent to the browser.
+        size (int): bytes sent to the browser.
+        method (str): HTTP method.
+        url (str): requested URL, ``host:port`` for tunnels.
+        peer (str): hierarchy code and server the response came from.
+        content_type (str): ``Content-Type`` of the response.
+    """
+    __slots__ = ()
+
+    @property
+    def host(self):
+        """str: host name of the request. """
+        if '://' not in self.url:
+            return self.url.rsplit(':', 1)[0]
+        return urlparse(self.url).hostname or ''
+
+    @property
+    def started(self):
+        """float: UNIX timestamp when the request was received. """
+        return self.timestamp - self.elapsed / 1000.0
+
+    @property
+    def is_hit(self):
+        """bool: the response came from the cache. """
+        return 'HIT' in self.cache_status
+
+
+def parse_entry(line):
+    """ Parse a line of a Squid access log in the native format.
+
+    Args:
+        line (str): the log line.
+
+    Returns:
+        :obj:`.LogEntry`: or ``None`` when the line can't be parsed.
+    """
+    fields = line.split()
+    if len(fields) < 10:
+        return None
+    try:
+        cache_status, _, status = fields[3].partition('/')
+        return LogEntry(float(fields[0]), int(fields[1]), fields[2],
+                        cache_status, int(status or 0), int(fields[4]),
+                        fields[5], fields[6], fields[8], fields[9])
+    except ValueError:
+        return None
+
+
+class Histogram(object):
+    """ Distribution of values kept in constant memory.
+
+    Values are counted in buckets growing exponentially by ``precision``,
+    percentiles are accurate to that relative error. Values below ``1`` are
+    counted as ``0``.
+
+    Args:
+        precision (float): relative width of the buckets.
+    """
+
+    def __init__(self, precision=0.05):
+        self.precision = precision
+        self.count = 0  # type: int
+        self.total = 0.0  # type: float
+        self.max = 0.0  # type: float
+        self._base = math.log(1.0 + precision)
+        self._buckets = {}  # type: dict[int, int]
+
+    def __repr__(self):
+        return '<Histogram(count=%d,p50=%s,p99=%s)>' % (
+            self.count, self.percentile(50), self.percentile(99))
+
+    def add(self, value, count=1):
+        """ Count a value.
+
+        Args:
+            value (float): a positive number.
+            count (int): times the value was seen.
+
+        Returns:
+            None
+        """
+        index = 0 if value < 1 else int(math.log(value) / self._base) + 1
+        self._buckets[index] = self._buckets.get(index, 0) + count
+        self.count += count
+        self.total += value * count
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        """ Add the values counted by another histogram of the same
+        precision.
+
+        Returns:
+            None
+        """
+        for index, count in other._buckets.items():
+            self._buckets[index] = self._buckets.get(index, 0) + count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent):
+        """ Value below which ``percent`` of the values fall.
+
+        Args:
+            percent (float): from ``0`` to ``100``.
+
+        Returns:
+            float: ``None`` when no values were counted.
+        """
+        if not self.count:
+            return None
+        target = max(1, int(math.ceil(percent / 100.0 * self.count)))
+        seen = 0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen >= target:
+                break
+        if index == 0:
+            return 0.0
+        return min(round(math.exp(index * self._base), 3), self.max)
+
+    @property
+    def mean(self):
+        """float: average of the values, ``None`` without values. """
+        return self.total / self.count if self.count else None
+
+
+class TrafficStats(object):
+    """ Aggregate of the requests of a domain, driver or task.
+
+    Attributes:
+        requests (int): number of requests.
+        bytes (int): bytes sent to the browsers.
+        hits (int): requests answered from the cache.
+        errors (int): requests that failed or got an error status.
+        cache_status (dict): requests by Squid result code.
+        latency (:obj:`.Histogram`): milliseconds spent on the requests.
+    """
+
+    def __init__(self):
+        self.requests = 0  # type: int
+        self.bytes = 0  # type: int
+        self.hits = 0  # type: int
+        self.errors = 0  # type: int
+        self.cache_status = {}  # type: dict[str, int]
+        self.latency = Histogram()
+
+    def __repr__(self):
+        return '<TrafficStats(requests=%d,bytes=%d)>' % (
+            self.requests, self.bytes)
+
+    def add(self, entry):
+        """ Count a request.
+
+        Args:
+            entry (:obj:`.LogEntry`): the request.
+
+        Returns:
+            None
+        """
+        self.requests += 1
+        self.bytes += entry.size
+        self.hits += entry.is_hit
+        self.errors += entry.status == 0 or entry.status >= 400
+        self.cache_status[entry.cache_status] = \
+            self.cache_status.get(entry.cache_status, 0) + 1
+        self.latency.add(entry.elapsed)
+
+    def merge(self, other):
+        """ Add the requests counted by another aggregate.
+
+        Returns:
+            None
+        """
+        self.requests += other.requests
+        self.bytes += other.bytes
+        self.hits += other.hits
+        self.errors += other.errors
+        for status, count in other.cache_status.items():
+            self.cache_status[status] = \
+                self.cache_status.get(status, 0) + count
+        self.latency.merge(other.latency)
+
+    @property
+    def hit_ratio(self):
+        """float: fraction of the requests answered from the cache. """
+        return float(self.hits) / self.requests if self.requests else 0.0
+
+    def as_dict(self):
+        """ JSON compatible summary.
+
+        Returns:
+            dict
+        """
+        return {
+            'requests': self.requests,
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'hit_ratio': self.hit_ratio,
+            'errors': self.errors,
+            'cache_status': dict(self.cache_status),
+            'latency_ms': {
+                'mean': self.latency.mean,
+                'p50': self.latency.percentile(50),
+                'p90': self.latency.percentile(90),
+                'p99': self.latency.percentile(99),
+                'max': self.latency.max
+            }
+        }
+
+
+def _count(table, key, entry, limit):
+    """ Add ``entry`` to the aggregate of ``key``, keys over ``limit`` are
+    counted together under :data:`.OTHER`. """
+    stats = table.get(key)
+    if stats is None:
+        if len(table) >= limit:
+            key = OTHER
+        stats = table.setdefault(key, TrafficStats())
+    stats.add(entry)
+
+
+class Tracker(object):
+    """ Requests of a single browser while it runs a task, see
+    :func:`.AccessLog.track`.
+
+    Attributes:
+        client (str): IP address of the browser.
+        total (:obj:`.TrafficStats`): every request of the task.
+        domains (dict): :obj:`.TrafficStats` by site.
+        since (float): UNIX timestamp when the task started, requests the
+            proxy received earlier aren't part of it.
+        until (float): UNIX timestamp when the task finished, set by
+            :func:`.AccessLog.untrack` unless it's set when the task
+            returns.
+    """
+
+    MAX_DOMAINS = 50
+    """int: sites tracked separately for a task."""
+
+    def __init__(self, client):
+        self.client = client
+        self.total = TrafficStats()
+        self.domains = {}  # type: dict[str, TrafficStats]
+        self.since = None  # type: float
+        self.until = None  # type: float
+
+    def covers(self, entry):
+        """ The proxy received the request while the task was running.
+
+        Args:
+            entry (:obj:`.LogEntry`):
+
+        Returns:
+            bool
+        """
+        started = entry.started
+        return ((self.since is None or started >= self.since) and
+                (self.until is None or started <= self.until))
+
+    def add(self, entry):
+        self.total.add(entry)
+        _count(self.domains, site_key(entry.host), entry, self.MAX_DOMAINS)
+
+    def summary(self):
+        """ JSON compatible summary of the task's traffic.
+
+        Returns:
+            dict: :func:`.TrafficStats.as_dict` of every request with a
+            ``domains`` mapping of the same summary by site.
+        """
+        summary = self.total.as_dict()
+        summary['domains'] = dict(
+            (site, stats.as_dict()) for site, stats in self.domains.items())
+        return summary
+
+
+def _isoformat(timestamp):
+    """ UNIX timestamp as an ISO 8601 UTC date with milliseconds. """
+    moment = datetime.utcfromtimestamp(timestamp)
+    return '%s.%03dZ' % (moment.strftime('%Y-%m-%dT%H:%M:%S'),
+                         moment.microsecond // 1000)
+
+
+class HarCapture(Tracker):
+    """ Requests of a browser during a task, kept for a HAR log.
+
+    Only what the access log records is available: there are no headers,
+    cookies or bodies and the whole time of a request is reported as its
+    ``wait`` timing. Tunneled HTTPS requests appear as a single ``CONNECT``
+    entry for the whole connection.
+
+    Entries past ``max_entries``, or once the kept entries take about
+    ``max_kb`` kilobytes, are only counted in the summary and ``dropped``.
+
+    Args:
+        client (str): IP address of the browser.
+        max_entries (int): defaults to the ``har_max_entries`` setting.
+        max_kb (int): defaults to the ``har_max_kb`` setting.
+
+    Attributes:
+        entries (list(:obj:`.LogEntry`)): the kept requests.
+        dropped (int): requests over the limits.
+        started (float): UNIX timestamp when the capture started.
+    """
+
+    ENTRY_SIZE = 512
+    """int: approximate bytes of a HAR entry without its variable fields."""
+
+    def __init__(self, client, max_entries=None, max_kb=None):
+        super(HarCapture, self).__init__(client)
+        if max_entries is None:
+            max_entries = config.har_max_entries
+        if max_kb is None:
+            max_kb = config.har_max_kb
+        self.max_entries = int(max_entries)
+        self.max_bytes = int(max_kb) * 1024
+        self.entries = []  # type: list[LogEntry]
+        self.dropped = 0  # type: int
+        self.started = time.time()
+        self._size = 0
+
+    def add(self, entry):
+        super(HarCapture, self).add(entry)
+        size = self.ENTRY_SIZE + len(entry.url) + len(entry.content_type)
+        if len(self.entries) >= self.max_entries or \
+                self._size + size > self.max_bytes:
+            self.dropped += 1
+            return
+        self._size += size
+        self.entries.append(entry)
+
+    def har(self, page=None):
+        """ The kept requests as a HAR 1.2 log.
+
+        Args:
+            page (str): identifier of the page the entries belong to,
+                usually the task's.
+
+        Returns:
+            dict: JSON compatible HAR document, requests over the limits
+            are counted in the ``_dropped`` field of the log.
+        """
+        page = page or self.client
+        entries = sorted(self.entries, key=lambda e: e.started)
+        started = min([self.started] + [e.started for e in entries])
+        return {'log': {
+            'version': '1.2',
+            'creator': {'name': 'selenium-docker', 'version': __version__},
+            'pages': [{
+                'id': page,
+                'title': page,
+                'startedDateTime': _isoformat(started),
+                'pageTimings': {}
+            }],
+            'entries': [self._har_entry(e, page) for e in entries],
+            '_dropped': self.dropped
+        }}
+
+    @staticmethod
+    def _har_entry(entry, page):
+        headers = []
+        if entry.content_type != '-':
+            headers.append({'name': 'Content-Type',
+                            'value': entry.content_type})
+        server = entry.peer.partition('/')[2]
+        har = {
+            'pageref': page,
+            'startedDateTime': _isoformat(entry.started),
+            'time': entry.elapsed,
+            'request': {
+                'method': entry.method,
+                'url': entry.url,
+                'httpVersion': 'HTTP/1.1',
+                'cookies': [],
+                'headers': [],
+                'queryString': [],
+                'headersSize': -1,
+                'bodySize': -1
+            },
+            'response': {
+                'status': entry.status,
+                'statusText': '',
+                'httpVersion': 'HTTP/1.1',
+                'cookies': [],
+                'headers': headers,
+                'content': {
+                    'size': entry.size,
+                    'mimeType': headers[0]['value'] if headers else ''
+                },
+                'redirectURL': '',
+                'headersSize': -1,
+                'bodySize': entry.size
+            },
+            'cache': {},
+            'timings': {'send': 0, 'wait': entry.elapsed, 'receive': 0},
+            '_cacheStatus': entry.cache_status
+        }
+        if server and server != '-':
+            har['serverIPAddress'] = server
+        return har
+
+
+class AccessLog(object):
+    """ Follow the access logs of proxy containers and aggregate their
+    requests by domain and by browser.
+
+    Memory use doesn't grow with the number of requests: only counters and
+    latency histograms are kept, for at most ``max_keys`` domains and
+    clients each.
+
+    Browsers are identified by their IP address, which is only unique per
+    driver when the factory uses a network. Otherwise every request comes
+    from the address of the Docker host.
+
+    Args:
+        proxy (:obj:`~selenium_docker.proxy.SquidProxy` or
+            :obj:`~selenium_docker.proxy.ProxyPool`): proxies to follow.
+        max_keys (int): domains and clients aggregated separately.
+        logger (:obj:`logging.Logger`):
+
+    Example::
+
+        log = AccessLog(proxy).start()
+        ...
+        for site, stats in log.top(10):
+            print(site, stats.bytes, stats.latency.percentile(95))
+    """
+
+    BACKLOG = 1000
+    """int: older lines a reader starts with, so a restarted reader still
+    counts the requests logged while it was down. Lines from before the
+    first reader started or already read are skipped, a longer gap loses
+    the requests before the backlog."""
+
+    COMMAND = 'tail -F -n %d %s' % (BACKLOG, ACCESS_LOG)
+    """str: command streaming log lines from inside the container."""
+
+    POLL_INTERVAL = 2.0
+    """float: seconds between checks for replaced proxy containers."""
+
+    SETTLE = 0.25
+    """float: seconds to wait for the last requests of a task to be logged
+    before its summary is made. Squid logs a request once its response is
+    complete, after the browser already moved on."""
+
+    def __init__(self, proxy, max_keys=1000, logger=None):
+        self.proxy = proxy
+        self.max_keys = max_keys
+        self.logger = logger or getLogger('%s.AccessLog' % __name__)
+        self.total = TrafficStats()
+        self.domains = {}  # type: dict[str, TrafficStats]
+        self.clients = {}  # type: dict[str, TrafficStats]
+        self._trackers = {}  # type: dict[str, list[Tracker]]
+        self._readers = {}  # type: dict[str, gevent.Greenlet]
+        # timestamp of the last line read from each container and the lines
+        #  read with that timestamp, where a restarted reader resumes.
+        self._positions = {}  # type: dict[str, tuple[float, set]]
+        self._thread = None  # type: gevent.Greenlet
+
+    def __repr__(self):
+        return '<AccessLog(requests=%d,domains=%d,clients=%d)>' % (
+            self.total.requests, len(self.domains), len(self.clients))
+
+    @property
+    def is_running(self):
+        """bool: the logs are being followed. """
+        return self._thread is not None and not self._thread.dead
+
+    def start(self):
+        """ Start following the logs in the background.
+
+        Returns:
+            :obj:`.AccessLog`: this instance.
+        """
+        if not self.is_running:
+            self._thread = gevent.spawn(self._supervise)
+        return self
+
+    def stop(self):
+        """ Stop following the logs, the aggregates are kept.
+
+        Returns:
+            None
+        """
+        if self._thread is not None:
+            self._thread.kill(block=False)
+            self._thread = None
+        gevent.killall(list(self._readers.values()), block=False)
+        self._readers = {}
+
+    def feed(self, line):
+        """ Aggregate a single log line.
+
+        Args:
+            line (str): line of the access log.
+
+        Returns:
+            :obj:`.LogEntry`: or ``None`` when the line was skipped.
+        """
+        entry = parse_entry(line)
+        if entry is None:
+            return None
+        self._add(entry)
+        return entry
+
+    def _add(self, entry):
+        self.total.add(entry)
+        _count(self.domains, site_key(entry.host), entry, self.max_keys)
+        _count(self.clients, entry.client, entry, self.max_keys)
+        for tracker in self._trackers.get(entry.client, ()):
+            if tracker.covers(entry):
+                tracker.add(entry)
+
+    def top(self, count=10, key='bytes'):
+        """ The domains with the most traffic, not counting :data:`.OTHER`.
+
+        Args:
+            count (int): number of domains.
+            key (str): :obj:`.TrafficStats` attribute to sort by.
+
+        Returns:
+            list(tuple(str, :obj:`.TrafficStats`))
+        """
+        ranked = sorted(((site, stats) for site, stats in self.domains.items()
+                         if site != OTHER),
+                        key=lambda kv: getattr(kv[1], key), reverse=True)
+        return ranked[:count]
+
+    def track(self, client, tracker_cls=Tracker, since=None):
+        """ Start collecting the requests of a browser.
+
+        Args:
+            client (str): IP address of the browser.
+            tracker_cls (type): class collecting the requests.
+            since (float): UNIX timestamp when the task started, requests
+                of the browser's previous task that are logged late are
+                left out.
+
+        Returns:
+            :obj:`.Tracker`
+        """
+        tracker = tracker_cls(client)
+        tracker.since = since
+        self._trackers.setdefault(client, []).append(tracker)
+        return tracker
+
+    def untrack(self, tracker, settle=True):
+        """ Stop collecting requests for ``tracker``.
+
+        Only the requests received until ``tracker.until`` are collected,
+        or until now when it isn't set yet. The browser can start its next
+        task while this waits for them to be logged.
+
+        Args:
+            tracker (:obj:`.Tracker`): value returned by
+                :func:`~AccessLog.track`.
+            settle (bool): wait :attr:`~AccessLog.SETTLE` seconds for the
+                last requests to be logged.
+
+        Returns:
+            :obj:`.Tracker`: the same tracker.
+        """
+        if tracker.until is None:
+            tracker.until = time.time()
+        if settle:
+            gevent.sleep(self.SETTLE)
+        trackers = self._trackers.get(tracker.client, [])
+        if tracker in trackers:
+            trackers.remove(tracker)
+        if not trackers:
+            self._trackers.pop(tracker.client, None)
+        return tracker
+
+    def _containers(self):
+        proxies = getattr(self.proxy, 'proxies', None)
+        if proxies is None:
+            proxies = [self.proxy]
+        return [p.container for p in proxies if p.container is not None]
+
+    def _supervise(self):
+        """ Keep a reader running for every current proxy container. """
+        while True:
+            containers = dict((c.id, c) for c in self._containers())
+            for cid in list(self._readers):
+                if cid not in containers or self._readers[cid].dead:
+                    self._readers.pop(cid).kill(block=False)
+            for cid in list(self._positions):
+                if cid not in containers:
+                    del self._positions[cid]
+            for cid, container in containers.items():
+                if cid not in self._readers:
+                    self._readers[cid] = gevent.spawn(self._read, container)
+            gevent.sleep(self.POLL_INTERVAL)
+
+    def _read(self, container):
+        # a new container is read from now on, a restarted reader from
+        #  where the previous one stopped.
+        self._positions.setdefault(container.id, (time.time(), set()))
+        try:
+            out = container.exec_run(self.COMMAND, stream=True)
+            # docker>=3.0 returns a tuple of the exit code and output
+            if isinstance(out, tuple):
+                out = out[1]
+            pending = b''
+            for chunk in out:
+                lines = (pending + chunk).split(b'\n')
+                pending = lines.pop()
+                for line in lines:
+                    self._resume(container.id, line.decode('utf-8', 'replace'))
+        except Exception as e:
+            self.logger.exception(e, exc_info=True)
+
+    def _resume(self, cid, line):
+        """ Aggregate a line read from a container unless it was already
+        read before the reader restarted.
+
+        Args:
+            cid (str): ID of the container.
+            line (str): line of the access log.
+
+        Returns:
+            :obj:`.LogEntry`: or ``None`` when the line was skipped.
+        """
+        entry = parse_entry(line)
+        if entry is None:
+            return None
+        last, seen = self._positions.get(cid, (0.0, set()))
+        if entry.timestamp < last or \
+                (entry.timestamp == last and line in seen):
+            return None
+        if entry.timestamp > last:
+            seen = set()
+        seen.add(line)
+        self._positions[cid] = (entry.timestamp, seen)
+        self._add(entry)
+        return entry
@@ -19,6 +19,7 @@
 # <<
 
 import logging
+import socket
 import time
 from abc import abstractmethod
 from collections import Mapping
@@ -28,10 +29,11 @@ import docker
 import gevent
 from docker.errors import APIError, DockerException, NotFound
 from docker.models.containers import Container
+from gevent.lock import Semaphore
 from six import string_types
 
 from selenium_docker.errors import DockerError, SeleniumDockerException
-from selenium_docker.utils import gen_uuid
+from selenium_docker.utils import gen_uuid, in_container, ip_port
 
 
 def check_engine(fn):
@@ -120,6 +122,16 @@ class ContainerFactory(object):
             default, used as a singleton, when requested via
             :func:`~ContainerFactory.get_default_factory`.
         logger (:obj:`logging.Logger`): logging module Logger instance.
+        use_network (bool): when ``True`` a user-defined bridge network is
+            created for this namespace and every new container is attached
+            to it. Connections are then made directly to the container's IP
+            address instead of through published host ports. When the
+            application itself is running inside a container it will be
+            connected to the same network.
+        dns (bool or dict): when set a caching DNS resolver is started with
+            the first container and every other container of the factory
+            uses it as its name server. A mapping is passed as keyword
+            arguments to :obj:`~selenium_docker.dns.DnsCache`.
     """
 
     DEFAULT = None
@@ -131,11 +143,20 @@ class ContainerFactory(object):
     :func:`~ContainerFactory.get_default_factory`. 
     """
 
-    __slots__ = ('_containers', '_engine', '_ns', 'logger')
+    __slots__ = ('_containers', '_dns', '_dns_kw', '_dns_lock', '_engine',
+                 '_network', '_ns', '_use_network', 'logger')
 
-    def __init__(self, engine, namespace, make_default=True, logger=None):
+    def __init__(self, engine, namespace, make_default=True, logger=None,
+                 use_network=False, dns=False):
         self._containers = {}
+        self._dns = None
+        self._dns_kw = None  # type: dict
+        if dns:
+            self._dns_kw = dict(dns) if isinstance(dns, Mapping) else {}
+        self._dns_lock = Semaphore()
         self._engine = engine or docker.from_env()
+        self._network = None
+        self._use_network = use_network
         self._ns = namespace or gen_uuid(10)
         self.logger = logger or logging.getLogger(
             '%s.ContainerFactory.%s' % (__name__, self._ns))
@@ -148,6 +169,9 @@ class ContainerFactory(object):
             #  tracked containers back from the environment
             self._containers = self.get_namespace_containers(namespace)
 
+        if use_network:
+            self.create_network()
+
     def __repr__(self):
         return '<ContainerFactory(docker=%s,ns=%s,count=%d)>' % (
             self._engine.api.base_url, self._ns, len(self._containers.keys()))
@@ -174,6 +198,30 @@ class ContainerFactory(object):
         """
         return self._ns
 
+    @property
+    def network(self):
+        """:obj:`docker.models.networks.Network`: user-defined network
+            shared by this factory's containers, or ``None`` when containers
+            are reached through published host ports.
+        """
+        return self._network
+
+    @property
+    def dns(self):
+        """:obj:`~selenium_docker.dns.DnsCache`: caching resolver used by
+            this factory's containers, started the first time it's needed.
+            ``None`` when the factory was created without ``dns``.
+        """
+        if self._dns_kw is None:
+            return None
+        with self._dns_lock:
+            if self._dns is None:
+                # imported here, the resolver is built on this module
+                from selenium_docker.dns import DnsCache
+                self._dns = DnsCache(factory=self, logger=self.logger,
+                                     **self._dns_kw)
+        return self._dns
+
     def __bootstrap(self, container, **kwargs):
         """ Adds additional attributes and functions to Container instance.
 
@@ -228,8 +276,125 @@ class ContainerFactory(object):
         """
         return 'selenium-%s-%s' % (self._ns, key or gen_uuid(6))
 
+    @check_engine
+    def create_network(self):
+        """ Create, or adopt, the user-defined bridge network for this
+        factory's namespace.
+
+        When the network already exists, for instance from a previous run
+        with the same ``namespace``, it is reused. If the application is
+        running inside a container that container is connected to the
+        network so it can reach the other containers by IP address.
+
+        Raises:
+            :exc:`docker.errors.APIError`:
+                when the network cannot be created or joined.
+
+        Returns:
+            :obj:`docker.models.networks.Network`
+        """
+        name = self.gen_name(key='network')
+        # the ``names`` filter is a partial match, check it exactly
+        found = [n for n in self.docker.networks.list(names=[name])
+                 if n.name == name]
+        if found:
+            self.logger.debug('adopting existing network %s', name)
+            network = found[0]
+        else:
+            self.logger.debug('creating network %s', name)
+            network = self.docker.networks.create(
+                name, driver='bridge', check_duplicate=True,
+                labels={'dynamic': 'true'})
+        self._network = network
+        self.__connect_self(network)
+        return network
+
+    def __connect_self(self, network):
+        """ Attach the container we're running inside of to ``network``.
+
+        Args:
+            network (:obj:`docker.models.networks.Network`): network the
+                managed containers are attached to.
+
+        Returns:
+            bool: ``True`` when we're connected to the network.
+        """
+        if not in_container():
+            return False
+        try:
+            # docker sets the hostname to the short container ID
+            me = self.docker.containers.get(socket.gethostname())
+        except NotFound:
+            self.logger.warning(
+                'cannot find our own container, not joining network')
+            return False
+        if network.name in me.attrs['NetworkSettings']['Networks']:
+            return True
+        self.logger.debug('connecting %s to network %s', me.name, network.name)
+        network.connect(me)
+        return True
+
+    @check_engine
+    def remove_network(self):
+        """ Remove this factory's user-defined network, later containers
+        are reached through published host ports.
+
+        All the containers attached to the network should already be stopped,
+        see :func:`~ContainerFactory.stop_all_containers`.
+
+        Returns:
+            None
+        """
+        self._use_network = False
+        self.__remove_network()
+
+    def __release_network(self):
+        """ Remove the network once none of the namespace's containers are
+        attached to it, :func:`~ContainerFactory.start_container` creates
+        it again for the next container.
+
+        Returns:
+            None
+        """
+        network = self._network
+        if network is None:
+            return
+        try:
+            network.reload()
+        except NotFound:
+            # another factory of the namespace removed it already
+            self._network = None
+            return
+        me = socket.gethostname()
+        others = [c for c in network.containers if not c.id.startswith(me)]
+        if others:
+            # another factory of the namespace is still using it
+            self.logger.debug('network %s still has %d containers',
+                              network.name, len(others))
+            return
+        self.__remove_network()
+
+    def __remove_network(self):
+        network, self._network = self._network, None
+        if network is None:
+            return
+        try:
+            network.reload()
+        except NotFound:
+            self.logger.warning('could not find network %s', network.name)
+            return
+        for c in network.containers:
+            # only our own container should be left behind
+            self.logger.debug('disconnecting %s from network', c.name)
+            network.disconnect(c, force=True)
+        try:
+            network.remove()
+        except NotFound:
+            self.logger.warning('could not find network %s', network.name)
+
     @classmethod
-    def get_default_factory(cls, namespace=None, logger=None):
+    def get_default_factory(cls, namespace=None, logger=None,
+                            use_network=False, dns=False):
         """ Creates a default connection to the local Docker engine.
 
         This ``classmethod`` acts as a singleton. If one hasn't been made it
@@ -248,14 +413,38 @@ class ContainerFactory(object):
                 default factory instance.
             logger (:obj:`logging.Logger`): instance of logger to attach
                 to this factory instance.
+            use_network (bool): attach containers to a dedicated network
+                if we're creating a new default factory instance.
+            dns (bool or dict): run a caching DNS resolver if we're creating
+                a new default factory instance.
 
         Returns:
             :obj:`~.ContainerFactory`: instance to interact with Docker engine.
         """
         if cls.DEFAULT is None:
-            cls(None, namespace, make_default=True, logger=logger)
+            cls(None, namespace, make_default=True, logger=logger,
+                use_network=use_network, dns=dns)
         return cls.DEFAULT
 
+    def ip_port(self, container, port):
+        """ Address used to connect to ``port`` on ``container``.
+
+        References:
+            :func:`selenium_docker.utils.ip_port`
+
+        Args:
+            container (:obj:`~docker.models.containers.Container`): running
+                container created by this factory.
+            port (str): container port in the format ``PORT/PROTOCOL``.
+
+        Returns:
+            tuple(str, int):
+                the published host address and port, or the container's own
+                IP address and port when the factory uses a network.
+        """
+        network = self._network.name if self._network else None
+        return ip_port(container, port, network=network)
+
     @check_engine
     def get_namespace_containers(self, namespace=None):
         """ Glean the running containers from the environment that are
@@ -407,6 +596,20 @@ class ContainerFactory(object):
         kw.update(kwargs)
         kw['name'] = name
 
+        if self._network is None and self._use_network:
+            # removed along with the previous containers
+            self.create_network()
+        if self._network is not None:
+            # talk to the container directly, skip the docker-proxy/NAT hop
+            kw.pop('ports', None)
+            kw['publish_all_ports'] = False
+            kw['network'] = self._network.name
+
+        if self._dns_kw is not None and \
+                kw.get('labels', {}).get('role') != 'dns':
+            # every lookup goes through the shared cache
+            kw.setdefault('dns', [self.dns.ip])
+
         try:
             container = self.docker.containers.run(**kw)
         except DockerException as e:  # pragma: no cover
@@ -420,7 +623,8 @@ class ContainerFactory(object):
 
     @check_engine
     def stop_all_containers(self):
-        """ Remove all containers from this namespace.
+        """ Remove all containers from this namespace, and its network
+        when no other containers are attached to it.
 
         Raises:
             APIError: when there's a problem communicating with
@@ -434,6 +638,7 @@ class ContainerFactory(object):
         self.logger.debug('stopping all containers')
         for name in list(self.containers.keys()):
             self.stop_container(name=name)
+        self.__release_network()
 
     @check_engine
     def stop_container(self, name=None, key=None, timeout=10):
@@ -473,6 +678,9 @@ class ContainerFactory(object):
                 raise DockerError(e)
         else:
             container = self.containers.pop(name)
+        if self._dns is not None and name == self._dns.name:
+            # started again with the next container
+            self._dns = None
         if e is not None:
             # if we couldn't get a reference to the container through our
             #  Factory instance alert that; it means we're leaking Container
@@ -0,0 +1,264 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# >>
+#   Copyright 2018 Vivint, inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+#    vivint-selenium-docker, 20017
+# <<
+
+import io
+import json
+import os
+import time
+from collections import namedtuple
+from logging import getLogger
+
+import gevent
+
+try:
+    import numpy as np
+    from PIL import Image
+except ImportError:  # pragma: no cover
+    np, Image = None, None
+
+__all__ = [
+    'Frame',
+    'FrameCapture',
+    'frame_difference',
+    'to_array'
+]
+
+DIFF_SIZE = (160, 160)
+"""tuple(int, int): frames are shrunk to fit these dimensions before they're
+compared, small changes like a blinking cursor are averaged away."""
+
+
+Frame = namedtuple('Frame', ['index', 'timestamp', 'score', 'filename'])
+"""A captured frame: its number, UNIX timestamp, difference from the previous
+kept frame and file name inside the capture directory."""
+
+
+def to_array(png, size=DIFF_SIZE):
+    """ Decode an image into a small grayscale array for comparisons.
+
+    Args:
+        png (bytes): encoded image.
+        size (tuple(int, int)): maximum width and height of the array.
+
+    Returns:
+        :obj:`numpy.ndarray`
+    """
+    image = Image.open(io.BytesIO(png)).convert('L')
+    image.thumbnail(size)
+    return np.asarray(image, dtype=np.int16)
+
+
+def frame_difference(previous, current):
+    """ Mean absolute pixel difference between two frames.
+
+    Args:
+        previous (:obj:`numpy.ndarray`): array from :func:`.to_array`, or
+            ``None`` when there's no previous frame.
+        current (:obj:`numpy.ndarray`): array from :func:`.to_array`.
+
+    Returns:
+        float: ``0.0`` for identical frames up to ``1.0`` when every pixel
+        went from black to white. Always ``1.0`` without a previous frame
+        or when the frame size changed.
+    """
+    if previous is None or previous.shape != current.shape:
+        return 1.0
+    return float(np.abs(current - previous).mean()) / 255.0
+
+
+class FrameCapture(object):
+    """ Keep screenshots of a driver only when the screen changes.
+
+    The screen is sampled every ``interval`` seconds and a frame is kept when
+    its :func:`.frame_difference` from the last kept frame passes
+    ``threshold``. Kept frames are written to ``path`` as PNG files with a
+    ``timeline.json`` describing them, a fraction of the CPU and storage a
+    video recording needs.
+
+    Requires ``numpy`` and ``Pillow``, install them with
+    ``pip install selenium-docker[capture]``.
+
+    Args:
+        driver (:obj:`~selenium_docker.drivers.DockerDriverBase`): the driver
+            to capture.
+        path (str): directory for the frames, created if needed.
+        interval (float): seconds between samples.
+        threshold (float): minimum difference, from ``0.0`` to ``1.0``, for
+            a frame to be kept.
+        source (str): ``'x11'`` to dump the X display inside the container
+            or ``'webdriver'`` to take WebDriver screenshots. Defaults to the
+            driver's ``CAPTURE_SOURCE``.
+        max_frames (int): stop capturing after keeping this many frames.
+        logger (:obj:`logging.Logger`):
+
+    Example::
+
+        with driver.capture('/tmp/frames') as capture:
+            driver.get('https://python.org')
+            driver.find_element_by_id('submit').click()
+        print(capture.frames)
+    """
+
+    SOURCES = ('x11', 'webdriver')
+    """tuple(str): supported screen sources."""
+
+    commands = {
+        'x11': ('sh -c "xwd -root -display :99 2> /dev/null'
+                ' | convert xwd:- png:- 2> /dev/null"')
+    }
+    """dict: commands run inside the container to dump the screen as PNG."""
+
+    TIMELINE = 'timeline.json'
+    """str: name of the file describing the kept frames."""
+
+    def __init__(self, driver, path, interval=1.0, threshold=0.02,
+                 source=None, max_frames=None, logger=None):
+        if np is None or Image is None:  # pragma: no cover
+            raise RuntimeError(
+                'frame capture requires numpy and Pillow, install '
+                'selenium-docker[capture]')
+        source = source or getattr(driver, 'CAPTURE_SOURCE', 'webdriver')
+        if source not in self.SOURCES:
+            raise ValueError('unknown capture source %s' % source)
+        self.driver = driver
+        self.path = path
+        self.interval = interval
+        self.threshold = threshold
+        self.source = source
+        self.max_frames = max_frames
+        self.logger = logger or getLogger(
+            '%s.FrameCapture.%s' % (__name__, driver.name))
+        self.frames = []  # type: list[Frame]
+        self.samples = 0  # type: int
+        self._last = None
+        self._thread = None  # type: gevent.Greenlet
+
+    def __repr__(self):
+        return '<FrameCapture(%s,source=%s,frames=%d/%d)>' % (
+            self.driver.name, self.source, len(self.frames), self.samples)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def is_capturing(self):
+        """bool: frames are being sampled in the background. """
+        return self._thread is not None and not self._thread.dead
+
+    def start(self):
+        """ Start sampling the screen in the background.
+
+        Returns:
+            :obj:`.FrameCapture`: this instance.
+        """
+        if self.is_capturing:
+            raise RuntimeError('already capturing')
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        self._thread = gevent.spawn(self._loop)
+        return self
+
+    def stop(self):
+        """ Take a final sample, stop capturing and write the timeline.
+
+        Returns:
+            list(:obj:`.Frame`): the kept frames.
+        """
+        if self._thread is not None:
+            self._thread.kill()
+            self._thread = None
+            if self.max_frames is None or \
+                    len(self.frames) < self.max_frames:
+                self._sample()
+        self.write_timeline()
+        return self.frames
+
+    def capture(self, png, timestamp=None):
+        """ Compare a screenshot with the last kept frame, keep it if it
+        changed enough.
+
+        Args:
+            png (bytes): encoded screenshot.
+            timestamp (float): UNIX timestamp of the screenshot.
+
+        Returns:
+            :obj:`.Frame`: the new frame, or ``None`` if it was dropped.
+        """
+        self.samples += 1
+        current = to_array(png)
+        score = frame_difference(self._last, current)
+        if score < self.threshold:
+            return None
+        frame = Frame(len(self.frames), timestamp or time.time(), score,
+                      '%05d.png' % len(self.frames))
+        with open(os.path.join(self.path, frame.filename), 'wb') as f:
+            f.write(png)
+        self._last = current
+        self.frames.append(frame)
+        return frame
+
+    def write_timeline(self):
+        """ Write ``timeline.json`` describing the kept frames.
+
+        Returns:
+            str: path of the timeline.
+        """
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        timeline = os.path.join(self.path, self.TIMELINE)
+        with open(timeline, 'w') as f:
+            json.dump({
+                'driver': self.driver.name,
+                'source': self.source,
+                'interval': self.interval,
+                'threshold': self.threshold,
+                'samples': self.samples,
+                'frames': [frame._asdict() for frame in self.frames]
+            }, f, indent=2)
+        return timeline
+
+    def _grab(self):
+        """ Take a screenshot from the configured source. """
+        if self.source == 'webdriver':
+            return self.driver.get_screenshot_as_png()
+        out = self.driver.container.exec_run(self.commands['x11'])
+        # docker>=3.0 returns a tuple of the exit code and output
+        if isinstance(out, tuple):
+            out = out[1]
+        return out
+
+    def _sample(self):
+        try:
+            timestamp = time.time()
+            png = self._grab()
+            if png:
+                self.capture(png, timestamp)
+        except Exception as e:
+            self.logger.exception(e, exc_info=True)
+
+    def _loop(self):
+        while self.max_frames is None or len(self.frames) < self.max_frames:
+            started = time.time()
+            self._sample()
+            gevent.sleep(max(0.0, self.interval - (time.time() - started)))
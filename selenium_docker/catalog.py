@@ -0,0 +1,257 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# >>
+#   Copyright 2018 Vivint, inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+#    vivint-selenium-docker, 20017
+# <<
+
+import json
+import os
+import sqlite3
+import time
+from collections import namedtuple
+from logging import getLogger
+
+__all__ = [
+    'CatalogEntry',
+    'RecordingCatalog'
+]
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS recordings (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        path TEXT NOT NULL,
+        driver TEXT,
+        container TEXT,
+        browser TEXT,
+        started REAL,
+        stopped REAL,
+        size INTEGER,
+        metadata TEXT,
+        created REAL NOT NULL)""",
+    """CREATE TABLE IF NOT EXISTS recording_tasks (
+        recording_id INTEGER NOT NULL REFERENCES recordings(id)
+            ON DELETE CASCADE,
+        task TEXT NOT NULL)""",
+    'CREATE INDEX IF NOT EXISTS recordings_path ON recordings (path)',
+    'CREATE INDEX IF NOT EXISTS recordings_driver ON recordings (driver)',
+    'CREATE INDEX IF NOT EXISTS recordings_time ON recordings (started, '
+    'stopped)',
+    'CREATE INDEX IF NOT EXISTS recording_tasks_task '
+    'ON recording_tasks (task)'
+]
+"""list(str): statements creating the catalog tables and indexes."""
+
+
+class CatalogEntry(namedtuple('CatalogEntry', [
+        'id', 'path', 'driver', 'container', 'browser', 'started', 'stopped',
+        'size', 'metadata', 'created', 'tasks'])):
+    """ A recording stored in a :obj:`.RecordingCatalog`.
+
+    Attributes:
+        id (int): row identifier.
+        path (str): local file path of the recording.
+        driver (str): name of the driver that recorded it.
+        container (str): ID of the Docker container.
+        browser (str): browser that was recorded.
+        started (float): UNIX timestamp of the first frame.
+        stopped (float): UNIX timestamp of the last frame.
+        size (int): size of the file in bytes.
+        metadata (dict): metadata embedded in the video file.
+        created (float): UNIX timestamp when the entry was added.
+        tasks (list(str)): identifiers of the tasks that were recorded.
+    """
+    __slots__ = ()
+
+
+class RecordingCatalog(object):
+    """ Append-only index of finished recordings in an SQLite database.
+
+    Video drivers created with a ``catalog`` add an entry for every file
+    they export, making recordings searchable by task, driver and time
+    without walking the directory tree.
+
+    Args:
+        path (str): database file, created if it doesn't exist. Use
+            ``':memory:'`` for a catalog that isn't persisted.
+        logger (:obj:`logging.Logger`):
+
+    Example::
+
+        catalog = RecordingCatalog('/videos/catalog.db')
+        pool = DriverPool(4, ChromeVideoDriver, ('/videos',),
+                          {'catalog': catalog})
+        pool.execute(get_title, urls, record_tasks=True)
+
+        for entry in catalog.find(since=time.time() - 86400):
+            print(entry.path, entry.tasks)
+
+        catalog.prune(max_age=7 * 86400, delete_files=True)
+    """
+
+    def __init__(self, path, logger=None):
+        self.path = path
+        self.logger = logger or getLogger(
+            '%s.RecordingCatalog' % __name__)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('PRAGMA foreign_keys = ON')
+        with self._db:
+            for statement in SCHEMA:
+                self._db.execute(statement)
+
+    def __repr__(self):
+        return '<RecordingCatalog(%s)>' % self.path
+
+    def __len__(self):
+        row = self._db.execute('SELECT COUNT(*) FROM recordings').fetchone()
+        return row[0]
+
+    def add(self, path, driver=None, container=None, browser=None,
+            started=None, stopped=None, size=None, metadata=None, tasks=None):
+        """ Add a finished recording to the catalog.
+
+        Args:
+            path (str): local file path of the recording.
+            driver (str): name of the driver that recorded it.
+            container (str): ID of the Docker container.
+            browser (str): browser that was recorded.
+            started (float): UNIX timestamp of the first frame.
+            stopped (float): UNIX timestamp of the last frame.
+            size (int): size of the file in bytes, read from ``path`` when
+                ``None``.
+            metadata (dict): metadata embedded in the video file.
+            tasks (list(str)): identifiers of the tasks that were recorded.
+
+        Returns:
+            int: identifier of the new entry.
+        """
+        if size is None and os.path.exists(path):
+            size = os.path.getsize(path)
+        with self._db:
+            cursor = self._db.execute(
+                'INSERT INTO recordings (path, driver, container, browser,'
+                ' started, stopped, size, metadata, created)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (path, driver, container, browser, started, stopped, size,
+                 json.dumps(metadata or {}, default=str), time.time()))
+            row_id = cursor.lastrowid
+            self._db.executemany(
+                'INSERT INTO recording_tasks (recording_id, task)'
+                ' VALUES (?, ?)', [(row_id, str(t)) for t in tasks or []])
+        self.logger.debug('cataloged %s as %d', path, row_id)
+        return row_id
+
+    def find(self, task=None, driver=None, since=None, until=None,
+             limit=None):
+        """ Search the catalog, every filter given must match.
+
+        Args:
+            task (str): identifier of a recorded task.
+            driver (str): name of the driver that made the recording.
+            since (float): UNIX timestamp, recordings that stopped before
+                this are excluded.
+            until (float): UNIX timestamp, recordings that started after
+                this are excluded.
+            limit (int): maximum number of entries to return.
+
+        Returns:
+            list(:obj:`.CatalogEntry`): newest recordings first.
+        """
+        query = ['SELECT DISTINCT r.* FROM recordings r']
+        where, params = [], []
+        if task is not None:
+            query.append('JOIN recording_tasks t ON t.recording_id = r.id')
+            where.append('t.task = ?')
+            params.append(str(task))
+        if driver is not None:
+            where.append('r.driver = ?')
+            params.append(driver)
+        if since is not None:
+            where.append('r.stopped >= ?')
+            params.append(since)
+        if until is not None:
+            where.append('r.started <= ?')
+            params.append(until)
+        if where:
+            query.append('WHERE ' + ' AND '.join(where))
+        query.append('ORDER BY r.started DESC, r.id DESC')
+        if limit is not None:
+            query.append('LIMIT %d' % int(limit))
+        rows = self._db.execute(' '.join(query), params).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def get(self, path):
+        """ Look up the newest entry for a file.
+
+        Args:
+            path (str): local file path of the recording.
+
+        Returns:
+            :obj:`.CatalogEntry`: or ``None`` when it isn't cataloged.
+        """
+        row = self._db.execute(
+            'SELECT * FROM recordings WHERE path = ?'
+            ' ORDER BY id DESC LIMIT 1', (path,)).fetchone()
+        return row and self._entry(row)
+
+    def prune(self, max_age=None, before=None, delete_files=False):
+        """ Remove old recordings from the catalog.
+
+        Args:
+            max_age (float): seconds, entries of recordings that stopped
+                longer ago than this are removed.
+            before (float): UNIX timestamp, entries of recordings that
+                stopped before this are removed. Used instead of
+                ``max_age``.
+            delete_files (bool): also delete the recordings from disk.
+
+        Returns:
+            int: number of entries removed.
+        """
+        if before is None:
+            if max_age is None:
+                raise ValueError('max_age or before is required')
+            before = time.time() - max_age
+        rows = self._db.execute(
+            'SELECT id, path FROM recordings WHERE stopped < ?',
+            (before,)).fetchall()
+        if delete_files:
+            for _, path in rows:
+                try:
+                    os.unlink(path)
+                except OSError as e:
+                    self.logger.warning('cannot delete %s, %s', path, e)
+        with self._db:
+            self._db.executemany('DELETE FROM recordings WHERE id = ?',
+                                 [(row_id,) for row_id, _ in rows])
+        self.logger.debug('pruned %d recordings', len(rows))
+        return len(rows)
+
+    def close(self):
+        """ Close the database connection.
+
+        Returns:
+            None
+        """
+        self._db.close()
+
+    def _entry(self, row):
+        tasks = [t for t, in self._db.execute(
+            'SELECT task FROM recording_tasks WHERE recording_id = ?'
+            ' ORDER BY rowid', (row[0],))]
+        values = list(row)
+        values[8] = json.loads(values[8] or '{}')
+        return CatalogEntry(*(values + [tasks]))
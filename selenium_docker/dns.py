@@ -0,0 +1,276 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# >>
+#   Copyright 2018 Vivint, inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+#    vivint-selenium-docker, 20017
+# <<
+
+import logging
+import re
+from collections import namedtuple
+
+import gevent
+from docker.errors import DockerException
+from tenacity import retry, stop_after_delay, wait_fixed
+
+from selenium_docker.base import ContainerFactory, ContainerInterface
+from selenium_docker.drivers import check_container
+from selenium_docker.meta import config
+
+__all__ = [
+    'DnsCache',
+    'DnsStats',
+    'parse_dnsmasq_stats'
+]
+
+CACHE_LINE = re.compile(
+    r'cache size (\d+), (\d+)/(\d+) cache insertions re-used')
+"""Compiled regex: cache statistics dnsmasq logs on ``SIGUSR1``."""
+
+QUERY_LINE = re.compile(
+    r'queries forwarded (\d+), queries answered locally (\d+)')
+"""Compiled regex: query statistics dnsmasq logs on ``SIGUSR1``."""
+
+
+class DnsStats(namedtuple('DnsStats', [
+        'cache_size', 'evictions', 'insertions', 'forwarded', 'answered'])):
+    """ Counters of a :obj:`.DnsCache` since it started.
+
+    Attributes:
+        cache_size (int): names the cache can hold.
+        evictions (int): names removed from the cache before they expired,
+            the cache is too small when this keeps growing.
+        insertions (int): names added to the cache.
+        forwarded (int): queries sent to the upstream servers.
+        answered (int): queries answered from the cache.
+    """
+    __slots__ = ()
+
+    @property
+    def queries(self):
+        """int: queries received. """
+        return self.forwarded + self.answered
+
+    @property
+    def hit_ratio(self):
+        """float: fraction of the queries answered from the cache. """
+        return float(self.answered) / self.queries if self.queries else 0.0
+
+    def since(self, previous):
+        """ Counters between an earlier snapshot and this one.
+
+        Args:
+            previous (:obj:`.DnsStats`): the earlier snapshot.
+
+        Returns:
+            :obj:`.DnsStats`
+        """
+        return DnsStats(self.cache_size,
+                        *[a - b for a, b in zip(self[1:], previous[1:])])
+
+
+def parse_dnsmasq_stats(text):
+    """ Read the latest statistics from dnsmasq's log.
+
+    Args:
+        text (str): log output, dnsmasq writes its statistics when it
+            receives ``SIGUSR1``.
+
+    Returns:
+        :obj:`.DnsStats`: or ``None`` when the log has no statistics.
+    """
+    caches = CACHE_LINE.findall(text)
+    queries = QUERY_LINE.findall(text)
+    if not caches or not queries:
+        return None
+    cache_size, evictions, insertions = caches[-1]
+    forwarded, answered = queries[-1]
+    return DnsStats(int(cache_size), int(evictions), int(insertions),
+                    int(forwarded), int(answered))
+
+
+class DnsCache(ContainerInterface):
+    """ Caching DNS resolver shared by the containers of a factory.
+
+    Runs dnsmasq in a container. Browsers and proxies created by a factory
+    with ``dns`` enabled use it as their name server, so each host name is
+    resolved once for all of them instead of once per container.
+
+    Names are kept at least ``min_ttl`` seconds even when their records ask
+    for less, dnsmasq caps this at one hour.
+
+    Args:
+        factory (:obj:`~selenium_docker.base.ContainerFactory`):
+        logger (:obj:`logging.Logger`):
+        cache_size (int): names kept in the cache, defaults to the
+            ``dns_cache_size`` setting. dnsmasq allows up to ``10000``.
+        min_ttl (int): seconds names are cached at least, defaults to the
+            ``dns_min_ttl`` setting.
+        servers (list(str)): upstream name servers, the resolver of the
+            Docker host is used when ``None``.
+
+    Example::
+
+        factory = ContainerFactory(None, 'crawler', dns={'min_ttl': 600})
+        pool = DriverPool(8, factory=factory)
+        ...
+        print(factory.dns.stats().hit_ratio)
+    """
+
+    DNS_PORT = 53
+    """int: port dnsmasq answers queries on."""
+
+    CONTAINER = dict(
+        image='andyshinn/dnsmasq',
+        detach=True,
+        mem_limit='64mb',
+        entrypoint=['dnsmasq'],
+        cap_add=['NET_ADMIN'],
+        labels={'role': 'dns',
+                'dynamic': 'true'},
+        restart_policy={
+            'Name': 'on-failure'
+        })
+    """dict: default specification for the underlying container."""
+
+    def __init__(self, factory=None, logger=None, cache_size=None,
+                 min_ttl=None, servers=None):
+        self.factory = factory or ContainerFactory.get_default_factory()
+        self.factory.load_image(self.CONTAINER, background=False)
+        self.cache_size = int(config.dns_cache_size
+                              if cache_size is None else cache_size)
+        self.min_ttl = int(config.dns_min_ttl if min_ttl is None else min_ttl)
+        self.servers = list(servers or [])
+        self._name = self.factory.gen_name(key='dns')
+        self.logger = logger or logging.getLogger(
+            '%s.DnsCache.%s' % (__name__, self.name))
+
+        self.container = self._adopt_container()
+        if self.container is None:
+            self.container = self._make_container()
+
+        self.logger.debug('waiting for dnsmasq to start')
+        if not self.check_container_ready():
+            raise DockerException('could not verify dnsmasq was ready')
+
+    def __repr__(self):
+        return '<DnsCache(%s,cache_size=%d,min_ttl=%d)>' % (
+            self.name, self.cache_size, self.min_ttl)
+
+    @property
+    def name(self):
+        """str: read-only property of the container's name. """
+        return self._name
+
+    @property
+    def command(self):
+        """list(str): dnsmasq arguments. """
+        args = ['--keep-in-foreground', '--log-facility=-',
+                '--cache-size=%d' % self.cache_size,
+                '--min-cache-ttl=%d' % self.min_ttl]
+        if self.servers:
+            args.append('--no-resolv')
+            args.extend('--server=%s' % server for server in self.servers)
+        return args
+
+    @property
+    def ip(self):
+        """str: address containers send their queries to. """
+        networks = self.container.attrs['NetworkSettings']['Networks']
+        network = self.factory.network
+        name = network.name if network is not None else 'bridge'
+        if not networks.get(name, {}).get('IPAddress'):
+            self.container.reload()
+            networks = self.container.attrs['NetworkSettings']['Networks']
+        return networks[name]['IPAddress']
+
+    @retry(wait=wait_fixed(0.5), stop=stop_after_delay(15))
+    def check_container_ready(self):
+        """ Wait until dnsmasq reports it started.
+
+        Returns:
+            bool: ``True`` once dnsmasq is running.
+        """
+        if b'started' not in self.container.logs():
+            raise DockerException('dnsmasq has not started')
+        return True
+
+    def _adopt_container(self):
+        """ Find the running resolver of the factory's namespace.
+
+        Returns:
+            :class:`~docker.models.containers.Container`: or ``None``.
+        """
+        container = self.factory.containers.get(self.name)
+        if container is None:
+            return None
+        container.reload()
+        if container.status != 'running':
+            self.logger.debug('removing %s container', container.status)
+            self.factory.stop_container(name=self.name)
+            return None
+        self.logger.debug('adopting running container')
+        return container
+
+    @check_container
+    def _make_container(self):
+        """ Create a running container on the given Docker engine.
+
+        Returns:
+            :class:`~docker.models.containers.Container`
+        """
+        kwargs = dict(self.CONTAINER)
+        kwargs['name'] = self.name
+        kwargs['command'] = self.command
+        self.logger.debug('creating container')
+        c = self.factory.start_container(kwargs)
+        c.reload()
+        return c
+
+    def stats(self, wait=0.25):
+        """ Hit ratio and counters of the cache.
+
+        dnsmasq writes its statistics to its log when it receives
+        ``SIGUSR1``, the latest ones are read back.
+
+        Args:
+            wait (float): seconds to give dnsmasq to write them.
+
+        Returns:
+            :obj:`.DnsStats`: or ``None`` when none were logged.
+        """
+        self.container.kill(signal='SIGUSR1')
+        gevent.sleep(wait)
+        logs = self.container.logs(tail=50)
+        return parse_dnsmasq_stats(logs.decode('utf-8', 'replace'))
+
+    def close_container(self):
+        """ Removes the running container from the connected engine via
+        :obj:`.DnsCache.factory`.
+
+        Returns:
+            None
+        """
+        self.factory.stop_container(name=self.name)
+
+    def quit(self):
+        """ Alias for :func:`~DnsCache.close_container`.
+
+        Returns:
+            None
+        """
+        self.logger.debug('dns cache quit')
+        self.close_container()
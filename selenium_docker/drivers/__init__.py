@@ -18,11 +18,14 @@
 #    vivint-selenium-docker, 20017
 # <<
 
+import io
 import logging
 import os
+import shutil
 import tarfile
 import time
 from abc import abstractmethod
+from collections import deque
 from datetime import datetime
 from functools import wraps
 
@@ -32,12 +35,16 @@ from docker.errors import APIError, DockerException
 from dotmap import DotMap
 from selenium.webdriver import Remote
 from selenium.webdriver.common.proxy import Proxy
-from six import add_metaclass
+from six import add_metaclass, string_types
 from tenacity import retry, stop_after_delay, wait_fixed
 from toolz.functoolz import juxt
 
+from selenium_docker.capture import FrameCapture
+from selenium_docker.catalog import RecordingCatalog
 from selenium_docker.meta import config
-from selenium_docker.utils import ip_port, parse_metadata
+from selenium_docker.utils import extract_archive, parse_metadata
+from selenium_docker.video import (
+    Segment, get_profile, parse_segment_list, render_ffserver_conf)
 from selenium_docker.base import (
     ContainerFactory, ContainerInterface, check_engine)
 
@@ -127,6 +134,10 @@ class DockerDriverBase(ContainerInterface, Remote):
     internal port for the underlying container. This string is in the format
     ``PORT/PROTOCOL``."""
 
+    CAPTURE_SOURCE = 'webdriver'
+    """str: where :func:`~DockerDriverBase.capture` takes screenshots from
+    by default."""
+
     class Flags(Flag):
         """ Default bit flags to enable or disable all extra features. """
         DISABLED = 0
@@ -237,6 +248,13 @@ class DockerDriverBase(ContainerInterface, Remote):
         """:obj:`docker.client.DockerClient`: reference"""
         return self.factory.docker
 
+    @property
+    def proxy_container(self):
+        """:obj:`~selenium_docker.proxy.SquidProxy`: proxy given to the
+        driver when it was created, ``None`` for a plain Selenium ``Proxy``.
+        """
+        return self._proxy_container
+
     @abstractmethod
     def _capabilities(self, arguments, extensions, proxy, user_agent):
         raise NotImplementedError
@@ -323,6 +341,29 @@ class DockerDriverBase(ContainerInterface, Remote):
         self.factory.stop_container(name=self.name)
         self.container = None
 
+    def capture(self, path, interval=1.0, threshold=0.02, source=None,
+                max_frames=None):
+        """ Keep screenshots whenever the screen changes.
+
+        A lightweight alternative to video recording, see
+        :obj:`~selenium_docker.capture.FrameCapture`. The capture starts
+        when used as a context manager or by calling ``start``.
+
+        Args:
+            path (str): directory for the frames.
+            interval (float): seconds between samples.
+            threshold (float): minimum difference for a frame to be kept.
+            source (str): ``'x11'`` or ``'webdriver'``, defaults to
+                :attr:`~DockerDriverBase.CAPTURE_SOURCE`.
+            max_frames (int): stop after keeping this many frames.
+
+        Returns:
+            :obj:`~selenium_docker.capture.FrameCapture`
+        """
+        return FrameCapture(self, path, interval=interval,
+                            threshold=threshold, source=source,
+                            max_frames=max_frames)
+
     def f(self, flag):
         """ Helper function for checking if we included a flag.
 
@@ -352,12 +393,12 @@ class DockerDriverBase(ContainerInterface, Remote):
         return it as a URL-string we can connect to.
 
         References:
-            :func:`selenium_docker.utils.ip_port`
+            :func:`selenium_docker.base.ContainerFactory.ip_port`
 
         Returns:
             str
         """
-        host, port = ip_port(self.container, self.SELENIUM_PORT)
+        host, port = self.factory.ip_port(self.container, self.SELENIUM_PORT)
         base_url = self.BASE_URL.format(host=host, port=port)
         return base_url
 
@@ -379,41 +420,213 @@ class VideoDriver(DockerDriverBase):
 
     Args:
         path (str): directory where finished video recording should be stored.
+        exporter (:obj:`~selenium_docker.video.VideoExporter`): when given,
+            :func:`~VideoDriver.quit` hands the recording and container off
+            to this background exporter instead of blocking until the video
+            has been copied out.
+        segment_time (int or str): split the recording into files of this
+            many seconds. With :attr:`~VideoDriver.SEGMENT_PER_TASK` nothing
+            is recorded until :func:`~VideoDriver.start_segment` is called
+            and every segment is its own file.
+        segment_retention (int): number of finished segments to keep inside
+            the container, older segments are overwritten or deleted.
+            Defaults to the ``ffmpeg_segment_retention`` setting.
+        live_stream (bool): start ffserver inside the container so the
+            browser can be watched live at :attr:`~VideoDriver.stream_url`.
+        profile (str or :obj:`~selenium_docker.video.EncodingProfile`):
+            encoding settings for the recording, the name of one of the
+            :obj:`~selenium_docker.video.PROFILES`. Defaults to the
+            ``ffmpeg_profile`` setting. Pass it with ``driver_cls_kw`` to
+            use a profile for a whole :obj:`~selenium_docker.pool.DriverPool`.
+        recordings_dir (str): local directory mounted at
+            ``config.ffmpeg_location`` inside the container. Each container
+            records to its own subdirectory and finished recordings are
+            moved instead of copied through the Docker API.
+        recordings_volume (str): named Docker volume to mount instead of
+            ``recordings_dir``. ``recordings_dir`` must be where that volume
+            is available to this process.
+        catalog (:obj:`~selenium_docker.catalog.RecordingCatalog` or str):
+            catalog, or the path of its database, that every exported
+            recording is added to.
 
     Attributes:
         save_path (str): directory to save video recording.
+        exporter (:obj:`~selenium_docker.video.VideoExporter`): background
+            exporter used by :func:`~VideoDriver.quit`, or ``None``.
+        export (:obj:`gevent.Greenlet`): handle of the background export
+            started when quitting, or ``None``.
+        segment_time (int or str): length of recorded segments.
+        segment_retention (int): number of segments kept in the container.
+        profile (:obj:`~selenium_docker.video.EncodingProfile`): encoding
+            settings for the recording.
+        recordings_dir (str): local directory the container records to,
+            ``None`` when recordings are copied through the Docker API.
+        catalog (:obj:`~selenium_docker.catalog.RecordingCatalog`): index
+            of exported recordings, or ``None``.
         _time (int): time stamp of when the class was instatiated.
         __is_recording (bool): flag for internal recording state.
         __recording_path (str): Docker internal path for saved files.
     """
 
+    SEGMENT_PER_TASK = 'task'
+    """str: ``segment_time`` value for recording one segment per task. """
+
+    CAPTURE_SOURCE = 'x11'
+    """str: the ffmpeg images can dump the X display directly, which is
+    cheaper than a WebDriver screenshot."""
+
+    STREAM_PORT = '8090/tcp'
+    """str: identifier for extracting the host port bound to ffserver's
+    live stream inside the container."""
+
+    TASK_MARKS = 1000
+    """int: number of :func:`~VideoDriver.mark_task` marks remembered for
+    the recording catalog."""
+
+    FFSERVER_CONF = '/opt/ffserver.conf'
+    """str: Docker internal path of the rendered ffserver configuration. The
+    template is expected next to it with the suffix ``-orig``."""
+
     commands = DotMap(
-        stop_ffmpeg='pkill ffmpeg',
+        # only match our recordings, not the ffmpeg feeding ffserver
+        stop_ffmpeg='pkill -f "^ffmpeg -y"',
+        wait_ffmpeg=(
+            'sh -c "while pgrep -f \'^ffmpeg -y\' > /dev/null;'
+            ' do sleep 0.1; done"'),
+        start_ffserver='ffserver -f {conf}',
+        stop_ffserver='pkill ffserver',
+        read_file='cat {filename}',
         start_ffmpeg=(
             'ffmpeg -y -f x11grab -s {resolution} -framerate {fps}'
-            ' -i :99+0,0 {metadata} -qp 18 -c:v libx264'
-            ' -preset ultrafast {filename}'))
+            ' -i :99+0,0 {metadata} {encoding} {filename}'),
+        segment_ffmpeg=(
+            'ffmpeg -y -f x11grab -s {resolution} -framerate {fps}'
+            ' -i :99+0,0 {metadata} {encoding}'
+            ' -force_key_frames expr:gte(t,n_forced*{segment_time})'
+            ' -f segment -segment_time {segment_time}'
+            ' -segment_wrap {segment_wrap} -segment_format matroska'
+            ' -segment_list {segment_list} -segment_list_type csv'
+            ' -reset_timestamps 1 {filename}'),
+        list_segments='cat {segment_list}',
+        remove_file='rm -f {filename}')
     """:obj:`dotmap.DotMap`: aliases for commands that run inside the docker
     container for starting and stopping ffmpeg.
     
     Attributes:
-        start_ffmpeg: using X11 and LibX264.
+        start_ffmpeg: using X11 and the driver's encoding profile.
         stop_ffmpeg: killing the process will correctly stop video recording.
+        wait_ffmpeg: blocks until ffmpeg has finished writing its files.
+        segment_ffmpeg: same as ``start_ffmpeg`` but split into segments.
+        start_ffserver: serve the live stream with a rendered configuration.
+        stop_ffserver: stop serving the live stream.
+        read_file: print the contents of a file.
+        list_segments: print the list of finished segments.
+        remove_file: delete a finished segment.
     
     """
 
     def __init__(self, path='/tmp', *args, **kwargs):
+        exporter = kwargs.pop('exporter', None)
+        segment_time = kwargs.pop('segment_time', None)
+        segment_retention = kwargs.pop('segment_retention', None)
+        segment_retention = int(config.ffmpeg_segment_retention
+                                if segment_retention is None
+                                else segment_retention)
+        live_stream = kwargs.pop('live_stream', False)
+        profile = get_profile(kwargs.pop('profile', None))
+        recordings_dir = kwargs.pop('recordings_dir', None)
+        recordings_volume = kwargs.pop('recordings_volume', None)
+        catalog = kwargs.pop('catalog', None)
+        if isinstance(catalog, string_types):
+            catalog = RecordingCatalog(catalog)
+        if recordings_volume and not recordings_dir:
+            raise ValueError('recordings_volume requires recordings_dir')
+        if recordings_dir and not os.path.isdir(recordings_dir):
+            raise IOError('path %s in not a directory' % recordings_dir)
+        if segment_time not in (None, self.SEGMENT_PER_TASK) and (
+                not isinstance(segment_time, int) or segment_time < 1):
+            raise ValueError('invalid segment_time %s' % segment_time)
+        if segment_retention < 1:
+            raise ValueError(
+                'invalid segment_retention %s' % segment_retention)
+        # needed while the container is created
+        self.recordings_dir = recordings_dir    # type: str
+        self._recordings_volume = recordings_volume  # type: str
         super(VideoDriver, self).__init__(*args, **kwargs)
         # marker attributes
         if not os.path.isdir(path):
             raise IOError('path %s in not a directory' % path)
         self.save_path = path                   # type: str
+        self.exporter = exporter
+        self.export = None
+        self.segment_time = segment_time
+        self.segment_retention = segment_retention  # type: int
+        self.profile = profile                  # type: EncodingProfile
+        self.catalog = catalog                  # type: RecordingCatalog
         self._time = int(time.time())           # type: int
+        self._epoch = None                      # type: float
         self.__is_recording = False             # type: bool
         self.__recording_path = os.path.join(   # type: str
-            config.ffmpeg_location, self.filename)
+            self._recording_dir, self.filename)
+        self.__segments = deque()               # type: deque[Segment]
+        self.__segment_count = 0                # type: int
+        self.__segment_path = None              # type: str
+        self.__discarded = set()                # type: set[Segment]
+        self.__is_streaming = False             # type: bool
+        self.__metadata = {}                    # type: dict
+        self.__task_marks = deque(maxlen=self.TASK_MARKS)
         if self._perform_check_container_ready():
-            self.start_recording()
+            if segment_time != self.SEGMENT_PER_TASK:
+                self.start_recording()
+            if live_stream:
+                self.start_stream()
+
+    def _make_container(self, **kwargs):
+        """ Create the container, mounting ``recordings_dir`` when given.
+
+        Args:
+            **kwargs (dict): the specification of the docker container.
+
+        Returns:
+            :class:`~docker.models.containers.Container`
+        """
+        if self.recordings_dir:
+            source = self._recordings_volume or os.path.abspath(
+                self.recordings_dir)
+            volumes = list(kwargs.get(
+                'volumes', self.CONTAINER.get('volumes', [])))
+            volumes.append('%s:%s' % (source, config.ffmpeg_location))
+            kwargs['volumes'] = volumes
+            host_dir = os.path.join(self.recordings_dir, kwargs['name'])
+            if not os.path.isdir(host_dir):
+                os.makedirs(host_dir)
+        return super(VideoDriver, self)._make_container(**kwargs)
+
+    def close_container(self):
+        """ Removes the container and its empty recordings subdirectory.
+
+        Returns:
+            None
+        """
+        super(VideoDriver, self).close_container()
+        if self.recordings_dir:
+            try:
+                os.rmdir(self._host_recording_dir)
+            except OSError:
+                # recordings were left behind, keep them
+                pass
+
+    @property
+    def _recording_dir(self):
+        """str: Docker internal directory ffmpeg writes to. """
+        if self.recordings_dir:
+            return os.path.join(config.ffmpeg_location, self.name)
+        return config.ffmpeg_location
+
+    @property
+    def _host_recording_dir(self):
+        """str: local path of :attr:`._recording_dir` when it's mounted. """
+        return os.path.join(self.recordings_dir, self.name)
 
     @property
     def filename(self):
@@ -428,6 +641,161 @@ class VideoDriver(DockerDriverBase):
         """bool: the container is recording video right now."""
         return self.__is_recording
 
+    @property
+    def is_streaming(self):
+        """bool: ffserver is serving a live stream of the browser."""
+        return self.__is_streaming
+
+    @property
+    def stream_url(self):
+        """str: URL of the live WebM stream, ``None`` when not streaming.
+
+        The address is resolved the same way as
+        :func:`~DockerDriverBase.get_url` resolves Selenium's address.
+        """
+        if not self.__is_streaming:
+            return None
+        host, port = self.factory.ip_port(self.container, self.STREAM_PORT)
+        return 'http://%s:%d/out.webm' % (host, port)
+
+    @property
+    def thumbnail_url(self):
+        """str: URL of a JPEG of the screen that refreshes every second,
+        ``None`` when not streaming."""
+        url = self.stream_url
+        return url and url.replace('/out.webm', '/thumb.jpg')
+
+    @property
+    def recording_started(self):
+        """float: UNIX timestamp when the current recording or segment was
+        started, ``None`` if nothing was recorded yet."""
+        return self._epoch
+
+    @property
+    def is_segmented(self):
+        """bool: the recording is split into several files."""
+        return self.segment_time is not None
+
+    @property
+    def segment_list(self):
+        """str: Docker internal path of ffmpeg's list of finished segments.
+        """
+        return os.path.join(self._recording_dir, '%s.csv' % (
+            os.path.splitext(self.filename)[0]))
+
+    def _exec(self, cmd, environment=None):
+        """ Run a command in the container and return its output. """
+        out = self.container.exec_run(cmd, environment=environment,
+                                      detach=False)
+        # docker>=3.0 returns a tuple of the exit code and output
+        if isinstance(out, tuple):
+            out = out[1]
+        if isinstance(out, bytes):
+            out = out.decode('utf-8', 'replace')
+        return out
+
+    @check_engine
+    def start_stream(self):
+        """ Start serving a live stream of the browser with ffserver.
+
+        The configuration template shipped in the image is rendered with
+        the values from :obj:`~selenium_docker.meta.config` and copied into
+        the container before ffserver is launched.
+
+        Raises:
+            RuntimeError: when the stream is already running.
+
+        Returns:
+            str: :attr:`~VideoDriver.stream_url`.
+        """
+        if self.__is_streaming:
+            raise RuntimeError('already streaming')
+        template = self._exec(self.commands.read_file.format(
+            filename='%s-orig' % self.FFSERVER_CONF))
+        width, height = config.ffmpeg_resolution.split('x')
+        out_width, out_height = config.ffserver_resolution.split('x')
+        conf = render_ffserver_conf(
+            template,
+            STREAM_FILESIZE=config.ffserver_filesize,
+            SCREEN_WIDTH=width,
+            SCREEN_HEIGHT=height,
+            FRAMERATE=config.ffmpeg_fps,
+            DISPLAY=':99',
+            OUT_BUFFER=config.ffserver_buffer_kb,
+            QUALITY=config.ffserver_quality,
+            OUT_WIDTH=out_width,
+            OUT_HEIGHT=out_height,
+            IN_BUFFER_KB=config.ffserver_buffer_kb)
+        self._put_file(self.FFSERVER_CONF, conf.encode('utf-8'))
+        self.logger.debug('starting live stream')
+        self.container.exec_run(
+            self.commands.start_ffserver.format(conf=self.FFSERVER_CONF),
+            detach=True)
+        self.__is_streaming = True
+        return self.stream_url
+
+    @check_engine
+    def stop_stream(self):
+        """ Stop serving the live stream.
+
+        Returns:
+            None
+        """
+        if not self.__is_streaming:
+            return
+        self.logger.debug('stopping live stream')
+        self.container.exec_run(self.commands.stop_ffserver, detach=False)
+        self.__is_streaming = False
+
+    def _put_file(self, path, data):
+        """ Write ``data`` to ``path`` inside the container. """
+        buf = io.BytesIO()
+        info = tarfile.TarInfo(os.path.basename(path))
+        info.size = len(data)
+        info.mtime = time.time()
+        with tarfile.open(fileobj=buf, mode='w') as tar:
+            tar.addfile(info, io.BytesIO(data))
+        self.container.put_archive(os.path.dirname(path), buf.getvalue())
+
+    def _stop_ffmpeg(self, environment=None):
+        """ Stop ffmpeg and wait for it to finish writing its files. """
+        self.container.exec_run(self.commands.stop_ffmpeg,
+                                environment=environment,
+                                detach=False)
+        self.container.exec_run(self.commands.wait_ffmpeg,
+                                environment=environment,
+                                detach=False)
+
+    def _make_save_path(self, path, shard_by_date=True):
+        """ Create the local directory finished recordings are copied to.
+
+        Args:
+            path (str): local directory.
+            shard_by_date (bool): append ``YYYY/MM/DD`` to ``path``.
+
+        Raises:
+            ValueError: when ``path`` is not an existing folder path.
+            IOError: when there's a problem creating the folder.
+
+        Returns:
+            str: the directory to use.
+        """
+        if not os.path.isdir(path):
+            raise ValueError('%s is not a directory' % path)
+
+        if shard_by_date:
+            # split the final destination into a folder tree by date
+            ts = datetime.fromtimestamp(self._time)
+            path = os.path.join(path, str(ts.year), str(ts.month), str(ts.day))
+
+        if not os.path.exists(path):
+            try:
+                os.makedirs(path)
+            except IOError as e:
+                self.logger.exception(e, exc_info=True)
+                raise e
+        return path
+
     def __reset_time(self):
         self._time = int(time.time() * 100)
 
@@ -435,54 +803,106 @@ class VideoDriver(DockerDriverBase):
         """ Stop video recording before closing the driver instance and
         removing the Docker container.
 
+        When the driver has an ``exporter`` the recording is stopped, copied
+        out and the container removed in the background; this method returns
+        without waiting for it.
+
         Returns:
-            None
+            :obj:`gevent.Greenlet`:
+                handle for the background export when one was started,
+                otherwise ``None``.
         """
+        if self.__is_recording and self.exporter is not None:
+            self.logger.debug('handing recording off to exporter')
+            self.export = self.exporter.export(self, self.save_path)
+            return self.export
         if self.__is_recording:
             self.stop_recording(self.save_path)
         super(VideoDriver, self).quit()
 
-    @check_engine
-    def start_recording(self, metadata=None, environment=None):
-        """ Starts the ffmpeg video recording inside the container.
+    def _start_ffmpeg(self, template, filename, metadata=None,
+                      environment=None, **fmt):
+        """ Launch ffmpeg in the background inside the container.
 
         Args:
+            template (str): one of the ``*_ffmpeg`` :attr:`.commands`.
+            filename (str): output file, or pattern for segmented output.
             metadata (dict): arbitrary data to attach to the video file.
-            environment (dict): environment variables to inject inside the
-                running container before launching ffmpeg.
+            environment (dict): environment variables for ffmpeg.
+            **fmt: additional values to format ``template`` with.
 
         Returns:
-            str:
-                the absolute file path of the file being recorded, inside the
-                Docker container.
+            None
         """
-        if self.__is_recording:
-            raise RuntimeError(
-                'already recording, cannot start recording again')
-
         if not metadata:
             metadata = {}
 
-        self.__is_recording = True
-
         for s, v in [
-            ('title', self.filename),
+            ('title', os.path.basename(filename)),
             ('language', 'English'),
             ('encoded_by', 'docker+ffmpeg'),
             ('description',
              getattr(self, 'DESCRIPTION', config.ffmpeg_description))]:
             metadata.setdefault(s, v)
+        self.__metadata = metadata
 
-        cmd = self.commands.start_ffmpeg.format(
+        cmd = template.format(
             resolution=config.ffmpeg_resolution,
-            fps=config.ffmpeg_fps,
+            fps=self.profile.framerate,
+            encoding=self.profile.args,
             metadata=parse_metadata(metadata),
-            filename=self.__recording_path)
-        self.logger.debug(
-            'starting recording to file %s', self.__recording_path)
+            filename=filename,
+            **fmt)
+        self.logger.debug('starting recording to file %s', filename)
         self.logger.debug('cmd: %s', cmd)
         self.container.exec_run(cmd, environment=environment, detach=True)
-        return self.__recording_path
+
+    @check_engine
+    def start_recording(self, metadata=None, environment=None):
+        """ Starts the ffmpeg video recording inside the container.
+
+        When ``segment_time`` is set the recording is split into segments,
+        for :attr:`~VideoDriver.SEGMENT_PER_TASK` this is the same as
+        calling :func:`~VideoDriver.start_segment`.
+
+        Args:
+            metadata (dict): arbitrary data to attach to the video file.
+            environment (dict): environment variables to inject inside the
+                running container before launching ffmpeg.
+
+        Returns:
+            str:
+                the absolute file path of the file being recorded, inside the
+                Docker container. For segmented recordings this is the
+                filename pattern of the segments.
+        """
+        if self.__is_recording:
+            raise RuntimeError(
+                'already recording, cannot start recording again')
+
+        if self.segment_time == self.SEGMENT_PER_TASK:
+            return self.start_segment(metadata, environment)
+
+        self.__is_recording = True
+        self._epoch = time.time()
+
+        if not self.is_segmented:
+            self._start_ffmpeg(self.commands.start_ffmpeg,
+                               self.__recording_path, metadata, environment)
+            return self.__recording_path
+
+        pattern = os.path.join(self._recording_dir, '%s-%%05d.mkv' % (
+            os.path.splitext(self.filename)[0]))
+        metadata = dict(metadata or {})
+        metadata.setdefault('title', self.filename)
+        # ffmpeg's wrap count includes the segment being written
+        wrap = self.segment_retention + 1
+        self._start_ffmpeg(self.commands.segment_ffmpeg, pattern, metadata,
+                           environment,
+                           segment_time=self.segment_time,
+                           segment_wrap=wrap,
+                           segment_list=self.segment_list)
+        return pattern
 
     @check_engine
     def stop_recording(self, path, shard_by_date=True, environment=None):
@@ -504,46 +924,246 @@ class VideoDriver(DockerDriverBase):
         Returns:
             str:
                 file path to completed recording. This value is adjusted
-                for ``shard_by_date``.
+                for ``shard_by_date``. Segmented recordings return a list
+                of the file paths of every retained segment instead.
         """
         if not self.__is_recording:
             raise RuntimeError(
                 'cannot stop recording, recording not in progress')
 
-        self.container.exec_run(self.commands.stop_ffmpeg,
-                                environment=environment,
-                                detach=False)
-
-        if not os.path.isdir(path):
-            raise ValueError('%s is not a directory' % path)
-
-        if shard_by_date:
-            # split the final destination into a folder tree by date
-            ts = datetime.fromtimestamp(self._time)
-            path = os.path.join(path, str(ts.year), str(ts.month), str(ts.day))
+        if self.segment_time == self.SEGMENT_PER_TASK:
+            self.stop_segment(environment)
+        else:
+            self._stop_ffmpeg(environment)
+            self.__is_recording = False
 
-        if not os.path.exists(path):
-            try:
-                os.makedirs(path)
-            except IOError as e:
-                self.logger.exception(e, exc_info=True)
-                raise e
+        if self.is_segmented:
+            paths = self.fetch_segments(path, shard_by_date=shard_by_date)
+            self._time = int(time.time())
+            return paths
 
+        stopped = time.time()
+        path = self._make_save_path(path, shard_by_date)
         source = self.__recording_path
         destination = os.path.join(path, self.filename)
-        tar_dest = '%s.tar' % destination
+        self._fetch_file(source, destination, move=True)
+        self._catalog(destination, self._epoch, stopped)
+        self._time = int(time.time())
+        self.__recording_path = os.path.join(
+            self._recording_dir, self.filename)
+        return destination
+
+    def _fetch_file(self, source, destination, move=False):
+        """ Stream a file out of the container to ``destination``.
 
+        With a mounted ``recordings_dir`` the file is moved, or linked when
+        ``move`` is ``False``, on the local filesystem instead.
+        """
+        if self.recordings_dir:
+            local = os.path.join(
+                self._host_recording_dir, os.path.basename(source))
+            if move:
+                shutil.move(local, destination)
+                return
+            try:
+                os.link(local, destination)
+            except (OSError, AttributeError):
+                # different filesystems or no hard links on this platform
+                shutil.copyfile(local, destination)
+            return
         stream, stat = self.container.get_archive(source)
         self.logger.debug(
             'video stats, name:%s, size:%s', stat['name'], stat['size'])
-        with open(tar_dest, 'wb') as out_file:
-            out_file.write(stream.data)
-        if not tarfile.is_tarfile(tar_dest):
-            raise RuntimeError('invalid tar file from container %s' % tar_dest)
-        self.logger.debug('extracting tar archive')
-        tar = tarfile.open(name=tar_dest)
-        tar.extractall(path)
-        os.unlink(tar_dest)
+        try:
+            extract_archive(stream, destination)
+        except (IOError, tarfile.TarError) as e:
+            raise RuntimeError(
+                'invalid tar stream from container for %s: %s' % (source, e))
+
+    @check_engine
+    def start_segment(self, metadata=None, environment=None):
+        """ Start recording a new segment, one file per call.
+
+        Only available when ``segment_time`` is
+        :attr:`~VideoDriver.SEGMENT_PER_TASK`.
+
+        Args:
+            metadata (dict): arbitrary data to attach to the video file.
+            environment (dict): environment variables for ffmpeg.
+
+        Raises:
+            RuntimeError: when a segment is already being recorded or the
+                driver doesn't record per task.
+
+        Returns:
+            str: Docker internal path of the segment being recorded.
+        """
+        if self.segment_time != self.SEGMENT_PER_TASK:
+            raise RuntimeError('driver is not recording segments per task')
+        if self.__is_recording:
+            raise RuntimeError(
+                'already recording, cannot start another segment')
+        self.__segment_count += 1
+        filename = os.path.join(self._recording_dir, '%s-%05d.mkv' % (
+            os.path.splitext(self.filename)[0], self.__segment_count))
+        self.__is_recording = True
+        self._epoch = time.time()
+        self.__segment_path = filename
+        self._start_ffmpeg(self.commands.start_ffmpeg, filename, metadata,
+                           environment)
+        return filename
+
+    @check_engine
+    def stop_segment(self, environment=None):
+        """ Finish the segment started by :func:`~VideoDriver.start_segment`.
+
+        The oldest segments are deleted from the container when there are
+        more than ``segment_retention``.
+
+        Args:
+            environment (dict): environment variables for the stop commands.
+
+        Returns:
+            :obj:`~selenium_docker.video.Segment`: the finished segment.
+        """
+        if not self.__is_recording or \
+                self.segment_time != self.SEGMENT_PER_TASK:
+            raise RuntimeError(
+                'cannot stop segment, segment not in progress')
+        self._stop_ffmpeg(environment)
         self.__is_recording = False
-        self._time = int(time.time())
-        return destination
+        segment = Segment(os.path.basename(self.__segment_path),
+                          self._epoch, time.time())
+        self.__segments.append(segment)
+        while len(self.__segments) > self.segment_retention:
+            self._remove_segment(self.__segments.popleft())
+        return segment
+
+    def _remove_segment(self, segment):
+        self.logger.debug('removing segment %s', segment.filename)
+        self.__discarded.add(segment)
+        self.container.exec_run(
+            self.commands.remove_file.format(filename=os.path.join(
+                self._recording_dir, segment.filename)),
+            detach=False)
+
+    @check_engine
+    def segments(self):
+        """ The finished segments still stored inside the container.
+
+        Segments are only listed once ffmpeg has closed them, the segment
+        being recorded right now is not included.
+
+        Returns:
+            list(:obj:`~selenium_docker.video.Segment`):
+                ordered from oldest to newest.
+        """
+        if not self.is_segmented:
+            return []
+        if self.segment_time == self.SEGMENT_PER_TASK:
+            return list(self.__segments)
+        if self._epoch is None:
+            return []
+        text = self._exec(self.commands.list_segments.format(
+            segment_list=self.segment_list))
+        return [seg for seg in parse_segment_list(text, self._epoch)
+                if seg not in self.__discarded]
+
+    @check_engine
+    def fetch_segments(self, path, start=None, end=None, shard_by_date=True):
+        """ Copy the segments covering a time range out of the container.
+
+        Args:
+            path (str): local directory where the files should be stored.
+            start (float): UNIX timestamp of the start of the range.
+            end (float): UNIX timestamp of the end of the range.
+            shard_by_date (bool): see :func:`~VideoDriver.stop_recording`.
+
+        Returns:
+            list(str): file paths of the copied segments.
+        """
+        segments = [seg for seg in self.segments() if seg.overlaps(start, end)]
+        if not segments:
+            return []
+        path = self._make_save_path(path, shard_by_date)
+        paths = []
+        for seg in segments:
+            destination = os.path.join(path, seg.filename)
+            self._fetch_file(
+                os.path.join(self._recording_dir, seg.filename),
+                destination)
+            self._catalog(destination, seg.start, seg.end)
+            paths.append(destination)
+        return paths
+
+    def mark_task(self, task, start, end):
+        """ Remember that a task ran on this driver between two times.
+
+        Catalog entries list the tasks whose marks overlap the recording.
+
+        Args:
+            task (str): identifier of the task.
+            start (float): UNIX timestamp when the task started.
+            end (float): UNIX timestamp when the task finished.
+
+        Returns:
+            None
+        """
+        self.__task_marks.append((str(task), start, end))
+
+    def task_marks(self, start=None, end=None):
+        """ Tasks marked with :func:`~VideoDriver.mark_task` that ran
+        during a time range.
+
+        Args:
+            start (float): UNIX timestamp of the start of the range.
+            end (float): UNIX timestamp of the end of the range.
+
+        Returns:
+            list(tuple(str, float, float)): the task, start and end of
+            each mark, oldest first.
+        """
+        return [(task, started, ended)
+                for task, started, ended in self.__task_marks
+                if (end is None or started <= end) and
+                (start is None or ended >= start)]
+
+    def _catalog(self, path, started, stopped):
+        """ Add an exported recording to the catalog, if there is one. """
+        if self.catalog is None:
+            return
+        tasks = [task for task, _, _ in self.task_marks(started, stopped)]
+        try:
+            self.catalog.add(
+                path, driver=self.name,
+                container=getattr(self.container, 'id', None),
+                browser=self.BROWSER, started=started, stopped=stopped,
+                metadata=self.__metadata, tasks=tasks)
+        except Exception as e:
+            self.logger.exception(e, exc_info=True)
+
+    @check_engine
+    def discard_segments(self, start=None, end=None, partial=True):
+        """ Delete the segments covering a time range from the container.
+
+        Args:
+            start (float): UNIX timestamp of the start of the range.
+            end (float): UNIX timestamp of the end of the range.
+            partial (bool): also delete segments that are only partly inside
+                the range.
+
+        Returns:
+            list(:obj:`~selenium_docker.video.Segment`): removed segments.
+        """
+        if partial:
+            removed = [seg for seg in self.segments()
+                       if seg.overlaps(start, end)]
+        else:
+            removed = [seg for seg in self.segments()
+                       if (start is None or seg.start >= start) and
+                       (end is None or seg.end <= end)]
+        for seg in removed:
+            if seg in self.__segments:
+                self.__segments.remove(seg)
+            self._remove_segment(seg)
+        return removed
@@ -146,5 +146,6 @@ class ChromeVideoDriver(VideoDriver, ChromeDriver):
                 'hub': 'false'},
         mem_limit='768mb',
         volumes=['/dev/shm:/dev/shm'],
-        ports={DockerDriverBase.SELENIUM_PORT: None},
+        ports={DockerDriverBase.SELENIUM_PORT: None,
+               VideoDriver.STREAM_PORT: None},
         publish_all_ports=True)
@@ -29,12 +29,31 @@ OS_ENV_PREFIX = 'SELENIUM_'  # type: str
 
 SETTINGS = {
     'date_format': '%m-%d-%Y',
+    'dns_cache_size': 10000,
+    'dns_min_ttl': 300,
     'ffmpeg_description': 'automatic recording generated by selenium-docker',
     'ffmpeg_extension': 'mkv',
     'ffmpeg_fps': '25',
     'ffmpeg_language': 'EN',
     'ffmpeg_location': '/recordings',
+    'ffmpeg_profile': 'default',
     'ffmpeg_resolution': '1280x800',
+    'ffmpeg_segment_retention': 120,
+    'ffserver_buffer_kb': '2048',
+    'ffserver_filesize': '50M',
+    'ffserver_quality': '8',
+    'ffserver_resolution': '640x400',
+    'har_max_entries': 1000,
+    'har_max_kb': 1024,
+    'squid_cache_mem_mb': 64,
+    'squid_cache_policy': 'heap LFUDA',
+    'squid_cache_size_mb': 1024,
+    'squid_max_memory_object_kb': 512,
+    'squid_max_object_mb': 32,
+    'squid_memory_policy': 'heap GDSF',
+    'squid_upstream_fail_limit': 3,
+    'squid_upstream_rotation': 'round-robin',
+    'squid_upstreams': '',
     'time_format': '%I:%M:%S'
 }
 """dict: default settings directory, used as a read-only store of data. 
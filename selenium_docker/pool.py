@@ -19,21 +19,29 @@
 # <<
 
 import math
-from collections import Mapping
+import random
+import time
+from collections import Mapping, OrderedDict, deque, namedtuple
 from logging import getLogger
-from functools import partial
 
 import gevent
+from gevent.event import AsyncResult, Event
+from gevent.lock import Semaphore
 from gevent.pool import Pool
-from gevent.queue import JoinableQueue, Queue
-from toolz.itertoolz import count, isiterable
+from gevent.queue import Empty, Queue
+from six import string_types
+from six.moves.urllib.parse import urlparse
+from toolz.itertoolz import isiterable
 from selenium.common.exceptions import WebDriverException
 
+from selenium_docker.accesslog import AccessLog, HarCapture, Tracker
 from selenium_docker.base import ContainerFactory
+from selenium_docker.drivers import VideoDriver
 from selenium_docker.drivers.chrome import ChromeDriver
 from selenium_docker.errors import SeleniumDockerException
-from selenium_docker.proxy import SquidProxy
+from selenium_docker.proxy import ProxyPool, SquidProxy, site_key
 from selenium_docker.utils import gen_uuid
+from selenium_docker.video import TaskRecording, VideoExporter
 
 
 class DriverPoolRuntimeException(RuntimeError, SeleniumDockerException):
@@ -44,18 +52,852 @@ class DriverPoolValueError(ValueError, SeleniumDockerException):
     """ Pool interaction ValueError. """
 
 
+class DriverPoolTimeout(DriverPoolRuntimeException):
+    """ No driver could be checked out of the pool in time. """
+
+
+class TaskResult(namedtuple('TaskResult',
+                            ['value', 'recording', 'network', 'har'])):
+    """ Result of a task run with ``record_tasks``, ``network_stats`` or
+    ``capture_network`` enabled.
+
+    Attributes:
+        value: return value of the task function, ``None`` when it failed.
+        recording (:obj:`~selenium_docker.video.TaskRecording`): the part of
+            the driver's recording covering the task, ``None`` when the
+            driver doesn't record video.
+        network (dict): summary of the requests the driver made through the
+            proxy during the task, see
+            :func:`~selenium_docker.accesslog.Tracker.summary`. ``None``
+            when the driver's requests can't be told apart.
+        har (dict): HAR log of the requests the driver made during the
+            task, see :func:`~selenium_docker.accesslog.HarCapture.har`.
+            ``None`` when the task wasn't sampled.
+    """
+    __slots__ = ()
+
+
+class DriverQueue(object):
+    """ Idle drivers waiting to be checked out, grouped by browser.
+
+    Behaves like a :obj:`gevent.queue.Queue` of drivers with the addition of
+    a browser requirement when getting a driver. Callers waiting for a driver
+    are served in the order they arrived, as long as the driver being
+    returned is compatible with what they asked for.
+
+    Args:
+        maxsize (int): the total number of drivers managed by the pool.
+    """
+
+    ANY = 'any'
+    """str: browser requirement that is satisfied by every driver."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.closed = False
+        self._idle = OrderedDict()  # type: dict[str, deque]
+        self._waiters = deque()     # type: deque[tuple[str, AsyncResult]]
+        self._leased = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def __repr__(self):
+        return '<DriverQueue(idle=%s,leased=%d,waiting=%d)>' % (
+            dict((k, len(v)) for k, v in self._idle.items()),
+            self._leased, len(self._waiters))
+
+    @property
+    def total(self):
+        """int: number of drivers, idle and checked out. """
+        return self.qsize() + self._leased
+
+    @classmethod
+    def browser_of(cls, value):
+        """ Normalize a browser requirement.
+
+        Args:
+            value (str or WebDriver): the name of a browser, a driver class
+                or a driver instance. ``None`` and :attr:`.ANY` match
+                every browser.
+
+        Returns:
+            str: lowercase browser name, or ``None`` for any browser.
+        """
+        if value is None:
+            return None
+        if not isinstance(value, string_types):
+            value = value.BROWSER
+        value = value.lower()
+        if value == cls.ANY:
+            return None
+        return value
+
+    def available(self, browser=None):
+        """ Number of idle drivers that satisfy ``browser``.
+
+        Args:
+            browser (str): browser requirement.
+
+        Returns:
+            int
+        """
+        browser = self.browser_of(browser)
+        if browser is None:
+            return self.qsize()
+        return len(self._idle.get(browser, ()))
+
+    def close(self):
+        """ Stop handing out drivers, waiters are woken with an exception.
+
+        Returns:
+            None
+        """
+        self.closed = True
+        while self._waiters:
+            _, waiter = self._waiters.popleft()
+            waiter.set_exception(
+                DriverPoolRuntimeException('driver pool was closed'))
+
+    def empty(self):
+        """ bool: ``True`` when there are no idle drivers. """
+        return self.qsize() == 0
+
+    def full(self):
+        """ bool: ``True`` when every driver is idle. """
+        return self.qsize() >= self.maxsize
+
+    def get(self, block=True, timeout=None, browser=None):
+        """ Check out an idle driver.
+
+        Args:
+            block (bool): wait for a driver to become available.
+            timeout (float): seconds to wait when ``block`` is ``True``.
+            browser (str): browser requirement, ``None`` for any browser.
+
+        Raises:
+            :exc:`gevent.queue.Empty`: when no compatible driver could be
+                checked out in time.
+
+        Returns:
+            WebDriver
+        """
+        browser = self.browser_of(browser)
+        driver = self._pop(browser)
+        if driver is not None:
+            self._checked_out(0.0)
+            return driver
+        if not block:
+            raise Empty
+        started = time.time()
+        waiter = (browser, AsyncResult())
+        self._waiters.append(waiter)
+        try:
+            driver = waiter[1].get(timeout=timeout)
+        except gevent.Timeout:
+            self._waiters.remove(waiter)
+            self._timeouts += 1
+            raise Empty
+        self._checked_out(time.time() - started)
+        return driver
+
+    def put(self, driver):
+        """ Return a driver, handing it to the first compatible waiter.
+
+        Args:
+            driver (WebDriver): driver instance being returned.
+
+        Returns:
+            None
+        """
+        browser = self.browser_of(driver)
+        self._leased = max(0, self._leased - 1)
+        for waiter in self._waiters:
+            if waiter[0] in (None, browser):
+                self._waiters.remove(waiter)
+                self._leased += 1
+                waiter[1].set(driver)
+                return
+        self._idle.setdefault(browser, deque()).append(driver)
+
+    def discard(self):
+        """ Forget a leased driver that won't be returned, it couldn't be
+        replaced after crashing.
+
+        Returns:
+            None
+        """
+        self._leased = max(0, self._leased - 1)
+        self.maxsize -= 1
+
+    def qsize(self):
+        """ int: number of idle drivers. """
+        return sum(len(v) for v in self._idle.values())
+
+    def stats(self):
+        """ Wait-time metrics for checking out drivers.
+
+        Returns:
+            dict:
+                ``checkouts`` and ``timeouts`` counts, ``waiting`` callers,
+                ``leased`` drivers and the ``wait_total``, ``wait_max``
+                and ``wait_mean`` in seconds.
+        """
+        return {
+            'checkouts': self._checkouts,
+            'timeouts': self._timeouts,
+            'waiting': len(self._waiters),
+            'leased': self._leased,
+            'wait_total': self._wait_total,
+            'wait_max': self._wait_max,
+            'wait_mean': self._wait_total / (self._checkouts or 1)
+        }
+
+    def _checked_out(self, waited):
+        self._checkouts += 1
+        self._wait_total += waited
+        self._wait_max = max(self._wait_max, waited)
+
+    def _pop(self, browser):
+        if browser is None:
+            # take from the most idle browser, scarce browsers are kept
+            #  available for tasks that specifically require them.
+            if not self._idle:
+                return None
+            browser = max(self._idle, key=lambda k: len(self._idle[k]))
+        drivers = self._idle.get(browser)
+        if not drivers:
+            return None
+        self._leased += 1
+        return drivers.popleft()
+
+
+class DomainLimiter(object):
+    """ Politeness limits on the tasks a pool runs against each domain.
+
+    Every domain gets a token bucket refilled at ``rate`` tasks per second
+    holding up to ``burst`` tokens, a task only starts when it can take a
+    token and fewer than ``concurrency`` tasks of its domain are running.
+    Tasks of a throttled domain wait in their job while the idle drivers
+    go to other domains.
+
+    Args:
+        rate (float): tasks started per second and domain, ``None`` for no
+            rate limit.
+        burst (int): tasks that can start at once after a domain was idle.
+        concurrency (int): tasks running at once per domain, ``None`` for
+            no limit.
+        overrides (dict): ``rate``, ``burst`` and ``concurrency`` mappings
+            by domain, replacing the defaults for that domain.
+
+    Example::
+
+        limits = DomainLimiter(rate=0.5, burst=2, concurrency=2,
+                               overrides={'example.com': {'rate': 5}})
+        pool = DriverPool(8, domain_limits=limits)
+        pool.execute(get_title, urls, domain_key=True)
+    """
+
+    MAX_IDLE = 1024
+    """int: idle domains remembered before their state is dropped."""
+
+    def __init__(self, rate=None, burst=1, concurrency=None, overrides=None):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.concurrency = concurrency
+        self.overrides = dict(overrides or {})
+        self._domains = {}  # type: dict[str, list]
+        self._retry_at = None  # type: float
+
+    def __repr__(self):
+        return '<DomainLimiter(rate=%s,burst=%d,concurrency=%s)>' % (
+            self.rate, self.burst, self.concurrency)
+
+    def limits(self, domain):
+        """ The limits applied to ``domain``.
+
+        Returns:
+            tuple(float, int, int): rate, burst and concurrency.
+        """
+        override = self.overrides.get(domain, {})
+        return (override.get('rate', self.rate),
+                max(1, override.get('burst', self.burst)),
+                override.get('concurrency', self.concurrency))
+
+    def running(self, domain):
+        """ Number of tasks of ``domain`` running.
+
+        Returns:
+            int
+        """
+        return self._domains.get(domain, [0, 0.0, 0])[2]
+
+    def allows(self, domain, now=None):
+        """ Check if a task of ``domain`` can start.
+
+        Args:
+            domain (str): the domain of the task, ``None`` is never
+                limited.
+            now (float): UNIX timestamp, defaults to the current time.
+
+        Returns:
+            bool
+        """
+        if domain is None:
+            return True
+        now = time.time() if now is None else now
+        rate, _, concurrency = self.limits(domain)
+        tokens, _, running = self._refill(domain, now)
+        if concurrency is not None and running >= concurrency:
+            return False
+        if rate and tokens < 1:
+            retry_at = now + (1 - tokens) / float(rate)
+            if self._retry_at is None or retry_at < self._retry_at:
+                self._retry_at = retry_at
+            return False
+        return True
+
+    def acquire(self, domain, now=None):
+        """ Count a task of ``domain`` that's starting.
+
+        Returns:
+            None
+        """
+        if domain is None:
+            return
+        state = self._refill(domain, time.time() if now is None else now)
+        state[0] -= 1
+        state[2] += 1
+
+    def release(self, domain):
+        """ Count a task of ``domain`` that's finished.
+
+        Returns:
+            None
+        """
+        state = self._domains.get(domain)
+        if state is not None:
+            state[2] = max(0, state[2] - 1)
+
+    def wait_time(self, now=None):
+        """ Seconds until a domain throttled by its rate gets a token.
+
+        Returns:
+            float: ``None`` when no domain is waiting for a token.
+        """
+        retry_at, self._retry_at = self._retry_at, None
+        if retry_at is None:
+            return None
+        now = time.time() if now is None else now
+        return max(0.0, retry_at - now)
+
+    def _refill(self, domain, now):
+        """ The ``[tokens, updated, running]`` state of ``domain``. """
+        rate, burst, _ = self.limits(domain)
+        state = self._domains.get(domain)
+        if state is None:
+            if len(self._domains) >= self.MAX_IDLE:
+                self._prune(now)
+            state = self._domains[domain] = [float(burst), now, 0]
+        elif rate:
+            state[0] = min(burst, state[0] + (now - state[1]) * rate)
+        else:
+            state[0] = burst
+        state[1] = now
+        return state
+
+    def _prune(self, now):
+        """ Forget the domains that are idle with a full bucket. """
+        for domain, state in list(self._domains.items()):
+            rate, burst, _ = self.limits(domain)
+            full = not rate or state[0] + (now - state[1]) * rate >= burst
+            if state[2] == 0 and full:
+                del self._domains[domain]
+
+
+class DriverLease(object):
+    """ A driver checked out of a :obj:`.DriverPool` by
+    :func:`~DriverPool.lease`.
+
+    Using the lease as a context manager yields the driver and guarantees it
+    is returned to the pool. When the block raises an exception the driver is
+    recycled (for exceptions in ``catch``) or reset before it's returned.
+
+    Attributes:
+        driver (WebDriver): the leased driver instance.
+        wait_time (float): seconds spent waiting for the driver.
+        released (bool): the driver has been returned to the pool.
+    """
+
+    def __init__(self, pool, queue, driver, wait_time, catch):
+        self.driver = driver
+        self.wait_time = wait_time
+        self.released = False
+        self._pool = pool
+        self._queue = queue
+        self._catch = catch
+
+    def __repr__(self):
+        return '<DriverLease(driver=%s,wait=%.3f,released=%s)>' % (
+            getattr(self.driver, 'name', self.driver), self.wait_time,
+            self.released)
+
+    def __enter__(self):
+        return self.driver
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release(exc_val)
+        return False
+
+    def release(self, error=None):
+        """ Return the driver to the pool it was leased from.
+
+        Args:
+            error (Exception): the exception raised while the driver was
+                in use, if any.
+
+        Returns:
+            None
+        """
+        if self.released:
+            return
+        self.released = True
+        self._pool._release_driver(
+            self._queue, self.driver, error, self._catch)
+
+
+def url_domain(url):
+    """ Domain of a URL task for :obj:`.DomainLimiter`, every host of a site
+    shares its limits.
+
+    Args:
+        url (str): the task.
+
+    Returns:
+        str: see :func:`~selenium_docker.proxy.site_key`.
+    """
+    return site_key(urlparse(url).hostname or '')
+
+
+class PoolJob(object):
+    """ A stream of tasks processed by a :obj:`.DriverPool`.
+
+    Jobs are created by :func:`~DriverPool.execute` and
+    :func:`~DriverPool.execute_async`. Each job has its own tasks and its own
+    results, several jobs can run at the same time sharing the pool's drivers.
+    Idle drivers are handed to the job with the fewest tasks running so every
+    job gets a fair share of the pool.
+
+    Args:
+        pool (:obj:`.DriverPool`): the pool running the tasks.
+        fn (Callable): function that takes two parameters, ``driver`` and
+            ``task``.
+        callback (Callable): function that takes a single parameter, the
+            return value of ``fn`` when its finished processing.
+        catch (tuple[Exception]): exceptions that cause the driver to be
+            recycled instead of stopping the job.
+        requeue_task (bool): re-add a task when one of the ``catch``
+            exceptions is raised while it's processed.
+        browser_key (Callable): function that takes a single parameter, the
+            ``task``, and returns the browser it must run on.
+        preserve_order (bool): return results in the order the tasks were
+            added.
+        no_wait (bool): forgo a small sleep interval between finishing a task
+            and returning the driver to the pool.
+        is_async (bool): exceptions outside of ``catch`` are logged instead of
+            stopping the job.
+        window (int): with ``preserve_order``, the maximum number of tasks
+            that can be running or waiting to be returned in order. Items are
+            read lazily and no new task starts until the oldest result in the
+            window has been consumed.
+        speculate_after (float): with ``preserve_order``, seconds after which
+            the task holding back the results is started again on another
+            idle driver. The first copy to finish wins.
+        record_tasks (bool): mark the start and end of each task in the
+            recording of video drivers and return :obj:`.TaskResult` results.
+        discard_passed (bool): with ``record_tasks``, delete the footage of
+            tasks that succeeded from the container right away.
+        recordings_path (str): with ``record_tasks``, local directory where
+            the footage of failed tasks is copied before the driver is
+            recycled.
+        network_stats (bool): summarize the proxy traffic of each task and
+            return :obj:`.TaskResult` results.
+        capture_network (bool or float): fraction of the tasks whose proxy
+            requests are returned as a HAR log in :obj:`.TaskResult`
+            results, ``True`` for every task.
+        domain_key (Callable): function that takes a single parameter, the
+            ``task``, and returns the domain the pool's
+            :obj:`.DomainLimiter` applies to it. ``True`` when the tasks
+            are URLs.
+
+    Attributes:
+        name (str): identifier of the job.
+        error (Exception): the exception that stopped the job, if any.
+        speculated (int): number of tasks that were started a second time.
+        failed_recordings (list(:obj:`~selenium_docker.video.TaskRecording`)):
+            recordings of every task that raised an exception, including
+            attempts that were requeued.
+        prefetch (:obj:`gevent.Greenlet`): warm-up of the proxy cache
+            started with the job, its value is a
+            :obj:`~selenium_docker.proxy.PrefetchResult`.
+    """
+
+    LOOKAHEAD = 64
+    """int: number of pending tasks inspected when looking for one that can
+    run on the idle drivers. Tasks sharing the browser and domain of a task
+    that was already turned down are skipped without counting."""
+
+    def __init__(self, pool, fn, callback=None, catch=(), requeue_task=False,
+                 browser_key=None, preserve_order=False, no_wait=False,
+                 is_async=False, window=None, speculate_after=None,
+                 record_tasks=False, discard_passed=False,
+                 recordings_path=None, network_stats=False,
+                 capture_network=False, domain_key=None):
+        if window is not None and window < 1:
+            raise DriverPoolValueError('window must be at least 1')
+        self.name = gen_uuid(8)
+        self.pool = pool
+        self.fn = fn
+        self.callback = callback
+        self.catch = catch
+        self.requeue_task = requeue_task
+        self.browser_key = browser_key
+        if domain_key is True:
+            domain_key = url_domain
+        self.domain_key = domain_key
+        self.preserve_order = preserve_order
+        self.no_wait = no_wait
+        self.is_async = is_async
+        self.window = window
+        self.speculate_after = speculate_after
+        self.speculated = 0
+        self.record_tasks = record_tasks
+        self.discard_passed = discard_passed
+        self.recordings_path = recordings_path
+        self.network_stats = network_stats
+        self.capture_network = capture_network
+        self.failed_recordings = []  # type: list[TaskRecording]
+        self.prefetch = None  # type: gevent.Greenlet
+        self.error = None
+        self.closed = False
+        self.stopped = False
+        self.logger = getLogger('%s.PoolJob.%s' % (__name__, self.name))
+
+        self._added = 0
+        self._completed = 0
+        self._running = 0
+        self._served = 0
+        self._pending = deque()  # type: deque[tuple[int, Any, str, str]]
+        self._source = None  # type: Iterator
+        self._started = {}  # type: dict[int, list]
+        self._results = Queue()
+        self._reorder = {}
+        self._next_result = 0
+        self._delivered = 0
+        self._done = Event()
+
+    def __repr__(self):
+        return '<PoolJob-%s(pending=%d,running=%d,async=%s)>' % (
+            self.name, self.pending, self.running, self.is_async)
+
+    @property
+    def is_done(self):
+        """bool: no tasks are left and no more will be added. """
+        return self._done.is_set()
+
+    @property
+    def is_complete(self):
+        """bool: every task that will be added has a result. Speculative
+        copies of a task may still be running.
+        """
+        return (self.closed and self._source is None and
+                not self._pending and self._completed == self._added)
+
+    @property
+    def is_idle(self):
+        """bool: there are no tasks pending or running right now. """
+        return (not self._pending and not self._running and
+                self._source is None)
+
+    @property
+    def pending(self):
+        """int: number of tasks waiting for a driver. """
+        return len(self._pending)
+
+    @property
+    def running(self):
+        """int: number of tasks being processed. """
+        return self._running
+
+    def add(self, *items):
+        """ Add items to this job's tasks.
+
+        Args:
+            items (list(Any)): items that need processing. A single list is
+                expanded to its items.
+
+        Raises:
+            DriverPoolValueError: when there are no items, or an item's
+                browser isn't run by the pool.
+            DriverPoolRuntimeException: when the job is already finished.
+
+        Returns:
+            None
+        """
+        if len(items) == 1 and isinstance(items[0], list):
+            items = items[0]
+        if not items:
+            raise DriverPoolValueError(
+                'cannot add items with value: %s' % str(items))
+        if self.closed or self.stopped:
+            raise DriverPoolRuntimeException('cannot add tasks, job finished')
+        self._extend(items)
+
+    def close(self):
+        """ Stop accepting tasks, the job is done once its tasks are.
+
+        Returns:
+            None
+        """
+        self.closed = True
+        self._check_done()
+
+    def results(self, block=True):
+        """ Iterate over this job's results.
+
+        Args:
+            block (bool): when ``True``, block until all the tasks have been
+                processed. Otherwise only the results that are already
+                finished are returned.
+
+        Yields:
+            results: one result at a time as they're finished.
+        """
+        while True:
+            while not self._results.empty():
+                self._delivered += 1
+                if self.window is not None:
+                    # room in the window, more tasks can start
+                    self.pool._wakeup.set()
+                yield self._results.get()
+            if not block or self.is_idle or self.is_complete:
+                return
+            try:
+                self._results.peek(timeout=self.pool.INNER_THREAD_SLEEP)
+            except Empty:
+                pass
+
+    def stop(self, timeout=None):
+        """ Discard the pending tasks and wait for the running ones.
+
+        Args:
+            timeout (float): seconds to wait for the running tasks.
+
+        Returns:
+            int: the number of tasks that were discarded.
+        """
+        self.stopped = True
+        discarded = len(self._pending)
+        self._pending.clear()
+        self._source = None
+        self._check_done()
+        self._done.wait(timeout)
+        return discarded
+
+    def wait(self, timeout=None):
+        """ Block until the job is done.
+
+        Args:
+            timeout (float): seconds to wait.
+
+        Returns:
+            bool: ``True`` when the job is done.
+        """
+        return self._done.wait(timeout)
+
+    def _abandon(self):
+        """ Forget the pending and running tasks when the pool is closed. """
+        self.stopped = True
+        self._pending.clear()
+        self._source = None
+        self._started.clear()
+        self._running = 0
+        self._check_done()
+
+    def _check_done(self):
+        if self.is_idle and (self.closed or self.stopped):
+            # tasks that were never finished leave gaps, flush what we have
+            for index in sorted(self._reorder):
+                self._results.put(self._reorder.pop(index))
+            self._done.set()
+
+    def _append(self, item):
+        browser = None
+        if self.browser_key:
+            browser = self.pool._check_browser(self.browser_key(item))
+        domain = self.domain_key(item) if self.domain_key else None
+        self._pending.append((self._added, item, browser, domain))
+        self._added += 1
+
+    def _extend(self, items):
+        count = 0
+        for item in items:
+            self._append(item)
+            count += 1
+        self.logger.debug('adding %d additional items to tasks', count)
+        self.pool._wakeup.set()
+
+    def _fail(self, task, error):
+        self._running -= 1
+        if self._started.pop(task[0], None) is None:
+            # a speculative copy of this task already finished
+            self._check_done()
+            return
+        self.error = error
+        self.stopped = True
+        self._pending.clear()
+        self._source = None
+        self._check_done()
+
+    def _fill(self):
+        """ Read items from a lazy source while the window has room. """
+        while self._source is not None:
+            if len(self._pending) >= self.LOOKAHEAD:
+                break
+            if self.window is not None and \
+                    self._added >= self._delivered + self.window:
+                break
+            try:
+                item = next(self._source)
+            except StopIteration:
+                self._source = None
+                self._check_done()
+            except Exception as e:
+                self.logger.exception(e, exc_info=True)
+                self.error = e
+                self.stopped = True
+                self._source = None
+                self._check_done()
+            else:
+                self._append(item)
+
+    def _finish(self, task, value):
+        self._running -= 1
+        entry = self._started.pop(task[0], None)
+        if entry is None:
+            # a speculative copy of this task already finished
+            self._check_done()
+            return
+        if entry[1] > 1:
+            self.logger.debug('task %d finished, %d copies were running',
+                              task[0], entry[1])
+        self._completed += 1
+        if self.preserve_order:
+            self._reorder[task[0]] = value
+            while self._next_result in self._reorder:
+                self._results.put(self._reorder.pop(self._next_result))
+                self._next_result += 1
+        else:
+            self._results.put(value)
+        if self.callback:
+            try:
+                self.callback(value)
+            except Exception as e:
+                self.logger.exception(e, exc_info=True)
+        self._check_done()
+
+    def _requeue(self, task):
+        self._running -= 1
+        entry = self._started.get(task[0])
+        if entry is not None and entry[1] > 1:
+            # another copy is still running, let it finish the task
+            entry[1] -= 1
+            return
+        self._started.pop(task[0], None)
+        self._pending.appendleft(task)
+
+    def _speculate(self, accept):
+        """ Start another copy of the task holding back ordered results. """
+        if not self.preserve_order or self.speculate_after is None:
+            return None
+        entry = self._started.get(self._next_result)
+        if entry is None or entry[1] > 1:
+            return None
+        started, _, task = entry
+        if time.time() - started < self.speculate_after or not accept(task):
+            return None
+        self.logger.debug('speculatively restarting task %d', task[0])
+        entry[1] += 1
+        self._running += 1
+        self.speculated += 1
+        return task
+
+    def _take(self, accept):
+        """ Remove the first pending task ``accept`` allows to run. """
+        self._fill()
+        end = None
+        if self.window is not None:
+            end = self._delivered + self.window
+        inspected, refused = 0, set()
+        for i, task in enumerate(self._pending):
+            if inspected >= self.LOOKAHEAD:
+                break
+            # a throttled domain or busy browser turns down all its tasks,
+            #  look past them for one that can run
+            key = task[2:4]
+            if key in refused:
+                continue
+            inspected += 1
+            if end is not None and task[0] >= end:
+                continue
+            if accept(task):
+                del self._pending[i]
+                self._running += 1
+                self._started[task[0]] = [time.time(), 1, task]
+                return task
+            refused.add(key)
+        return self._speculate(accept)
+
+
 class DriverPool(object):
     """ Create a pool of available Selenium containers for processing.
 
     Args:
-        size (int): maximum concurrent tasks. Must be at least ``2``.
-        driver_cls (WebDriver):
+        size (int): maximum concurrent tasks. Must be at least ``2``. When
+            ``driver_cls`` is a mapping the size is the sum of the
+            capacities instead.
+        driver_cls (WebDriver or dict): driver class used for every driver
+            in the pool, or a mapping of driver classes to the number of
+            drivers of that class to create.
         driver_cls_args (tuple):
         driver_cls_kw (dict):
-        use_proxy (bool):
+        use_proxy (bool or dict): put the drivers behind a caching proxy,
+            a mapping is passed as keyword arguments to
+            :attr:`~DriverPool.PROXY_CLS` to configure its cache. An existing
+            :obj:`~selenium_docker.proxy.SquidProxy` or
+            :obj:`~selenium_docker.proxy.ProxyPool` is used as is and never
+            removed by the pool.
+        proxies (int): number of proxy containers, more than one creates a
+            :attr:`~DriverPool.PROXY_POOL_CLS` sharing the browsers between
+            them.
+        proxy_strategy (str): how browsers are assigned to the proxies,
+            see :obj:`~selenium_docker.proxy.ProxyPool`.
+        keep_proxy (bool): keep the proxy the pool created, and its cache,
+            running when the drivers are cleaned up after
+            :func:`~DriverPool.execute`. It's removed by
+            :func:`~DriverPool.close`.
         factory (:obj:`~selenium_docker.base.ContainerFactory`):
         name (str):
         logger (:obj:`logging.Logger`):
+        exporter (:obj:`~selenium_docker.video.VideoExporter`): background
+            exporter handed to video drivers so recordings are copied out
+            without holding up the pool. One is created automatically when
+            the pool contains video drivers.
+        domain_limits (:obj:`.DomainLimiter` or dict): politeness limits
+            shared by every job of the pool, a mapping is passed as keyword
+            arguments to :obj:`.DomainLimiter`. Only tasks of jobs with a
+            ``domain_key`` are limited.
 
     Example::
 
@@ -76,8 +918,33 @@ class DriverPool(object):
         for result in pool.execute(get_title, urls):
             print(result)
 
+    Mixing browsers in a single pool, tasks are routed to a driver of the
+    browser returned by ``browser_key``; ``None`` or ``'any'`` will run on
+    whichever driver is idle::
+
+        pool = DriverPool(None, {ChromeDriver: 3, FirefoxDriver: 2})
+
+        tasks = [('chrome', 'https://google.com'),
+                 ('firefox', 'https://reddit.com'),
+                 ('any', 'https://yahoo.com')]
+
+        def get_title(driver, task):
+            driver.get(task[1])
+            return driver.title
+
+        for result in pool.execute(get_title, tasks,
+                                   browser_key=lambda t: t[0]):
+            print(result)
+
+    A single pool can run several jobs at once, each with its own tasks and
+    results, by calling :func:`~DriverPool.execute` from separate greenlets
+    or starting more than one :func:`~DriverPool.execute_async`::
 
+        titles = pool.execute_async(get_title, urls)
+        screenshots = pool.execute_async(take_screenshot, urls)
 
+        for result in titles.results():
+            print(result)
     """
 
     INNER_THREAD_SLEEP = 0.5
@@ -90,23 +957,46 @@ class DriverPool(object):
     when ``use_proxy=True`` during pool instantiation.
     """
 
+    PROXY_POOL_CLS = ProxyPool
+    """:obj:`~selenium_docker.proxy.ProxyPool`: created instead of
+    :attr:`~DriverPool.PROXY_CLS` when the pool uses several proxies.
+    """
+
     def __init__(self, size, driver_cls=ChromeDriver, driver_cls_args=None,
                  driver_cls_kw=None, use_proxy=True, factory=None, name=None,
-                 logger=None):
-        self.size = max(2, size)
+                 logger=None, exporter=None, proxies=1,
+                 proxy_strategy='hash', keep_proxy=False,
+                 domain_limits=None):
+        if isinstance(driver_cls, Mapping):
+            self._driver_classes = OrderedDict(
+                sorted(driver_cls.items(), key=lambda kv: kv[0].__name__))
+            size = sum(self._driver_classes.values())
+        else:
+            size = max(2, size)
+            self._driver_classes = OrderedDict([(driver_cls, size)])
+        self.size = size
         self.name = name or gen_uuid(6)
         self.factory = factory or ContainerFactory.get_default_factory()
         self.logger = logger or getLogger(
             '%s.DriverPool.%s' % (__name__, self.name))
 
-        self._driver_cls = driver_cls
         self._driver_cls_args = driver_cls_args or tuple()
         self._driver_cls_kw = driver_cls_kw or dict()
-        self._drivers = Queue(maxsize=self.size)
+        self._drivers = DriverQueue(maxsize=self.size)
+
+        if exporter is None and any(
+                issubclass(cls, VideoDriver) for cls in self._driver_classes):
+            exporter = VideoExporter(size=self.size, logger=self.logger)
+        self.exporter = exporter  # type: VideoExporter
 
         # post init inspections
-        if not hasattr(self._driver_cls, 'CONTAINER'):
-            raise DriverPoolValueError('driver_cls must extend DockerDriver')
+        for cls, capacity in self._driver_classes.items():
+            if not hasattr(cls, 'CONTAINER'):
+                raise DriverPoolValueError(
+                    'driver_cls must extend DockerDriver')
+            if not isinstance(capacity, int) or capacity < 1:
+                raise DriverPoolValueError(
+                    'invalid capacity %s for %s' % (capacity, cls.__name__))
 
         if not isiterable(self._driver_cls_args):
             raise DriverPoolValueError(
@@ -117,19 +1007,35 @@ class DriverPool(object):
                 '%s is not a valid mapping' % self._driver_cls_kw)
 
         # determine proxy usage
+        self._prepare_lock = Semaphore()
         self.proxy = None
-        self._use_proxy = use_proxy  # type: bool
+        self._owns_proxy = True  # type: bool
+        if hasattr(use_proxy, 'selenium_proxy'):
+            self.proxy, self._owns_proxy = use_proxy, False
+        self._keep_proxy = keep_proxy  # type: bool
+        self._use_proxy = bool(use_proxy)  # type: bool
+        self._proxy_kw = dict(use_proxy) \
+            if isinstance(use_proxy, Mapping) else {}
+        self._proxies = max(1, proxies)  # type: int
+        self._proxy_strategy = proxy_strategy  # type: str
+        self.access_log = None  # type: AccessLog
+
+        if isinstance(domain_limits, Mapping):
+            domain_limits = DomainLimiter(**domain_limits)
+        self.limiter = domain_limits  # type: DomainLimiter
 
         # deferred instantiation
         self._pool = None  # type: Pool
-        self._results = None  # type: Queue
-        self._tasks = None  # type: JoinableQueue
+        self._jobs = []  # type: list[PoolJob]
+        self._job = None  # type: PoolJob
+        self._served = 0  # type: int
         self._processing = False  # type: bool
-        self.__feeder_green = None  # type: gevent.Greenlet
+        self._wakeup = Event()
+        self.__dispatcher = None  # type: gevent.Greenlet
 
     def __repr__(self):
         return '<DriverPool-%s(size=%d,driver=%s,proxy=%s,async=%s)>' % (
-            self.name, self.size, self._driver_cls.BROWSER,
+            self.name, self.size, ','.join(self.browsers),
             self._use_proxy, self.is_async)
 
     def __iter__(self):
@@ -142,6 +1048,11 @@ class DriverPool(object):
             if hasattr(self, 'logger'):
                 self.logger.exection(e, exc_info=False)
 
+    @property
+    def browsers(self):
+        """list(str): names of the browsers available in this pool. """
+        return [cls.BROWSER for cls in self._driver_classes]
+
     @property
     def is_processing(self):
         """bool: whether or not we're currently processing tasks. """
@@ -150,43 +1061,90 @@ class DriverPool(object):
     @property
     def is_async(self):
         """bool: returns True when asynchronous processing is happening. """
-        return self.__feeder_green is not None
+        return any(j.is_async and not j.stopped for j in self._jobs)
+
+    @property
+    def jobs(self):
+        """list(:obj:`.PoolJob`): jobs that haven't finished yet. """
+        return [j for j in self._jobs if not (j.is_done or j.is_complete)]
 
     def __bootstrap(self):
-        """ Prepare this driver pool instance to batch execute task items. """
-        if self.is_processing:
-            # cannot run two executions simultaneously
-            raise DriverPoolRuntimeException(
-                'cannot bootstrap pool, already running')
-        if self._results and self._results.qsize():  # pragma: no cover
-            self.logger.debug('pending results being discarded')
-        if self._tasks and self._tasks.qsize():  # pragma: no cover
-            self.logger.debug('pending tasks being discarded')
-        if self._pool:  # pragma: no cover
-            self.logger.debug('killing processing pool')
-            self._pool.join(timeout=10.0)
-            self._pool.kill()
-            self._pool = None
-        if self._use_proxy and not self.proxy:
-            # defer proxy instantiation -- since spinning up a squid proxy
-            #  docker container is surprisingly time consuming.
-            self.logger.debug('bootstrapping squid proxy')
-            self.proxy = self.PROXY_CLS(factory=self.factory)
+        """ Prepare this driver pool instance to batch execute task items.
+
+        Calling this while the pool is already processing is a no-op, new
+        jobs share the running drivers and dispatcher.
+        """
+        self.__prepare()
+        if self._processing:
+            return
         self.logger.debug('bootstrapping pool processing')
         self._processing = True
-        self._results = Queue()
-        self._tasks = JoinableQueue()
-        self._load_drivers()
         # create our processing pool with headroom over the number of drivers
         #  requested for this processing pool.
         self._pool = Pool(size=self.size + math.ceil(self.size * 0.25))
+        self.__dispatcher = gevent.spawn(self.__dispatch)
+
+    def __dispatch(self):
+        """ Hand idle drivers to pending tasks until the pool is closed. """
+        self.logger.debug('starting dispatcher thread')
+        while self._processing:
+            self._wakeup.clear()
+            self._jobs = self.jobs
+            while not self._drivers.empty():
+                pick = self._next_task()
+                if pick is None:
+                    break
+                job, task = pick
+                queue = self._drivers
+                driver = queue.get(block=False, browser=task[2])
+                self._pool.spawn(self._run_task, job, task, queue, driver)
+            timeout = self.INNER_THREAD_SLEEP
+            if self.limiter is not None:
+                # wake up when the next throttled domain gets a token
+                delay = self.limiter.wait_time()
+                if delay is not None:
+                    timeout = max(0.01, min(timeout, delay))
+            self._wakeup.wait(timeout=timeout)
+
+    def __submit(self, job):
+        """ Start the pool if needed and schedule ``job``'s tasks. """
+        self.__bootstrap()
+        if job.network_stats or job.capture_network:
+            self.start_access_log()
+        self._jobs.append(job)
+        self._job = job
+        return job
+
+    def __prepare(self):
+        """ Create the proxy and driver containers, if they don't exist. """
+        with self._prepare_lock:
+            self.__prepare_proxy()
+            self._load_drivers()
+
+    def __prepare_proxy(self):
+        """ Create the proxy if the pool uses one and it doesn't exist. """
+        if self._use_proxy and not self.proxy:
+            # defer proxy instantiation -- since spinning up a squid
+            #  proxy docker container is surprisingly time consuming.
+            self.logger.debug('bootstrapping squid proxy')
+            if self._proxies > 1:
+                self.proxy = self.PROXY_POOL_CLS(
+                    self._proxies, self._proxy_strategy,
+                    factory=self.factory, **self._proxy_kw)
+            else:
+                self.proxy = self.PROXY_CLS(factory=self.factory,
+                                            **self._proxy_kw)
 
-    def __cleanup(self, force=False):
+    def __cleanup(self, force=False, keep_proxy=False):
         """ Stop and remove the web drivers and their containers. This function
         should not remove pending tasks or results. It should be possible to
         cleanup all the external resources of a driver pool and still extract
         the results of the work that was completed.
 
+        Args:
+            force (bool): cleanup even while tasks are being processed.
+            keep_proxy (bool): leave the proxy the pool created running.
+
         Raises:
             DriverPoolRuntimeException: when attempting to cleanup an
                 environment while processing is still happening, and forcing
@@ -204,9 +1162,15 @@ class DriverPool(object):
         self._processing = False
         squid = None  # type: gevent.Greenlet
         error = None  # type: SeleniumDockerException
-        if self.proxy:
+        if self.access_log is not None:
+            self.access_log.stop()
+        if self.proxy and self._owns_proxy and not keep_proxy:
             self.logger.debug('closing squid proxy')
             squid = gevent.spawn(self.proxy.quit)
+        if self.__dispatcher:
+            self.logger.debug('killing dispatcher thread')
+            self.__dispatcher.kill(block=False)
+            self.__dispatcher = None
         if self._pool:  # pragma: no cover
             self.logger.debug('emptying task pool')
             if not force:
@@ -214,34 +1178,62 @@ class DriverPool(object):
             self._pool.kill(block=False,
                             timeout=10.0)
             self._pool = None
+        for job in self._jobs:
+            job._abandon()
+        self._jobs = []
         self.logger.debug('closing all driver containers')
-        while not self._drivers.empty():
-            d = self._drivers.get(block=True)
+        drivers, self._drivers = self._drivers, DriverQueue(self.size)
+        # leased drivers are closed when they're released
+        drivers.close()
+        while not drivers.empty():
+            d = drivers.get(block=True)
+            self._release_proxy(d)
             try:
                 d.quit()
             except SeleniumDockerException as e:  # pragma: no cover
                 self.logger.exception(e, exc_info=True)
                 if not force:
                     error = e
-        if self.proxy:
+        if self.exporter and self.exporter.pending:
+            self.logger.debug('waiting for %d video exports',
+                              self.exporter.pending)
+            self.exporter.join()
+        if squid is not None:
             squid.join()
             self.proxy = None
         if error:  # pragma: no cover
             raise error
 
-    def _load_driver(self, and_add=True):
+    def _load_driver(self, and_add=True, driver_cls=None):
         """ Load a single web driver instance and container. """
+        if driver_cls is None:
+            driver_cls = next(iter(self._driver_classes))
         args = self._driver_cls_args
         kw = dict(self._driver_cls_kw)
+        proxy = self.proxy
+        if isinstance(proxy, ProxyPool):
+            proxy = proxy.assign()
         kw.update({
-            'proxy': self.proxy,
+            'proxy': proxy,
             'factory': self.factory,
         })
-        driver = self._driver_cls(*args, **kw)
+        if self.exporter and issubclass(driver_cls, VideoDriver):
+            kw.setdefault('exporter', self.exporter)
+        try:
+            driver = driver_cls(*args, **kw)
+        except Exception:
+            if isinstance(self.proxy, ProxyPool):
+                self.proxy.release(proxy)
+            raise
         if and_add:
             self._drivers.put(driver)
         return driver
 
+    def _release_proxy(self, driver):
+        """ Stop counting a driver that's going away against its proxy. """
+        if isinstance(self.proxy, ProxyPool):
+            self.proxy.release(driver.proxy_container)
+
     def _load_drivers(self):
         """ Load the web driver instances and containers.
 
@@ -252,23 +1244,282 @@ class DriverPool(object):
         Returns:
             None
         """
-        if not self._drivers.empty():  # pragma: no cover
+        if self._drivers.total:  # pragma: no cover
             return
         threads = []
-        for o in range(self.size):
-            self.logger.debug('creating driver %d of %d', o + 1, self.size)
-            thread = gevent.spawn(self._load_driver)
-            threads.append(thread)
+        for cls, capacity in self._driver_classes.items():
+            for o in range(capacity):
+                self.logger.debug('creating %s driver %d of %d',
+                                  cls.BROWSER, o + 1, capacity)
+                thread = gevent.spawn(self._load_driver, driver_cls=cls)
+                threads.append(thread)
         for t in reversed(threads):
             t.join()
-        if not self._drivers.full():
+        if self._drivers.total < self.size:
             raise DriverPoolRuntimeException(
                 'unable to fulfill required concurrent drivers, %d of %d' % (
-                    self._drivers.qsize(), self.size))
+                    self._drivers.total, self.size))
+
+    def _next_task(self):
+        """ Pick the next task to run on an idle driver.
+
+        Jobs with the fewest running tasks are served first, ties go to the
+        job that was served least recently. Tasks of domains held back by
+        :attr:`~DriverPool.limiter` are skipped.
+
+        Returns:
+            tuple(:obj:`.PoolJob`, tuple):
+                the job and the task taken from it, or ``None`` when no
+                pending task can run on the idle drivers.
+        """
+        def accept(task):
+            if not self._drivers.available(task[2]):
+                return False
+            return self.limiter is None or self.limiter.allows(task[3], now)
+
+        now = time.time()
+        jobs = sorted(self._jobs, key=lambda j: (j.running, j._served))
+        for job in jobs:
+            task = job._take(accept)
+            if task is not None:
+                if self.limiter is not None:
+                    self.limiter.acquire(task[3], now)
+                self._served += 1
+                job._served = self._served
+                return job, task
+        return None
+
+    def _run_task(self, job, task, queue, driver):
+        """ Process a single task of ``job`` with ``driver``.
+
+        Args:
+            job (:obj:`.PoolJob`): the job the task belongs to.
+            task (tuple): the item number, the item, its browser and its
+                domain.
+            queue (:obj:`.DriverQueue`): the queue the driver came from.
+            driver (WebDriver): the driver checked out for the task.
+
+        Returns:
+            None
+        """
+        index, item = task[:2]
+        ret_val, error, recording = None, None, None
+        job.logger.debug('doing work on item %d', index)
+        started, tracker = None, None
+        if job.record_tasks and isinstance(driver, VideoDriver):
+            started = self._start_task_recording(job, driver)
+        capture = bool(job.capture_network) and \
+            random.random() < job.capture_network
+        if job.network_stats or capture:
+            tracker = self._track_network(
+                driver, HarCapture if capture else Tracker)
+        try:
+            ret_val = job.fn(driver, item)
+        except gevent.GreenletExit:
+            # killed by the cleanup of the pool, close the driver with it
+            self._release_driver(queue, driver)
+            raise
+        except Exception as e:
+            error = e
+        if tracker is not None:
+            # later requests of the driver belong to its next task
+            tracker.until = time.time()
+        if self.limiter is not None:
+            self.limiter.release(task[3])
+        if started is not None:
+            recording = self._stop_task_recording(
+                job, driver, index, started, error is not None)
+        caught = error is not None and isinstance(error, job.catch)
+        if not job.no_wait:
+            gevent.sleep(self.INNER_THREAD_SLEEP)
+        self._release_driver(queue, driver, error if caught else None,
+                             job.catch)
+        if job.record_tasks or job.network_stats or job.capture_network:
+            ret_val = TaskResult(ret_val, recording, None, None)
+        if tracker is not None:
+            # the proxy logs the last requests after the task returned,
+            #  wait for them without keeping the driver from the next task.
+            gevent.spawn(self._settle_task, job, task, ret_val, error,
+                         caught, tracker, capture)
+        else:
+            self._finish_task(job, task, ret_val, error, caught)
+
+    def _settle_task(self, job, task, result, error, caught, tracker,
+                     capture):
+        """ Add the proxy requests of a task to its result once the ones
+        received before it returned have been logged, then finish the task.
+
+        Args:
+            job (:obj:`.PoolJob`): the job the task belongs to.
+            task (tuple): the task.
+            result (:obj:`.TaskResult`): result of the task so far.
+            error (Exception): raised by the task, ``None`` if it passed.
+            caught (bool): ``error`` is one of the job's ``catch`` types.
+            tracker (:obj:`~selenium_docker.accesslog.Tracker`): requests
+                of the driver during the task.
+            capture (bool): the task was sampled for a HAR log.
+
+        Returns:
+            None
+        """
+        network, har = None, None
+        try:
+            self.access_log.untrack(tracker)
+            if job.network_stats:
+                network = tracker.summary()
+            if capture:
+                har = tracker.har('%s-%d' % (job.name, task[0]))
+        except Exception as e:
+            job.logger.exception(e, exc_info=True)
+        self._finish_task(job, task, result._replace(network=network, har=har),
+                          error, caught)
+
+    def _finish_task(self, job, task, ret_val, error, caught):
+        """ Hand the outcome of a task to its job.
+
+        Args:
+            job (:obj:`.PoolJob`): the job the task belongs to.
+            task (tuple): the task.
+            ret_val: the result of the task.
+            error (Exception): raised by the task, ``None`` if it passed.
+            caught (bool): ``error`` is one of the job's ``catch`` types.
+
+        Returns:
+            None
+        """
+        if error is None:
+            job._finish(task, ret_val)
+        elif caught or job.is_async:
+            job.logger.exception(error, exc_info=True)
+            if caught and job.requeue_task and not job.stopped:
+                job._requeue(task)
+            else:
+                job._finish(task, ret_val)
+        else:
+            # a blocking execution stops at the first unexpected exception
+            job._fail(task, error)
+        self._wakeup.set()
+
+    def _check_browser(self, browser):
+        """ Make sure a task's browser requirement can be satisfied.
+
+        Args:
+            browser (str or WebDriver): value returned by ``browser_key``.
+
+        Raises:
+            DriverPoolValueError: when none of the pool's drivers run the
+                browser, the task would never be started.
+
+        Returns:
+            the unchanged ``browser``.
+        """
+        try:
+            name = DriverQueue.browser_of(browser)
+        except AttributeError:
+            name = browser
+        if name is not None and \
+                name not in [b.lower() for b in self.browsers]:
+            raise DriverPoolValueError(
+                'no %s driver in the pool, expected one of %s' % (
+                    browser, ', '.join(self.browsers)))
+        return browser
+
+    def _driver_address(self, driver):
+        """ IP address the requests of ``driver`` reach the proxy from.
+
+        Returns:
+            str: ``None`` without a user-defined network, every driver's
+            requests then come from the address of the Docker host.
+        """
+        network = self.factory.network
+        if network is None or driver.container is None:
+            return None
+        try:
+            networks = driver.container.attrs['NetworkSettings']['Networks']
+            return networks[network.name]['IPAddress'] or None
+        except (KeyError, TypeError):
+            return None
+
+    def _track_network(self, driver, tracker_cls=Tracker):
+        """ Start collecting the proxy requests of ``driver`` for a task.
+
+        Args:
+            driver (WebDriver): the driver running the task.
+            tracker_cls (type): class collecting the requests.
+
+        Returns:
+            :obj:`~selenium_docker.accesslog.Tracker`: or ``None`` when the
+            requests can't be attributed to the driver.
+        """
+        address = self._driver_address(driver)
+        if self.access_log is None or address is None:
+            return None
+        return self.access_log.track(address, tracker_cls, since=time.time())
+
+    def _start_task_recording(self, job, driver):
+        """ Mark the start of a task in a video driver's recording.
+
+        Returns:
+            float: UNIX timestamp of the start of the task.
+        """
+        try:
+            if driver.segment_time == VideoDriver.SEGMENT_PER_TASK:
+                driver.start_segment()
+        except Exception as e:  # pragma: no cover
+            job.logger.exception(e, exc_info=True)
+        return time.time()
+
+    def _stop_task_recording(self, job, driver, index, started, failed):
+        """ Mark the end of a task in a video driver's recording.
+
+        Footage of failed tasks is copied to ``job.recordings_path``, footage
+        of tasks that passed is discarded when ``job.discard_passed`` is set.
+
+        Args:
+            job (:obj:`.PoolJob`): the job the task belongs to.
+            driver (:obj:`~selenium_docker.drivers.VideoDriver`):
+            index (int): item number of the task in the job.
+            started (float): UNIX timestamp of the start of the task.
+            failed (bool): the task raised an exception.
+
+        Returns:
+            :obj:`~selenium_docker.video.TaskRecording`
+        """
+        ended, offset, segments, files = time.time(), None, [], []
+        task = '%s-%d' % (job.name, index)
+        try:
+            if driver.segment_time == VideoDriver.SEGMENT_PER_TASK:
+                if driver.is_recording:
+                    segment = driver.stop_segment()
+                    started, ended = segment.start, segment.end
+            driver.mark_task(task, started, ended)
+            if driver.is_segmented:
+                segments = [seg for seg in driver.segments()
+                            if seg.overlaps(started, ended)]
+            elif driver.recording_started is not None:
+                offset = started - driver.recording_started
+            if failed and job.recordings_path and segments:
+                files = driver.fetch_segments(
+                    job.recordings_path, started, ended)
+            elif not failed and job.discard_passed and segments:
+                # only footage entirely inside the task can go, the rest
+                #  is shared with the tasks before and after it.
+                discarded = driver.discard_segments(
+                    started, ended, partial=False)
+                segments = [seg for seg in segments if seg not in discarded]
+        except Exception as e:
+            job.logger.exception(e, exc_info=True)
+        recording = TaskRecording(
+            driver.name, None if driver.is_segmented else driver.filename,
+            started, ended, offset, segments, files, task)
+        if failed:
+            job.failed_recordings.append(recording)
+        return recording
 
     def _recycle_driver(self, driver):
         if not driver:
             return
+        self._release_proxy(driver)
         try:
             driver.quit()
         except Exception as e:
@@ -277,28 +1528,76 @@ class DriverPool(object):
         #  instead this will be handled in the recycle logic that requested
         #  the driver in the first place. Instead of returning the one it
         #  received this "new" instance will be put in its placed.
-        print('RECYCLED!!!!!!')
-        return self._load_driver(and_add=False)
+        return self._load_driver(and_add=False, driver_cls=type(driver))
+
+    def _release_driver(self, queue, driver, error=None, catch=()):
+        """ Return a leased driver to ``queue``, resetting or recycling it
+        when it was returned because of an exception.
+
+        Args:
+            queue (:obj:`.DriverQueue`): the queue the driver was taken from.
+            driver (WebDriver): driver being returned.
+            error (Exception): raised while the driver was leased.
+            catch (tuple[Exception]): exceptions that cause the driver to be
+                recycled instead of reset.
+
+        Returns:
+            None
+        """
+        if queue.closed:
+            # the pool was cleaned up while this driver was leased
+            self.logger.debug('closing driver leased from a closed pool')
+            self._release_proxy(driver)
+            try:
+                driver.quit()
+            except Exception as e:  # pragma: no cover
+                self.logger.exception(e, exc_info=True)
+            return
+        if error is not None:
+            if isinstance(error, catch) or not self._reset_driver(driver):
+                try:
+                    driver = self._recycle_driver(driver)
+                except Exception as e:  # pragma: no cover
+                    self.logger.exception(e, exc_info=True)
+                    queue.discard()
+                    return
+        queue.put(driver)
+        self._wakeup.set()
+
+    def _reset_driver(self, driver):
+        """ Clear the browser state left behind by a failed lease.
+
+        Returns:
+            bool: ``False`` when the driver could not be reset.
+        """
+        try:
+            driver.delete_all_cookies()
+            driver.get('about:blank')
+        except Exception as e:
+            self.logger.exception(e, exc_info=True)
+            return False
+        return True
 
     def add_async(self, *items):
         """ Add additional items to the asynchronous processing queue.
 
+        Items are added to the most recent job started with
+        :func:`~DriverPool.execute_async`, use :func:`.PoolJob.add` to add
+        items to a specific job.
+
         Args:
             items (list(Any)): list of items that need processing. Each item is
                 applied one at a time to an available driver from the pool.
 
         Raises:
-            StopIteration: when all items have been added.
+            DriverPoolValueError: when there are no items to add.
+            DriverPoolRuntimeException: when there isn't an asynchronous job
+                running.
         """
-        if len(items) == 1 and isinstance(items[0], list):
-            items = iter(items[0])
-        if not items:
-            raise DriverPoolValueError(
-                'cannot add items with value: %s' % str(items))
-        item_count = count(items)
-        self.logger.debug('adding %d additional items to tasks', item_count)
-        for o in items:
-            self._tasks.put(o)
+        jobs = [j for j in self._jobs if j.is_async and not j.stopped]
+        if not jobs:
+            raise DriverPoolRuntimeException('no asynchronous job running')
+        jobs[-1].add(*items)
 
     def close(self):
         """ Force close all the drivers and cleanup their containers.
@@ -309,7 +1608,10 @@ class DriverPool(object):
         self.__cleanup(force=True)
 
     def execute(self, fn, items, preserve_order=False, auto_clean=True,
-                no_wait=False):
+                no_wait=False, browser_key=None, reorder_window=None,
+                speculate_after=None, record_tasks=False,
+                discard_passed=False, recordings_path=None, prefetch=None,
+                network_stats=False, capture_network=False, domain_key=None):
         """ Execute a fixed function, blocking for results.
 
         Args:
@@ -326,45 +1628,95 @@ class DriverPool(object):
             no_wait (bool): forgo a small sleep interval between finishing
                 a task and putting the driver back in the available drivers
                 pool.
+            browser_key (Callable): function that takes a single parameter,
+                the ``task``, and returns the browser it must run on. Return
+                ``None`` or ``'any'`` to use any idle driver.
+            reorder_window (int): stream ordered results instead of blocking,
+                implies ``preserve_order``. At most ``reorder_window`` tasks
+                are running or waiting to be returned at any time; ``items``
+                is read lazily and new tasks only start as the results are
+                consumed.
+            speculate_after (float): with ``reorder_window``, seconds after
+                which the task holding back the ordered results is started
+                again on another idle driver. ``fn`` should be safe to call
+                twice for the same item.
+            record_tasks (bool): mark each task in the recording of video
+                drivers, every result is a :obj:`.TaskResult` carrying
+                the task's :obj:`~selenium_docker.video.TaskRecording`.
+            discard_passed (bool): with ``record_tasks``, delete the
+                segments recorded during successful tasks right away.
+            recordings_path (str): with ``record_tasks``, directory where
+                the segments of failed tasks are copied.
+            prefetch (bool or Callable): warm the proxy cache with the
+                first page of every site in ``items`` while the browsers
+                start, see :func:`~DriverPool.prefetch`. ``True`` when the
+                items are URLs, otherwise a function that takes a task and
+                returns its URL. ``items`` is read up front.
+            network_stats (bool): follow the proxy's access log, every
+                result is a :obj:`.TaskResult` carrying a summary of the
+                task's requests. Requires a proxy and a factory using a
+                network, see :func:`~DriverPool.start_access_log`.
+            capture_network (bool or float): return the proxy requests of a
+                sample of the tasks as a HAR log in :obj:`.TaskResult`
+                results, ``0.1`` captures one task in ten and ``True``
+                every task. Captures are capped by the ``har_max_entries``
+                and ``har_max_kb`` settings. Same requirements as
+                ``network_stats``.
+            domain_key (Callable): function that takes a single parameter,
+                the ``task``, and returns its domain. Tasks of domains over
+                the pool's ``domain_limits`` wait while other tasks use the
+                idle drivers. ``True`` when the items are URLs.
+
+        Raises:
+            Exception: the first exception raised by ``fn``, the remaining
+                tasks are not processed.
+            DriverPoolValueError: when ``browser_key`` returns a browser
+                the pool doesn't run.
 
         Yields:
             results: the result for each item as they're finished.
         """
-
-        def worker(o):
-            job_num, item = o
-            self.logger.debug('doing work on item %d' % job_num)
-            driver = self._drivers.get(block=True)
-            ret_val = fn(driver, item)
-            if not no_wait:
-                gevent.sleep(self.INNER_THREAD_SLEEP)
-            self._drivers.put(driver)
-            return ret_val
-
-        if self.__feeder_green:
-            raise DriverPoolRuntimeException(
-                'cannot perform a blocking execute while async processing')
-
-        self.__bootstrap()
-        self.logger.debug('starting sync processing')
-
-        if preserve_order:
-            ittr = self._pool.imap
-        else:
-            ittr = self._pool.imap_unordered
-
-        self.logger.debug('yielding processed results')
-        for o in ittr(worker, enumerate(items)):
-            self._results.put(o)
-        self._results.put(StopIteration)
-        self.logger.debug('stopping sync processing')
+        job = PoolJob(self, fn, browser_key=browser_key,
+                      preserve_order=preserve_order or bool(reorder_window),
+                      no_wait=no_wait, window=reorder_window,
+                      speculate_after=speculate_after,
+                      record_tasks=record_tasks,
+                      discard_passed=discard_passed,
+                      recordings_path=recordings_path,
+                      network_stats=network_stats,
+                      capture_network=capture_network,
+                      domain_key=domain_key)
+        if prefetch:
+            items = list(items)
+            job.prefetch = self._prefetch_items(items, prefetch)
+        self.__submit(job)
+        self.logger.debug('starting sync processing, job %s', job.name)
+        if reorder_window:
+            job._source = iter(items)
+            job.close()
+            self._wakeup.set()
+            return self._stream(job, auto_clean)
+        try:
+            job._extend(items)
+        except DriverPoolValueError as e:
+            # tasks that were already added are stopped with the job
+            job.error = e
+            job.stop()
+        job.close()
+        job.wait()
+        self.logger.debug('stopping sync processing, job %s', job.name)
         if auto_clean:
-            self.logger.debug('auto cleanup pool environment')
-            self.__cleanup(force=True)
-        return self.results(block=False)
+            self._auto_clean()
+        if job.error is not None:
+            raise job.error
+        return job.results(block=False)
 
     def execute_async(self, fn, items=None, callback=None,
-                      catch=(WebDriverException,), requeue_task=False):
+                      catch=(WebDriverException,), requeue_task=False,
+                      browser_key=None, record_tasks=False,
+                      discard_passed=False, recordings_path=None,
+                      prefetch=None, network_stats=False,
+                      capture_network=False, domain_key=None):
         """ Execute a fixed function in the background, streaming results.
 
         Args:
@@ -382,76 +1734,198 @@ class DriverPool(object):
             requeue_task (bool): in the event of an Exception being caught
                 should the task/item that was being worked on be re-added to
                 the queue of items being processed.
+            browser_key (Callable): function that takes a single parameter,
+                the ``task``, and returns the browser it must run on. Return
+                ``None`` or ``'any'`` to use any idle driver.
+            record_tasks (bool): see :func:`~DriverPool.execute`.
+            discard_passed (bool): see :func:`~DriverPool.execute`.
+            recordings_path (str): see :func:`~DriverPool.execute`.
+            prefetch (bool or Callable): see :func:`~DriverPool.execute`,
+                only the initial ``items`` are prefetched.
+            network_stats (bool): see :func:`~DriverPool.execute`.
+            capture_network (bool or float): see
+                :func:`~DriverPool.execute`.
+            domain_key (Callable): see :func:`~DriverPool.execute`.
 
         Raises:
             DriverPoolValueError: if ``callback`` is not ``None``
-                or ``callable``.
+                or ``callable``, or ``browser_key`` returns a browser the
+                pool doesn't run.
 
         Returns:
-            None
+            :obj:`.PoolJob`:
+                the job processing ``items``, more items can be added
+                with :func:`.PoolJob.add`.
         """
-
-        def worker(fn, task):
-            ret_val = None
-            async_task_id = gen_uuid(12)
-            self.logger.debug('starting async task %s', async_task_id)
-            driver = self._drivers.get(block=True)
-            if isinstance(driver, Exception):
-                raise driver
-            try:
-                ret_val = fn(driver, task)
-            except catch as e:
-                self.logger.exception('hihi')
-                if self.is_processing:
-                    driver = self._recycle_driver(driver)
-                    if requeue_task:
-                        self._tasks.put(task)
-            finally:
-                self._results.put(ret_val)
-                self._drivers.put(driver)
-                gevent.sleep(self.INNER_THREAD_SLEEP)
-                return ret_val
-
-        def feeder():
-            self.logger.debug('starting async feeder thread')
-            while True:
-                while not self._tasks.empty():
-                    task = self._tasks.get()
-                    if self._pool is None:
-                        break
-                    self._pool.apply_async(
-                        worker,
-                        args=(fn, task,),
-                        callback=greenlet_callback)
-                gevent.sleep(self.INNER_THREAD_SLEEP)
-                if self._pool is None and not self.is_processing:
-                    break
-            return
-
         if callback is None:
             def logger(value):
                 self.logger.debug('%s', value)
             callback = logger
 
-        def real_callback(cb, value):
-            if isinstance(value, gevent.GreenletExit):
-                raise value
-            else:
-                cb(value)
-
-        greenlet_callback = partial(real_callback, callback)
-
-        for f in [fn, callback]:
+        for f in [fn, callback, browser_key or callable]:
             if not callable(f):
                 raise DriverPoolValueError(
-                    'cannot use %s, is not callable' % callback)
+                    'cannot use %s, is not callable' % f)
 
         self.logger.debug('starting async processing')
-        self.__bootstrap()
-        if not self.__feeder_green:
-            self.__feeder_green = gevent.spawn(feeder)
+        job = PoolJob(self, fn, callback=callback, catch=catch,
+                      requeue_task=requeue_task, browser_key=browser_key,
+                      no_wait=True, is_async=True, record_tasks=record_tasks,
+                      discard_passed=discard_passed,
+                      recordings_path=recordings_path,
+                      network_stats=network_stats,
+                      capture_network=capture_network,
+                      domain_key=domain_key)
+        if prefetch and items:
+            items = list(items)
+            job.prefetch = self._prefetch_items(items, prefetch)
+        self.__submit(job)
         if items:
-            self.add_async(*items)
+            job.add(*items)
+        return job
+
+    def start_access_log(self, max_keys=1000):
+        """ Follow the access log of the pool's proxy in the background.
+
+        Requests are aggregated by domain and by driver, the latter only
+        when the factory uses a network so each driver has its own address.
+        Called by :func:`~DriverPool.execute` with ``network_stats`` or
+        ``capture_network``, the aggregates remain available after the pool
+        is closed.
+
+        Args:
+            max_keys (int): domains and drivers aggregated separately.
+
+        Raises:
+            DriverPoolRuntimeException: when the pool has no proxy.
+
+        Returns:
+            :obj:`~selenium_docker.accesslog.AccessLog`
+        """
+        with self._prepare_lock:
+            self.__prepare_proxy()
+        if not self.proxy:
+            raise DriverPoolRuntimeException(
+                'pool has no proxy to read the access log of')
+        if self.factory.network is None:
+            self.logger.warning('drivers share an address without a '
+                                'network, only domains are aggregated')
+        if self.access_log is None or self.access_log.proxy is not self.proxy:
+            self.access_log = AccessLog(self.proxy, max_keys=max_keys,
+                                        logger=self.logger)
+        return self.access_log.start()
+
+    def prefetch(self, urls, concurrency=8, assets=True):
+        """ Warm the proxy cache in the background, without a browser.
+
+        The proxy is created first if the pool hasn't been started, the
+        drivers can be started while the URLs are fetched.
+
+        References:
+            :func:`~selenium_docker.proxy.SquidProxy.prefetch`
+
+        Args:
+            urls (list(str)): pages or files to fetch.
+            concurrency (int): maximum number of requests at once.
+            assets (bool): also fetch the scripts, stylesheets and fonts
+                loaded by the pages.
+
+        Raises:
+            DriverPoolRuntimeException: when the pool doesn't use a proxy.
+
+        Returns:
+            :obj:`gevent.Greenlet`:
+                whose value is a
+                :obj:`~selenium_docker.proxy.PrefetchResult`.
+        """
+        with self._prepare_lock:
+            self.__prepare_proxy()
+        if not self.proxy:
+            raise DriverPoolRuntimeException('pool has no proxy to prefetch')
+        urls = list(urls)
+        self.logger.debug('prefetching %d urls', len(urls))
+        return gevent.spawn(self.proxy.prefetch, urls, concurrency, assets)
+
+    def _prefetch_items(self, items, prefetch):
+        """ Prefetch the first URL of every site in ``items``. """
+        if not self._use_proxy:
+            self.logger.warning('cannot prefetch without a proxy')
+            return None
+        to_url = prefetch if callable(prefetch) else (lambda item: item)
+        sites = OrderedDict()
+        for item in items:
+            url = to_url(item)
+            if isinstance(url, string_types):
+                sites.setdefault(urlparse(url).netloc, url)
+        return self.prefetch(list(sites.values()))
+
+    def lease(self, timeout=None, browser=None,
+              catch=(WebDriverException,)):
+        """ Borrow a driver from the pool.
+
+        Leases are granted in the order they're requested, sharing the pool's
+        drivers with any tasks being executed. The drivers and containers are
+        created first if the pool hasn't been started.
+
+        Args:
+            timeout (float): seconds to wait for a driver, ``None`` to
+                wait indefinitely.
+            browser (str): browser the driver must be, ``None`` or ``'any'``
+                for any idle driver.
+            catch (tuple[Exception]): exceptions raised while the driver is
+                leased that cause it to be recycled. Other exceptions only
+                reset the browser's state.
+
+        Raises:
+            DriverPoolTimeout: when no driver became available in time.
+
+        Returns:
+            :obj:`.DriverLease`:
+                context manager yielding the driver and returning it to the
+                pool on exit.
+
+        Example::
+
+            with pool.lease(timeout=30) as driver:
+                driver.get('https://python.org')
+        """
+        self.__prepare()
+        queue = self._drivers
+        started = time.time()
+        try:
+            driver = queue.get(block=True, timeout=timeout, browser=browser)
+        except Empty:
+            raise DriverPoolTimeout(
+                'no driver available after %s seconds' % timeout)
+        return DriverLease(self, queue, driver, time.time() - started, catch)
+
+    def lease_async(self, timeout=None, browser=None,
+                    catch=(WebDriverException,)):
+        """ Borrow a driver from the pool in the background.
+
+        References:
+            :func:`~DriverPool.lease`
+
+        Returns:
+            :obj:`gevent.Greenlet`:
+                whose value is the :obj:`.DriverLease` once a driver is
+                available.
+
+        Example::
+
+            pending = pool.lease_async(timeout=30)
+            # ... do other work
+            with pending.get() as driver:
+                driver.get('https://python.org')
+        """
+        return gevent.spawn(self.lease, timeout, browser, catch)
+
+    @property
+    def lease_stats(self):
+        """dict: wait-time metrics for checking out drivers, see
+            :func:`.DriverQueue.stats`.
+        """
+        return self._drivers.stats()
 
     def quit(self):
         """ Alias for :func:`~DriverPool.close()`. Included for consistency
@@ -461,13 +1935,16 @@ class DriverPool(object):
         Returns:
             None
         """
-        if self.__feeder_green:
+        if self.is_async:
             return self.stop_async()
         return self.close()
 
     def results(self, block=True):
         """ Iterate over available results from processed tasks.
 
+        Results are taken from the most recently started job, use
+        :func:`.PoolJob.results` for the results of a specific job.
+
         Args:
             block (bool): when ``True``, block this call until all tasks have
                 been processed and all results have been returned. Otherwise
@@ -476,27 +1953,11 @@ class DriverPool(object):
 
         Yields:
             results: one result at a time as they're finished.
-
-        Raises:
-            StopIteration: when the processing is finished.
-        """
-        est_size = self._results.qsize()
-        self.logger.debug('there are an estimated %d results', est_size)
-        if block:
-            self.logger.debug('blocking for results to finish processing')
-            while self.is_processing:
-                while not self._results.empty():
-                    yield self._results.get()
-                gevent.sleep(self.INNER_THREAD_SLEEP)
-                if self._tasks.empty() and self._results.empty():
-                    break
-            raise StopIteration
-        else:
-            if est_size > 0:
-                self.logger.debug('returning as many results as have finished')
-            self._results.put(StopIteration)
-            for result in self._results:
-                yield result
+        """
+        if self._job is None:
+            return
+        for result in self._job.results(block=block):
+            yield result
 
     def stop_async(self, timeout=None, auto_clean=True):
         """ Stop all the async worker processing from executing.
@@ -512,16 +1973,41 @@ class DriverPool(object):
             None
         """
         self.logger.debug('stopping async processing')
-        if self.__feeder_green:
-            self.logger.debug('killing async feeder thread')
-            gevent.kill(self.__feeder_green)
-            self.__feeder_green = None
-        if self._pool:
-            self.logger.debug('joining async pool before kill')
-            self._pool.join(timeout=timeout or 1.0)
-            self._pool.kill(block=False)
-        tasks_count = self._tasks.qsize()
-        self.logger.info('%d tasks remained unprocessed', tasks_count)
+        for job in [j for j in self._jobs if j.is_async]:
+            tasks_count = job.stop(timeout=timeout or 1.0)
+            self.logger.info('%d tasks remained unprocessed', tasks_count)
         if auto_clean:
-            self.logger.debug('auto cleanup pool environment')
-            self.__cleanup(force=True)
+            self._auto_clean()
+
+    def _stream(self, job, auto_clean):
+        """ Yield ``job``'s results as they're consumed, then clean up. """
+        try:
+            for result in job.results(block=True):
+                yield result
+            if job.error is not None:
+                raise job.error
+        finally:
+            if not job.is_done:
+                # the consumer stopped iterating early
+                job.stop(timeout=0)
+            self.logger.debug('stopping sync processing, job %s', job.name)
+            if auto_clean:
+                self._auto_clean(job)
+
+    def _auto_clean(self, finished=None):
+        """ Cleanup the pool environment unless other jobs are still using
+        the drivers.
+
+        Args:
+            finished (:obj:`.PoolJob`): job that no longer needs the pool,
+                even if some of its tasks are still running.
+        """
+        # stopped jobs don't need the pool either, their running tasks are
+        #  abandoned by the cleanup.
+        jobs = [j for j in self.jobs if j is not finished and not j.stopped]
+        if jobs:
+            self.logger.debug('skipping auto cleanup, %d jobs are running',
+                              len(jobs))
+            return
+        self.logger.debug('auto cleanup pool environment')
+        self.__cleanup(force=True, keep_proxy=self._keep_proxy)
@@ -0,0 +1,383 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# >>
+#   Copyright 2018 Vivint, inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+#    vivint-selenium-docker, 20017
+# <<
+
+import os
+import shlex
+from abc import ABCMeta, abstractmethod
+from collections import OrderedDict, namedtuple
+from logging import getLogger
+
+import gevent
+from gevent import subprocess
+from gevent.pool import Pool
+from six import add_metaclass
+
+from selenium_docker.errors import SeleniumDockerException
+from selenium_docker.video import get_profile
+
+__all__ = [
+    'Duration',
+    'FFmpegStage',
+    'PostProcessError',
+    'PostProcessor',
+    'Progress',
+    'Sprite',
+    'Stage',
+    'Transcode',
+    'Trim',
+    'parse_timestamp'
+]
+
+
+class PostProcessError(SeleniumDockerException):
+    """ A post-processing stage exited with an error. """
+
+
+Progress = namedtuple('Progress', ['source', 'stage', 'position', 'finished'])
+"""Reported to the progress callback: the file being processed, the name of
+the stage, seconds of output written so far and whether the stage is done."""
+
+
+def parse_timestamp(value):
+    """ Convert an ffmpeg ``HH:MM:SS.micro`` timestamp to seconds.
+
+    Args:
+        value (str): the timestamp.
+
+    Returns:
+        float: seconds, ``None`` when ``value`` isn't a timestamp.
+    """
+    try:
+        seconds = 0.0
+        for part in value.strip().split(':'):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    except ValueError:
+        return None
+
+
+@add_metaclass(ABCMeta)
+class Stage(object):
+    """ A command run on an exported recording.
+
+    Subclasses implement :func:`~Stage.command`.
+
+    Attributes:
+        name (str): identifier of the stage's result.
+        suffix (str): replaces the extension of the source to make the
+            output file name.
+    """
+
+    name = 'stage'
+    suffix = ''
+
+    def __repr__(self):
+        return '<%s(%s)>' % (self.__class__.__name__, self.name)
+
+    def output(self, source):
+        """ Path of the file this stage writes for ``source``.
+
+        Args:
+            source (str): path of the recording.
+
+        Returns:
+            str: or ``None`` if the stage doesn't write a file.
+        """
+        if not self.suffix:
+            return None
+        return os.path.splitext(source)[0] + self.suffix
+
+    @abstractmethod
+    def command(self, source, output):
+        """ The command line to run.
+
+        Args:
+            source (str): path of the recording.
+            output (str): path returned by :func:`~Stage.output`.
+
+        Returns:
+            list(str)
+        """
+        raise NotImplementedError
+
+    def result(self, output, stdout):
+        """ The value reported for this stage once the command succeeded.
+
+        Args:
+            output (str): path returned by :func:`~Stage.output`.
+            stdout (str): what the command printed, minus progress reports.
+
+        Returns:
+            the output path by default.
+        """
+        return output
+
+
+class FFmpegStage(Stage):
+    """ A stage running ffmpeg with progress reporting. """
+
+    binary = 'ffmpeg'
+    """str: name or path of the ffmpeg executable."""
+
+    def command(self, source, output):
+        return [self.binary, '-y', '-nostats', '-loglevel', 'error',
+                '-progress', 'pipe:1'] + [
+            str(arg) for arg in self.arguments(source, output)]
+
+    @abstractmethod
+    def arguments(self, source, output):
+        """ ffmpeg arguments after the common options.
+
+        Returns:
+            list
+        """
+        raise NotImplementedError
+
+
+class Transcode(FFmpegStage):
+    """ Re-encode a recording with an encoding profile.
+
+    Args:
+        profile (str or :obj:`~selenium_docker.video.EncodingProfile`):
+            encoding settings for the new file.
+        extension (str): container format of the new file.
+    """
+
+    name = 'transcode'
+
+    def __init__(self, profile='high', extension='.mp4'):
+        self.profile = get_profile(profile)
+        self.suffix = '-%s%s' % (self.profile.name, extension)
+
+    def arguments(self, source, output):
+        return ['-i', source] + shlex.split(self.profile.args) + [output]
+
+
+class Sprite(FFmpegStage):
+    """ A single image with a grid of thumbnails taken across a recording.
+
+    Args:
+        interval (float): seconds between thumbnails.
+        columns (int): thumbnails per row.
+        rows (int): rows in the grid, later thumbnails are dropped.
+        width (int): width of each thumbnail in pixels.
+    """
+
+    name = 'sprite'
+    suffix = '-sprite.jpg'
+
+    def __init__(self, interval=10, columns=5, rows=5, width=320):
+        self.interval = interval
+        self.columns = columns
+        self.rows = rows
+        self.width = width
+
+    def arguments(self, source, output):
+        return ['-i', source,
+                '-vf', 'fps=1/%s,scale=%d:-1,tile=%dx%d' % (
+                    self.interval, self.width, self.columns, self.rows),
+                '-frames:v', 1, output]
+
+
+class Trim(FFmpegStage):
+    """ Cut part of a recording out without re-encoding it.
+
+    Args:
+        start (float): seconds from the start of the recording.
+        end (float): seconds from the start of the recording.
+        name (str): identifier of the part, used in the output file name.
+    """
+
+    def __init__(self, start, end, name=None):
+        self.start = max(0.0, start)
+        self.end = end
+        self.name = name or 'trim-%d-%d' % (self.start, end)
+        self.suffix = '-%s.mkv' % self.name
+
+    @classmethod
+    def task(cls, recording, padding=1.0):
+        """ Trim the part of a lifetime recording covering a task.
+
+        Args:
+            recording (:obj:`~selenium_docker.video.TaskRecording`): the
+                task's recording reference.
+            padding (float): seconds to keep before and after the task.
+
+        Returns:
+            :obj:`.Trim`: or ``None`` when the task wasn't recorded to a
+            single lifetime file.
+        """
+        if recording.offset is None:
+            return None
+        return cls(recording.offset - padding,
+                   recording.offset + recording.duration + padding,
+                   name=recording.task or None)
+
+    def arguments(self, source, output):
+        return ['-ss', self.start, '-i', source, '-t', self.end - self.start,
+                '-c', 'copy', output]
+
+
+class Duration(Stage):
+    """ Length of a recording in seconds, read with ffprobe. """
+
+    name = 'duration'
+    binary = 'ffprobe'
+    """str: name or path of the ffprobe executable."""
+
+    def command(self, source, output):
+        return [self.binary, '-v', 'error', '-show_entries',
+                'format=duration', '-of', 'csv=p=0', source]
+
+    def result(self, output, stdout):
+        return float(stdout.strip())
+
+
+class PostProcessor(object):
+    """ Run stages on exported recordings in external processes.
+
+    Every submitted recording runs its stages one after the other while up
+    to ``size`` recordings are processed at once. The commands run through
+    :mod:`gevent.subprocess` so waiting on them never blocks the hub.
+
+    Args:
+        stages (list(:obj:`.Stage`)): stages run on each recording.
+        size (int): maximum number of commands running at once.
+        progress (Callable): function called with a :obj:`.Progress` as
+            ffmpeg stages make progress.
+        logger (:obj:`logging.Logger`):
+        trim_tasks (float): also cut each task out of the recordings
+            submitted with their ``tasks``, see :func:`.Trim.task`. The
+            value is the padding kept around the task in seconds, ``None``
+            to leave the recordings whole.
+
+    Example::
+
+        post = PostProcessor([Duration(), Sprite(), Transcode('debug')],
+                             size=4, progress=print)
+        exporter = VideoExporter(size=4, postprocessor=post)
+        pool = DriverPool(8, ChromeVideoDriver, exporter=exporter)
+        ...
+        pool.close()
+        post.join()
+    """
+
+    def __init__(self, stages, size=2, progress=None, logger=None,
+                 trim_tasks=None):
+        self.stages = list(stages)
+        self.size = max(1, size)
+        self.progress = progress
+        self.trim_tasks = trim_tasks
+        self.logger = logger or getLogger('%s.PostProcessor' % __name__)
+        self._pool = Pool(size=self.size)
+
+    def __repr__(self):
+        return '<PostProcessor(size=%d,stages=%s,pending=%d)>' % (
+            self.size, ','.join(s.name for s in self.stages), self.pending)
+
+    @property
+    def pending(self):
+        """int: number of recordings that haven't been processed yet. """
+        return len(self._pool)
+
+    def submit(self, source, stages=None, tasks=None):
+        """ Process a recording in the background.
+
+        Args:
+            source (str): path of the recording.
+            stages (list(:obj:`.Stage`)): stages to run instead of the
+                default ones.
+            tasks (list(:obj:`~selenium_docker.video.TaskRecording`)):
+                tasks recorded in ``source``, each gets a :obj:`.Trim`
+                stage when ``trim_tasks`` is set.
+
+        Returns:
+            :obj:`gevent.Greenlet`:
+                handle for the processing, ``get()`` returns an ordered
+                mapping of stage names to their results.
+        """
+        stages = self.stages if stages is None else list(stages)
+        if tasks and self.trim_tasks is not None:
+            trims = [Trim.task(task, self.trim_tasks) for task in tasks]
+            stages = stages + [trim for trim in trims if trim is not None]
+        self.logger.debug('queueing %s for %d stages', source, len(stages))
+        return self._pool.spawn(self._process, source, stages)
+
+    def join(self, timeout=None):
+        """ Wait for the submitted recordings to be processed.
+
+        Args:
+            timeout (float): seconds to wait, ``None`` to wait for all.
+
+        Returns:
+            bool: ``True`` when everything has been processed.
+        """
+        return self._pool.join(timeout=timeout)
+
+    def _process(self, source, stages):
+        results = OrderedDict()
+        for stage in stages:
+            results[stage.name] = self.run(stage, source)
+        return results
+
+    def run(self, stage, source):
+        """ Run a single stage on a recording and wait for it.
+
+        Args:
+            stage (:obj:`.Stage`): the stage.
+            source (str): path of the recording.
+
+        Raises:
+            PostProcessError: when the command fails.
+
+        Returns:
+            the result of the stage.
+        """
+        output = stage.output(source)
+        cmd = stage.command(source, output)
+        self.logger.debug('running %s on %s', stage.name, source)
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE,
+                                universal_newlines=True)
+        errors = gevent.spawn(proc.stderr.read)
+        stdout, position = [], None
+        for line in proc.stdout:
+            key, sep, value = line.strip().partition('=')
+            if not sep or not isinstance(stage, FFmpegStage):
+                stdout.append(line)
+            elif key == 'out_time':
+                position = parse_timestamp(value)
+            elif key == 'progress':
+                self._report(Progress(source, stage.name, position,
+                                      value == 'end'))
+        code = proc.wait()
+        stderr = errors.get()
+        if code != 0:
+            raise PostProcessError('%s failed on %s (%d): %s' % (
+                stage.name, source, code, stderr.strip()[-500:]))
+        return stage.result(output, ''.join(stdout))
+
+    def _report(self, progress):
+        if self.progress is None:
+            return
+        try:
+            self.progress(progress)
+        except Exception as e:
+            self.logger.exception(e, exc_info=True)
@@ -18,13 +18,365 @@
 #    vivint-selenium-docker, 20017
 # <<
 
+import base64
+import io
+import json
 import logging
+import os
+import re
+import tarfile
+import time
+from collections import OrderedDict, namedtuple
 
+import gevent
+import requests
+from docker.errors import DockerException
+from gevent.lock import Semaphore
+from gevent.pool import Pool
 from selenium.webdriver.common.proxy import Proxy, ProxyType
+from six import string_types
+from six.moves.html_parser import HTMLParser
+from six.moves.urllib.parse import urljoin, urlparse
+from tenacity import retry, stop_after_delay, wait_fixed
 
 from selenium_docker.base import ContainerFactory, ContainerInterface
 from selenium_docker.drivers import check_container
-from selenium_docker.utils import gen_uuid, ip_port
+from selenium_docker.meta import config
+from selenium_docker.utils import gen_uuid
+
+__all__ = [
+    'AbstractProxy',
+    'BlockRules',
+    'CacheStats',
+    'PrefetchResult',
+    'ProxyPool',
+    'SquidProxy',
+    'Upstream',
+    'extract_assets',
+    'parse_counters',
+    'parse_peer_status',
+    'prefetch',
+    'rank_proxies',
+    'render_pac',
+    'render_squid_conf',
+    'render_upstreams',
+    'site_key'
+]
+
+CACHE_DIR = '/var/spool/squid'
+"""str: Docker internal path of Squid's disk cache."""
+
+RULES_FILE = '/etc/squid/rules.conf'
+"""str: Docker internal path of the generated :obj:`.BlockRules`."""
+
+ACCESS_LOG = '/var/log/squid/access.log'
+"""str: Docker internal path of Squid's access log, in the native format
+read by :func:`~selenium_docker.accesslog.parse_entry`."""
+
+SQUID_TEMPLATE = """\
+http_port 3128
+acl localnet src 10.0.0.0/8 172.16.0.0/12 192.168.0.0/16 fc00::/7 fe80::/10
+acl SSL_ports port 443
+acl CONNECT method CONNECT
+http_access allow localhost manager
+http_access allow localnet manager
+http_access deny manager
+http_access deny CONNECT !SSL_ports
+include {rules}
+http_access allow localhost
+http_access allow localnet
+http_access deny all
+cache_mem {cache_mem} MB
+maximum_object_size_in_memory {max_memory_object} KB
+memory_replacement_policy {memory_policy}
+maximum_object_size {max_object} MB
+cache_replacement_policy {cache_policy}
+{cache_dir}
+coredump_dir {cache}
+access_log stdio:{access_log} squid
+{upstreams}
+refresh_pattern ^ftp: 1440 20% 10080
+refresh_pattern -i (/cgi-bin/|\\?) 0 0% 0
+refresh_pattern . 0 20% 4320
+"""
+"""str: template of the generated Squid configuration."""
+
+ROTATIONS = {
+    'round-robin': 'round-robin',
+    'weighted': 'weighted-round-robin',
+    'carp': 'carp',
+}
+""":obj:`dict`: how cache misses are spread over the upstream proxies.
+
+Attributes:
+    round-robin: each upstream in turn, ``weight`` times as often for
+        heavier upstreams.
+    weighted: in turn, favoring the upstreams that answer faster, scaled by
+        their ``weight``.
+    carp: hash the URL so a resource always goes through the same upstream,
+        sites see a stable address per URL.
+"""
+
+
+class Upstream(namedtuple('Upstream', [
+        'host', 'port', 'weight', 'username', 'password'])):
+    """ A parent proxy Squid forwards cache misses to.
+
+    Attributes:
+        host (str): host name or IP address.
+        port (int): HTTP port of the proxy.
+        weight (int): share of the requests relative to the other
+            upstreams.
+        username (str): basic authentication, ``None`` without.
+        password (str):
+    """
+    __slots__ = ()
+
+    def __new__(cls, host, port=3128, weight=1, username=None,
+                password=None):
+        return super(Upstream, cls).__new__(
+            cls, host, int(port), int(weight), username, password)
+
+    @classmethod
+    def parse(cls, url, weight=1):
+        """ Read an upstream from a proxy URL.
+
+        Args:
+            url (str): ``[http://][user:password@]host[:port]``.
+            weight (int):
+
+        Returns:
+            :obj:`.Upstream`
+        """
+        if '://' not in url:
+            url = '//' + url
+        parts = urlparse(url)
+        return cls(parts.hostname, parts.port or 3128, weight,
+                   parts.username, parts.password)
+
+    @property
+    def name(self):
+        """str: identifier of the upstream in Squid's cache manager. """
+        return 'upstream-%s-%d' % (
+            re.sub(r'[^\w.-]', '_', self.host), self.port)
+
+    def render(self, rotation='round-robin', fail_limit=3):
+        """ The ``cache_peer`` line of this upstream.
+
+        Args:
+            rotation (str): one of the :obj:`.ROTATIONS`.
+            fail_limit (int): failed connections before Squid considers the
+                upstream down and stops using it until it answers again.
+
+        Returns:
+            str
+        """
+        line = ('cache_peer %s parent %d 0 no-query no-digest '
+                'connect-fail-limit=%d %s weight=%d name=%s') % (
+            self.host, self.port, fail_limit, ROTATIONS[rotation],
+            self.weight, self.name)
+        if self.username:
+            line += ' login=%s:%s' % (self.username, self.password or '')
+        return line
+
+
+def render_upstreams(upstreams, rotation=None, fail_limit=None,
+                     allow_direct=False):
+    """ Squid directives forwarding cache misses to parent proxies.
+
+    Cache hits are still answered by the local Squid and never use the
+    upstreams' capacity. Upstreams that fail ``fail_limit`` connections in
+    a row are skipped until they answer again, see
+    :func:`.SquidProxy.upstream_status`.
+
+    Args:
+        upstreams (list(:obj:`.Upstream` or str)): parent proxies, strings
+            are read with :func:`.Upstream.parse`. A comma separated string
+            is split first.
+        rotation (str): one of the :obj:`.ROTATIONS`, defaults to the
+            ``squid_upstream_rotation`` setting.
+        fail_limit (int): defaults to the ``squid_upstream_fail_limit``
+            setting.
+        allow_direct (bool): go to the site directly when every upstream is
+            down, instead of failing the request.
+
+    Raises:
+        ValueError: for an unknown ``rotation``.
+
+    Returns:
+        str: empty without upstreams.
+    """
+    if isinstance(upstreams, string_types):
+        upstreams = [u for u in upstreams.split(',') if u.strip()]
+    upstreams = [u if isinstance(u, Upstream) else Upstream.parse(u.strip())
+                 for u in upstreams or []]
+    if not upstreams:
+        return ''
+    rotation = rotation or config.squid_upstream_rotation
+    if rotation not in ROTATIONS:
+        raise ValueError('unknown rotation %s' % rotation)
+    if fail_limit is None:
+        fail_limit = config.squid_upstream_fail_limit
+    lines = [u.render(rotation, int(fail_limit)) for u in upstreams]
+    if allow_direct:
+        lines.append('prefer_direct off')
+    else:
+        lines.append('never_direct allow all')
+    return '\n'.join(lines)
+
+
+def render_squid_conf(cache_mem=None, cache_size=None, max_object=None,
+                      max_memory_object=None, cache_policy=None,
+                      memory_policy=None, upstreams=None, rotation=None,
+                      fail_limit=None, allow_direct=False):
+    """ Generate a Squid configuration, missing values are read from the
+    ``squid_*`` settings.
+
+    Args:
+        cache_mem (int): megabytes of memory used to cache hot objects.
+        cache_size (int): megabytes of disk cache, ``0`` keeps the cache in
+            memory only.
+        max_object (int): largest object cached, in megabytes.
+        max_memory_object (int): largest object kept in the memory cache, in
+            kilobytes.
+        cache_policy (str): replacement policy of the disk cache,
+            ``heap LFUDA`` keeps popular objects to maximize the byte hit
+            ratio.
+        memory_policy (str): replacement policy of the memory cache,
+            ``heap GDSF`` keeps many small popular objects to maximize the
+            request hit ratio.
+        upstreams (list(:obj:`.Upstream` or str)): parent proxies for the
+            cache misses, defaults to the comma separated
+            ``squid_upstreams`` setting.
+        rotation (str): see :func:`.render_upstreams`.
+        fail_limit (int): see :func:`.render_upstreams`.
+        allow_direct (bool): see :func:`.render_upstreams`.
+
+    Returns:
+        str: the configuration file contents.
+    """
+    def setting(value, key):
+        return config[key] if value is None else value
+
+    cache_size = int(setting(cache_size, 'squid_cache_size_mb'))
+    cache_dir = ''
+    if cache_size > 0:
+        cache_dir = 'cache_dir ufs %s %d 16 256' % (CACHE_DIR, cache_size)
+    return SQUID_TEMPLATE.format(
+        cache_mem=int(setting(cache_mem, 'squid_cache_mem_mb')),
+        max_memory_object=int(setting(
+            max_memory_object, 'squid_max_memory_object_kb')),
+        memory_policy=setting(memory_policy, 'squid_memory_policy'),
+        max_object=int(setting(max_object, 'squid_max_object_mb')),
+        cache_policy=setting(cache_policy, 'squid_cache_policy'),
+        cache_dir=cache_dir,
+        cache=CACHE_DIR,
+        rules=RULES_FILE,
+        access_log=ACCESS_LOG,
+        upstreams=render_upstreams(
+            setting(upstreams, 'squid_upstreams'), rotation, fail_limit,
+            allow_direct))
+
+
+def parse_peer_status(text):
+    """ Parse the output of Squid's ``server_list`` cache manager page.
+
+    Args:
+        text (str): the page.
+
+    Returns:
+        :obj:`collections.OrderedDict`: whether each peer is up, by name.
+    """
+    status, peer = OrderedDict(), None
+    for line in text.splitlines():
+        key, sep, value = line.partition(':')
+        key = key.strip()
+        if not sep:
+            continue
+        if key in ('Parent', 'Sibling', 'Multicast'):
+            peer = value.strip()
+        elif key == 'Status' and peer is not None:
+            status[peer] = value.strip() == 'Up'
+    return status
+
+
+def parse_counters(text):
+    """ Parse the output of Squid's ``counters`` cache manager page.
+
+    Args:
+        text (str): ``name = value`` lines.
+
+    Returns:
+        dict: numeric values by counter name.
+    """
+    counters = {}
+    for line in text.splitlines():
+        key, sep, value = line.partition('=')
+        if not sep:
+            continue
+        try:
+            value = float(value.strip())
+        except ValueError:
+            continue
+        counters[key.strip()] = int(value) if value.is_integer() else value
+    return counters
+
+
+class CacheStats(namedtuple('CacheStats', [
+        'requests', 'hits', 'kbytes_out', 'hit_kbytes_out'])):
+    """ Cache effectiveness of a Squid proxy.
+
+    Counters are totals since Squid started, use :func:`~CacheStats.since`
+    to measure a single run.
+
+    Attributes:
+        requests (int): HTTP requests served to the browsers.
+        hits (int): requests answered from the cache.
+        kbytes_out (int): kilobytes sent to the browsers.
+        hit_kbytes_out (int): kilobytes sent from the cache.
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_counters(cls, counters):
+        """ Build from the values returned by :func:`.parse_counters`. """
+        return cls(counters.get('client_http.requests', 0),
+                   counters.get('client_http.hits', 0),
+                   counters.get('client_http.kbytes_out', 0),
+                   counters.get('client_http.hit_kbytes_out', 0))
+
+    @property
+    def misses(self):
+        """int: requests fetched from the origin servers. """
+        return self.requests - self.hits
+
+    @property
+    def hit_ratio(self):
+        """float: fraction of requests answered from the cache. """
+        return float(self.hits) / self.requests if self.requests else 0.0
+
+    @property
+    def byte_hit_ratio(self):
+        """float: fraction of the traffic sent from the cache. """
+        if not self.kbytes_out:
+            return 0.0
+        return float(self.hit_kbytes_out) / self.kbytes_out
+
+    @property
+    def bytes_saved(self):
+        """int: bytes that didn't have to be downloaded again. """
+        return int(self.hit_kbytes_out * 1024)
+
+    def since(self, previous):
+        """ Counters accumulated after an earlier snapshot.
+
+        Args:
+            previous (:obj:`.CacheStats`): the earlier snapshot.
+
+        Returns:
+            :obj:`.CacheStats`
+        """
+        return CacheStats(*(a - b for a, b in zip(self, previous)))
 
 
 class AbstractProxy(object):
@@ -58,10 +410,335 @@ class AbstractProxy(object):
         return proxy
 
 
+class BlockRules(object):
+    """ Requests and responses the proxy refuses, to save the bandwidth and
+    load time spent on ads, trackers, fonts or media.
+
+    Rules are written as Squid ACLs, see :func:`.SquidProxy.set_rules`.
+    Only domains can be blocked for ``https`` requests, the URL, type and
+    size of a tunneled request are hidden from the proxy.
+
+    Args:
+        domains (list(str)): blocked domains, including their subdomains.
+        patterns (list(str)): case insensitive regular expressions, requests
+            with a matching URL are blocked.
+        content_types (list(str)): case insensitive regular expressions,
+            responses with a matching ``Content-Type`` are blocked.
+        max_size (int): responses larger than this many kilobytes are cut
+            off.
+        size_caps (dict): maximum response size in kilobytes by
+            ``Content-Type`` regular expression, checked before
+            ``max_size``.
+
+    Example::
+
+        rules = BlockRules(domains=BlockRules.TRACKERS,
+                           content_types=BlockRules.MEDIA,
+                           size_caps={'^image/': 512})
+        pool = DriverPool(8, use_proxy={'rules': rules})
+    """
+
+    TRACKERS = (
+        'doubleclick.net', 'googlesyndication.com', 'googleadservices.com',
+        'google-analytics.com', 'googletagmanager.com',
+        'googletagservices.com', 'adservice.google.com',
+        'connect.facebook.net',
+        'scorecardresearch.com', 'quantserve.com', 'hotjar.com',
+        'adnxs.com', 'taboola.com', 'outbrain.com', 'criteo.com',
+        'amazon-adsystem.com', 'moatads.com', 'newrelic.com',
+        'nr-data.net', 'segment.io', 'mixpanel.com', 'optimizely.com')
+    """tuple(str): common advertising and analytics domains."""
+
+    FONTS = ('^font/', '^application/(x-)?font',
+             '^application/vnd.ms-fontobject')
+    """tuple(str): ``Content-Type`` expressions of web fonts."""
+
+    MEDIA = ('^video/', '^audio/')
+    """tuple(str): ``Content-Type`` expressions of audio and video."""
+
+    def __init__(self, domains=None, patterns=None, content_types=None,
+                 max_size=None, size_caps=None):
+        self.domains = list(domains or [])
+        self.patterns = list(patterns or [])
+        self.content_types = list(content_types or [])
+        self.max_size = max_size
+        self.size_caps = dict(size_caps or {})
+
+    def __repr__(self):
+        return '<BlockRules(domains=%d,patterns=%d,types=%d)>' % (
+            len(self.domains), len(self.patterns), len(self.content_types))
+
+    def __eq__(self, other):
+        return isinstance(other, BlockRules) and \
+            self.render() == other.render()
+
+    def __ne__(self, other):
+        return not self == other
+
+    @staticmethod
+    def _dstdomains(domains):
+        """ Squid refuses a domain listed along with its parent. """
+        names = set(d.strip().lstrip('.').lower() for d in domains)
+        names.discard('')
+        kept = []
+        for name in sorted(names):
+            parts = name.split('.')
+            if not any('.'.join(parts[i:]) in names
+                       for i in range(1, len(parts))):
+                kept.append('.' + name)
+        return kept
+
+    def render(self):
+        """ Generate the Squid directives enforcing the rules.
+
+        Returns:
+            str: contents of the rules file included by the main
+            configuration.
+        """
+        lines = []
+        # entries that are left empty once normalized define no acl at all
+        domains = self._dstdomains(self.domains)
+        for domain in domains:
+            lines.append('acl selenium_domains dstdomain %s' % domain)
+        if domains:
+            lines.append('http_access deny selenium_domains')
+        for pattern in self.patterns:
+            lines.append('acl selenium_urls url_regex -i %s' % pattern)
+        if self.patterns:
+            lines.append('http_access deny selenium_urls')
+        for content_type in self.content_types:
+            lines.append('acl selenium_types rep_mime_type -i %s' %
+                         content_type)
+        if self.content_types:
+            lines.append('http_reply_access deny selenium_types')
+            lines.append('http_reply_access allow all')
+        for index, (content_type, size) in enumerate(
+                sorted(self.size_caps.items())):
+            lines.append('acl selenium_cap_%d rep_mime_type -i %s' % (
+                index, content_type))
+            lines.append('reply_body_max_size %d KB selenium_cap_%d' % (
+                size, index))
+        if self.max_size:
+            lines.append('reply_body_max_size %d KB' % self.max_size)
+        return '\n'.join(lines) + '\n'
+
+
+class PrefetchResult(namedtuple('PrefetchResult', [
+        'requested', 'cached', 'failed', 'skipped', 'bytes_fetched',
+        'bytes_cached'])):
+    """ Outcome of warming a proxy cache.
+
+    Attributes:
+        requested (int): URLs requested, including discovered assets.
+        cached (int): responses the proxy kept in its cache.
+        failed (int): requests that raised an error or returned an error
+            status.
+        skipped (int): URLs that can't be cached, ie. ``https`` URLs which
+            are tunneled through the proxy.
+        bytes_fetched (int): size of the response bodies.
+        bytes_cached (int): size of the cached response bodies.
+    """
+    __slots__ = ()
+
+    def __add__(self, other):
+        return PrefetchResult(*(a + b for a, b in zip(self, other)))
+
+    @property
+    def fetched(self):
+        """int: URLs that were fetched successfully. """
+        return self.requested - self.failed - self.skipped
+
+
+class _AssetParser(HTMLParser):
+    """ Collect the static assets referenced by a HTML page. """
+
+    LINK_RELS = {'stylesheet', 'preload', 'modulepreload', 'icon',
+                 'shortcut icon', 'apple-touch-icon'}
+
+    def __init__(self):
+        HTMLParser.__init__(self)
+        self.assets = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'script' and attrs.get('src'):
+            self.assets.append(attrs['src'])
+        elif tag == 'link' and attrs.get('href') and \
+                (attrs.get('rel') or '').lower() in self.LINK_RELS:
+            self.assets.append(attrs['href'])
+
+
+CSS_URL = re.compile(r"""url\(\s*['"]?([^'")]+?)['"]?\s*\)""")
+"""regex: references to other files, ie. fonts, in a stylesheet."""
+
+
+def extract_assets(text, base_url, content_type='text/html'):
+    """ Find the static assets a page or stylesheet loads.
+
+    Scripts, stylesheets, preloaded files and icons are read from HTML,
+    ``url()`` references such as fonts from CSS.
+
+    Args:
+        text (str): body of the response.
+        base_url (str): URL of the response, relative references are
+            resolved against it.
+        content_type (str): ``Content-Type`` of the response.
+
+    Returns:
+        list(str): absolute ``http`` and ``https`` URLs, without duplicates.
+    """
+    if 'css' in content_type:
+        refs = CSS_URL.findall(text)
+    elif 'html' in content_type:
+        parser = _AssetParser()
+        try:
+            parser.feed(text)
+        except Exception:  # pragma: no cover
+            pass
+        refs = parser.assets
+    else:
+        return []
+    assets = []
+    for ref in refs:
+        url = urljoin(base_url, ref.strip()).split('#')[0]
+        if urlparse(url).scheme in ('http', 'https') and url not in assets:
+            assets.append(url)
+    return assets
+
+
+def prefetch(urls, route, concurrency=8, assets=True, timeout=30.0,
+             logger=None):
+    """ Fetch URLs through caching proxies so later requests are hits.
+
+    Every response is checked with an ``only-if-cached`` request afterwards
+    to find out if the proxy kept it.
+
+    Args:
+        urls (list(str)): URLs to fetch.
+        route (Callable): function that takes a URL and returns the
+            ``(host, port)`` of the proxy to fetch it through.
+        concurrency (int): maximum number of requests at once.
+        assets (bool): also fetch the scripts, stylesheets and fonts loaded
+            by the pages, see :func:`.extract_assets`.
+        timeout (float): seconds to wait for each response.
+        logger (:obj:`logging.Logger`):
+
+    Returns:
+        :obj:`.PrefetchResult`
+    """
+    logger = logger or logging.getLogger('%s.prefetch' % __name__)
+    session = requests.Session()
+    session.trust_env = False
+    seen = set()
+    result = PrefetchResult(0, 0, 0, 0, 0, 0)
+
+    def fetch(url):
+        if urlparse(url).scheme != 'http':
+            return PrefetchResult(1, 0, 0, 1, 0, 0), []
+        proxies = {'http': 'http://%s:%d' % route(url)}
+        try:
+            resp = session.get(url, proxies=proxies, timeout=timeout)
+            resp.raise_for_status()
+            size = len(resp.content)
+            check = session.head(resp.url, proxies=proxies, timeout=timeout,
+                                 headers={'Cache-Control': 'only-if-cached'})
+        except requests.RequestException as e:
+            logger.debug('cannot prefetch %s, %s', url, e)
+            return PrefetchResult(1, 0, 1, 0, 0, 0), []
+        cached = check.status_code == requests.codes.ok
+        found = extract_assets(resp.text, resp.url,
+                               resp.headers.get('Content-Type', '')) \
+            if assets else []
+        return PrefetchResult(1, int(cached), 0, 0, size,
+                              size if cached else 0), found
+
+    pool = Pool(size=max(1, concurrency))
+    batch = list(urls)
+    # pages, their assets, then the fonts referenced by stylesheets
+    for _ in range(3):
+        batch = [u for u in batch if not (u in seen or seen.add(u))]
+        found = []
+        for stats, discovered in pool.imap_unordered(fetch, batch):
+            result += stats
+            found.extend(discovered)
+        batch = found
+    logger.debug('prefetched %d urls, %d cached', result.requested,
+                 result.cached)
+    return result
+
+
 class SquidProxy(ContainerInterface, AbstractProxy):
+    """ Caching HTTP proxy shared by the browsers of a pool.
+
+    The Squid configuration is generated with :func:`.render_squid_conf`
+    from the keyword arguments and the ``squid_*`` settings and written
+    into the container before Squid starts.
+
+    Args:
+        logger (:obj:`logging.Logger`):
+        factory (:obj:`~selenium_docker.base.ContainerFactory`):
+        name (str): name of the container, generated when ``None``. A
+            running container of the factory with this name is adopted
+            instead of creating a new one.
+        port (int): host port to publish Squid on, picked by Docker when
+            ``None``.
+        rules (:obj:`.BlockRules`): requests and responses to block.
+        **settings: arguments of :func:`.render_squid_conf`.
+
+    Example::
+
+        proxy = SquidProxy(cache_mem=128, cache_size=4096)
+        before = proxy.stats()
+        ...
+        stats = proxy.stats().since(before)
+        print(stats.hit_ratio, stats.bytes_saved)
+
+    Cache misses can be spread over parent proxies while the hits are still
+    served locally::
+
+        proxy = SquidProxy(upstreams=['10.0.0.5:8080', 'user:pw@10.0.0.6'],
+                           rotation='round-robin')
+        print(proxy.upstream_status())
+
+    A proxy can outlive the pools using it and the program that created
+    it, keeping its cache warm::
+
+        factory = ContainerFactory(None, 'crawler')
+        proxy = SquidProxy.shared('crawler', factory=factory)
+        DriverPool(4, use_proxy=proxy, factory=factory).execute(...)
+        DriverPool(8, use_proxy=proxy, factory=factory).execute(...)
+    """
+
     SQUID_PORT = '3128/tcp'
     """str: identifier for extracting the host port that's bound to Docker."""
 
+    SQUID_CONF = '/etc/squid/squid.conf'
+    """str: Docker internal path of the generated configuration."""
+
+    COMMAND = (
+        'mkdir -p $(dirname {conf}) {cache} $(dirname {log}) && '
+        'touch {log} && '
+        '(chown proxy {cache} {log} 2> /dev/null || true) && '
+        '([ -e {conf}.written ] || ('
+        'printf "%s" "$SQUID_CONFIG" > {conf} && '
+        'printf "%s" "$SQUID_RULES" > {rules} && '
+        'touch {conf}.written)) && '
+        'SQUID=$(command -v squid || command -v squid3) && '
+        '$SQUID -N -z -f {conf} && '
+        'exec $SQUID -N -f {conf}')
+    """str: shell script writing the configuration, creating the disk cache
+    and running Squid in the foreground.
+
+    The configuration and rules are only written the first time the
+    container starts. When Docker restarts it after a crash Squid keeps
+    the files changed by :func:`~SquidProxy.reconfigure`,
+    :func:`~SquidProxy.set_rules` and :func:`~SquidProxy.set_upstreams`
+    instead of going back to the ones it was created with."""
+
+    RECONFIGURE = ('sh -c "SQUID=$(command -v squid || command -v squid3) && '
+                   '$SQUID -k reconfigure -f {conf}"')
+    """str: command telling the running Squid to reload its configuration."""
+
     CONTAINER = dict(
         image='minimum2scp/squid',
         detach=True,
@@ -75,30 +752,136 @@ class SquidProxy(ContainerInterface, AbstractProxy):
         })
     """dict: default specification for the underlying container."""
 
-    def __init__(self, logger=None, factory=None):
-        """
-
-        Args:
-            logger:
-            factory (:obj:`selenium_docker.base.ContainerFactory`):
-        """
+    def __init__(self, logger=None, factory=None, name=None, port=None,
+                 rules=None, **settings):
+        self.squid_conf = render_squid_conf(**settings)
+        self.settings = settings  # type: dict
+        self.rules = rules or BlockRules()
         self.factory = factory or ContainerFactory.get_default_factory()
         self.factory.load_image(self.CONTAINER, background=False)
 
-        self._name = self.factory.gen_name(key='squid3-' + gen_uuid())
+        self._name = name or self.factory.gen_name(key='squid3-' + gen_uuid())
+        self._port = port
         self.logger = logger or logging.getLogger(
             '%s.SquidProxy.%s' % (__name__, self.name))
 
-        self.container = self._make_container()
+        self.container = self._adopt_container()
+        self.adopted = self.container is not None  # type: bool
+        if not self.adopted:
+            self.container = self._make_container()
+
+        conn, port = self.factory.ip_port(self.container, self.SQUID_PORT)
+        self._ip_port = conn, port
+        self.selenium_proxy = self.make_proxy(*self.address)
+        self._manager_url = 'http://%s:%d/squid-internal-mgr/' % (conn, port)
 
-        conn, port = ip_port(self.container, self.SQUID_PORT)
-        self.selenium_proxy = self.make_proxy(conn, port)
+        self.logger.debug('waiting for squid to accept connections')
+        if not self.check_container_ready():
+            raise DockerException('could not verify squid was ready')
+        if self.adopted:
+            self._sync_files()
+
+    @classmethod
+    def shared(cls, key='shared', factory=None, logger=None, **settings):
+        """ Get the long-lived proxy identified by ``key``.
+
+        The proxy is created the first time and adopted from the factory
+        afterwards, even by another process using the same factory
+        namespace. It's only removed by calling
+        :func:`~SquidProxy.quit`.
+
+        Args:
+            key (str): identifies the proxy within the factory namespace.
+            factory (:obj:`~selenium_docker.base.ContainerFactory`):
+            logger (:obj:`logging.Logger`):
+            **settings: arguments of :func:`.render_squid_conf`.
+
+        Returns:
+            :obj:`.SquidProxy`
+        """
+        factory = factory or ContainerFactory.get_default_factory()
+        return cls(logger=logger, factory=factory,
+                   name=factory.gen_name(key='squid3-' + key), **settings)
 
     @property
     def name(self):
         """str: read-only property of the container's name. """
         return self._name
 
+    @property
+    def address(self):
+        """tuple(str, int): host and port browsers use to reach the proxy.
+
+        On a factory network this is the container's name, which is kept by
+        a replacement container created with the same ``name``.
+        """
+        if self.factory.network is not None:
+            return self.name, int(self.SQUID_PORT.split('/')[0])
+        return self._ip_port
+
+    @retry(wait=wait_fixed(0.5), stop=stop_after_delay(30))
+    def check_container_ready(self):
+        """ Wait until Squid answers requests on its port.
+
+        Returns:
+            bool: ``True`` once the cache manager responds.
+        """
+        self.manager('info', timeout=1.0)
+        return True
+
+    def _adopt_container(self):
+        """ Find a running container of the factory with our name.
+
+        Returns:
+            :class:`~docker.models.containers.Container`: or ``None``.
+        """
+        container = self.factory.containers.get(self.name)
+        if container is None:
+            return None
+        container.reload()
+        if container.status != 'running':
+            self.logger.debug('removing %s container', container.status)
+            self.factory.stop_container(name=self.name)
+            return None
+        self.logger.debug('adopting running container')
+        return container
+
+    def _sync_files(self):
+        """ Make an adopted container use our configuration and rules. """
+        changed = False
+        for path, text in [(self.SQUID_CONF, self.squid_conf),
+                           (RULES_FILE, self.rules.render())]:
+            if self._read_file(path) != text:
+                self._put_file(path, text)
+                changed = True
+        if changed:
+            self.logger.debug('adopted squid had another configuration')
+            self._reload()
+
+    def _read_file(self, path):
+        """ Contents of a text file inside the container. """
+        out = self.container.exec_run('cat %s' % path)
+        # docker>=3.0 returns a tuple of the exit code and output
+        if isinstance(out, tuple):
+            out = out[1]
+        return out.decode('utf-8')
+
+    def _put_file(self, path, text):
+        """ Write ``text`` to ``path`` inside the container. """
+        data = text.encode('utf-8')
+        buf = io.BytesIO()
+        info = tarfile.TarInfo(os.path.basename(path))
+        info.size = len(data)
+        info.mtime = time.time()
+        with tarfile.open(fileobj=buf, mode='w') as tar:
+            tar.addfile(info, io.BytesIO(data))
+        self.container.put_archive(os.path.dirname(path), buf.getvalue())
+
+    def _reload(self):
+        """ Tell Squid to read its configuration files again. """
+        self.container.exec_run(
+            self.RECONFIGURE.format(conf=self.SQUID_CONF), detach=False)
+
     @check_container
     def _make_container(self):
         """ Create a running container on the given Docker engine.
@@ -108,12 +891,127 @@ class SquidProxy(ContainerInterface, AbstractProxy):
         """
         kwargs = dict(self.CONTAINER)
         kwargs.setdefault('name', self.name)
+        kwargs['entrypoint'] = ['/bin/sh', '-c']
+        kwargs['command'] = [self.COMMAND.format(
+            conf=self.SQUID_CONF, cache=CACHE_DIR, rules=RULES_FILE,
+            log=ACCESS_LOG)]
+        kwargs['environment'] = {'SQUID_CONFIG': self.squid_conf,
+                                 'SQUID_RULES': self.rules.render()}
+        if self._port:
+            kwargs['ports'] = {self.SQUID_PORT: self._port}
         self.logger.debug('creating container')
         c = self.factory.start_container(kwargs)
         self.logger.debug('reloading container')
         c.reload()
         return c
 
+    def reconfigure(self, **settings):
+        """ Replace the configuration of the running proxy without
+        restarting it or dropping its cache.
+
+        Args:
+            **settings: arguments of :func:`.render_squid_conf`, replacing
+                the ones the proxy was created with.
+
+        Returns:
+            str: the new configuration.
+        """
+        self.squid_conf = render_squid_conf(**settings)
+        self.settings = settings
+        self._put_file(self.SQUID_CONF, self.squid_conf)
+        self._reload()
+        self.logger.debug('reconfigured squid')
+        return self.squid_conf
+
+    def set_upstreams(self, upstreams, rotation=None, allow_direct=False):
+        """ Replace the parent proxies of the running proxy, keeping its
+        other settings and its cache.
+
+        Args:
+            upstreams (list(:obj:`.Upstream` or str)): the new parents, an
+                empty list to go direct.
+            rotation (str): see :func:`.render_upstreams`.
+            allow_direct (bool): see :func:`.render_upstreams`.
+
+        Returns:
+            str: the new configuration.
+        """
+        settings = dict(self.settings, upstreams=upstreams or [],
+                        rotation=rotation, allow_direct=allow_direct)
+        return self.reconfigure(**settings)
+
+    def upstream_status(self):
+        """ Which parent proxies Squid is currently using.
+
+        Returns:
+            :obj:`collections.OrderedDict`: ``True`` for the upstreams that
+            are up, by :attr:`.Upstream.name`.
+        """
+        return parse_peer_status(self.manager('server_list'))
+
+    def set_rules(self, rules):
+        """ Replace the blocking rules of the running proxy, Squid reloads
+        them without restarting or dropping its cache.
+
+        Args:
+            rules (:obj:`.BlockRules`): the new rules, ``None`` to stop
+                blocking.
+
+        Returns:
+            None
+        """
+        self.rules = rules or BlockRules()
+        self._put_file(RULES_FILE, self.rules.render())
+        self._reload()
+        self.logger.debug('updated blocking rules, %s', self.rules)
+
+    def manager(self, page, timeout=5.0):
+        """ Read a page of Squid's cache manager.
+
+        Args:
+            page (str): name of the page, ie. ``counters`` or ``info``.
+            timeout (float): seconds to wait for the response.
+
+        Raises:
+            requests.RequestException: when the proxy can't be reached.
+
+        Returns:
+            str
+        """
+        resp = requests.get(self._manager_url + page, timeout=timeout,
+                            proxies={'http': None, 'https': None})
+        resp.raise_for_status()
+        return resp.text
+
+    def prefetch(self, urls, concurrency=8, assets=True, timeout=30.0):
+        """ Warm the cache by fetching URLs through the proxy without a
+        browser.
+
+        Only ``http`` URLs can be cached, ``https`` requests are tunneled
+        through Squid and are skipped.
+
+        Args:
+            urls (list(str)): pages or files to fetch.
+            concurrency (int): maximum number of requests at once.
+            assets (bool): also fetch the scripts, stylesheets and fonts
+                loaded by the pages.
+            timeout (float): seconds to wait for each response.
+
+        Returns:
+            :obj:`.PrefetchResult`
+        """
+        return prefetch(urls, lambda url: self._ip_port, concurrency,
+                        assets, timeout, self.logger)
+
+    def stats(self):
+        """ Current hit ratios and bytes saved by the cache.
+
+        Returns:
+            :obj:`.CacheStats`
+        """
+        return CacheStats.from_counters(parse_counters(
+            self.manager('counters')))
+
     def close_container(self):
         """ Removes the running container from the connected engine via
         :obj:`.DockerDriverBase.factory`.
@@ -131,3 +1029,361 @@ class SquidProxy(ContainerInterface, AbstractProxy):
         """
         self.logger.debug('proxy quit')
         self.close_container()
+
+
+PAC_TEMPLATE = """\
+function fnv1a(s) {
+    var h = 2166136261;
+    for (var i = 0; i < s.length; i++) {
+        h ^= s.charCodeAt(i);
+        h = Math.imul(h, 16777619) >>> 0;
+    }
+    h = Math.imul(h ^ (h >>> 16), 2246822507) >>> 0;
+    h = Math.imul(h ^ (h >>> 13), 3266489909) >>> 0;
+    return (h ^ (h >>> 16)) >>> 0;
+}
+function FindProxyForURL(url, host) {
+    var proxies = %(proxies)s;
+    var site = host;
+    var parts = host.split('.');
+    if (parts.length > 2 && !/^[0-9.]+$/.test(host)) {
+        site = parts.slice(-2).join('.');
+    }
+    var ranked = [];
+    for (var i = 0; i < proxies.length; i++) {
+        ranked.push([fnv1a(site + '#' + i), i]);
+    }
+    ranked.sort(function (a, b) { return b[0] - a[0] || a[1] - b[1]; });
+    var result = [];
+    for (var j = 0; j < ranked.length; j++) {
+        result.push('PROXY ' + proxies[ranked[j][1]]);
+    }
+    %(fallback)s
+    return result.join('; ');
+}
+"""
+"""str: proxy auto-config script ranking the proxies of a
+:obj:`.ProxyPool` for each site, mirrors :func:`.rank_proxies`."""
+
+
+def site_key(host):
+    """ The part of a host name requests are balanced on, so every host of a
+    site shares a proxy and its cache.
+
+    Args:
+        host (str): host name or IP address.
+
+    Returns:
+        str: the last two labels of a host name, IP addresses unchanged.
+    """
+    parts = host.split('.')
+    if len(parts) > 2 and not all(p.isdigit() for p in parts):
+        return '.'.join(parts[-2:])
+    return host
+
+
+def _fnv1a(text):
+    h = 2166136261
+    for c in text:
+        h = ((h ^ ord(c)) * 16777619) & 0xffffffff
+    # final mix, the keys of a site only differ in their last characters
+    h = ((h ^ (h >> 16)) * 2246822507) & 0xffffffff
+    h = ((h ^ (h >> 13)) * 3266489909) & 0xffffffff
+    return h ^ (h >> 16)
+
+
+def rank_proxies(host, count):
+    """ Order the proxies of a pool by preference for a host.
+
+    Rendezvous hashing on :func:`.site_key`: a site always prefers the same
+    proxy and adding or removing a proxy only moves the sites that
+    preferred it. Later proxies are used when the earlier ones are down.
+
+    Args:
+        host (str): host name of the request.
+        count (int): number of proxies in the pool.
+
+    Returns:
+        list(int): proxy indexes, most preferred first.
+    """
+    site = site_key(host)
+    return sorted(range(count),
+                  key=lambda i: (-_fnv1a('%s#%d' % (site, i)), i))
+
+
+def render_pac(addresses, fallback='DIRECT'):
+    """ Generate the proxy auto-config script for a list of proxies.
+
+    Args:
+        addresses (list(tuple(str, int))): host and port of each proxy.
+        fallback (str): PAC directive used when every proxy is down,
+            ``None`` to fail instead of connecting directly.
+
+    Returns:
+        str: the JavaScript of the script.
+    """
+    return PAC_TEMPLATE % {
+        'proxies': json.dumps(['%s:%d' % a for a in addresses]),
+        'fallback': 'result.push(%s);' % json.dumps(fallback)
+                    if fallback else ''}
+
+
+class ProxyPool(AbstractProxy):
+    """ Several Squid proxies sharing the traffic of a pool's browsers.
+
+    With ``strategy='hash'`` every browser gets a proxy auto-config script
+    sending each site to the proxy chosen by :func:`.rank_proxies`, keeping
+    a site's objects in one cache. Browsers skip to the next proxy in the
+    ranking while one is down. With ``strategy='least_connections'`` each
+    browser is pinned to the proxy serving the fewest browsers.
+
+    A background check replaces unresponsive proxies with new containers
+    that keep the same address, browsers don't have to be recreated.
+
+    Args:
+        size (int): number of proxy containers.
+        strategy (str): ``'hash'`` or ``'least_connections'``.
+        factory (:obj:`~selenium_docker.base.ContainerFactory`):
+        logger (:obj:`logging.Logger`):
+        check_interval (float): seconds between health checks, ``None`` to
+            only check when :func:`~ProxyPool.check` is called.
+        proxy_cls (type): class of the proxies.
+        key (str): name the proxies after this key so they are adopted by
+            later pools using the same key and factory namespace, see
+            :func:`.SquidProxy.shared`.
+        **settings: arguments of :func:`.render_squid_conf`.
+
+    Example::
+
+        pool = DriverPool(40, proxies=4, proxy_strategy='hash')
+    """
+
+    STRATEGIES = ('hash', 'least_connections')
+    """tuple(str): supported ways of assigning browsers to proxies."""
+
+    def __init__(self, size=2, strategy='hash', factory=None, logger=None,
+                 check_interval=10.0, proxy_cls=SquidProxy, key=None,
+                 **settings):
+        if strategy not in self.STRATEGIES:
+            raise ValueError('unknown proxy strategy %s' % strategy)
+        self.size = max(1, size)
+        self.strategy = strategy
+        self.factory = factory or ContainerFactory.get_default_factory()
+        self.logger = logger or logging.getLogger(
+            '%s.ProxyPool' % __name__)
+        self.check_interval = check_interval
+        self.proxy_cls = proxy_cls
+        self.settings = settings
+        self.replaced = 0  # type: int
+        self._monitor = None  # type: gevent.Greenlet
+        names = [None] * self.size
+        if key is not None:
+            names = [self.factory.gen_name(key='squid3-%s-%d' % (key, i))
+                     for i in range(self.size)]
+        threads = [gevent.spawn(self._create, name) for name in names]
+        gevent.joinall(threads)
+        self.proxies = [t.value for t in threads if t.successful()]
+        errors = [t.exception for t in threads if not t.successful()]
+        if errors:
+            self.close_container()
+            raise errors[0]
+        self._connections = [0] * self.size
+        self._locks = [Semaphore() for _ in range(self.size)]
+        pac = render_pac([p.address for p in self.proxies])
+        self.selenium_proxy = Proxy({
+            'proxyType': ProxyType.PAC,
+            'proxyAutoconfigUrl': 'data:application/x-ns-proxy-autoconfig;'
+                                  'base64,' + base64.b64encode(
+                                      pac.encode('utf-8')).decode('ascii')})
+        if check_interval:
+            self._monitor = gevent.spawn(self._check_loop)
+
+    def __repr__(self):
+        return '<ProxyPool(size=%d,strategy=%s)>' % (self.size, self.strategy)
+
+    def __len__(self):
+        return len(self.proxies)
+
+    @property
+    def connections(self):
+        """list(int): browsers assigned to each proxy. """
+        return list(self._connections)
+
+    def _create(self, name=None, port=None):
+        return self.proxy_cls(factory=self.factory, name=name, port=port,
+                              **self.settings)
+
+    def proxy_for(self, url):
+        """ The proxy a browser using the auto-config script sends a request
+        to while every proxy is up.
+
+        Args:
+            url (str): URL or host name of the request.
+
+        Returns:
+            :obj:`.SquidProxy`
+        """
+        host = urlparse(url).hostname or url
+        return self.proxies[rank_proxies(host, len(self.proxies))[0]]
+
+    def assign(self):
+        """ Pick the proxy configuration for a new browser.
+
+        Returns:
+            :obj:`.ProxyPool`: this pool with the ``hash`` strategy,
+            otherwise the :obj:`.SquidProxy` with the fewest browsers.
+        """
+        if self.strategy == 'hash':
+            return self
+        index = self._connections.index(min(self._connections))
+        self._connections[index] += 1
+        return self.proxies[index]
+
+    def release(self, proxy):
+        """ Stop counting a browser that was assigned ``proxy``.
+
+        Args:
+            proxy: value returned by :func:`~ProxyPool.assign`.
+
+        Returns:
+            None
+        """
+        if self.strategy == 'hash' or proxy is None:
+            return
+        # replacements keep the name of the proxy they replaced
+        for index, p in enumerate(self.proxies):
+            if p.name == proxy.name and self._connections[index] > 0:
+                self._connections[index] -= 1
+
+    def is_healthy(self, proxy):
+        """ Check that a proxy answers its cache manager.
+
+        Returns:
+            bool
+        """
+        try:
+            proxy.manager('info', timeout=2.0)
+        except Exception as e:
+            self.logger.warning('proxy %s is unhealthy, %s', proxy.name, e)
+            return False
+        return True
+
+    def check(self):
+        """ Replace the proxies that stopped responding.
+
+        Returns:
+            int: number of proxies replaced.
+        """
+        threads = [gevent.spawn(self._check, index)
+                   for index in range(len(self.proxies))]
+        gevent.joinall(threads)
+        return sum(1 for t in threads if t.value)
+
+    def _check(self, index):
+        with self._locks[index]:
+            proxy = self.proxies[index]
+            if self.is_healthy(proxy):
+                return False
+            self.logger.info('replacing proxy %s', proxy.name)
+            port = proxy.address[1]
+            try:
+                proxy.close_container()
+            except Exception as e:
+                self.logger.exception(e, exc_info=True)
+            # reuse the name and host port so browsers can keep the address
+            replacement = self._create(
+                proxy.name, None if self.factory.network else port)
+            self.proxies[index] = replacement
+            self.replaced += 1
+            return True
+
+    def _check_loop(self):
+        while True:
+            gevent.sleep(self.check_interval)
+            try:
+                self.check()
+            except Exception as e:
+                self.logger.exception(e, exc_info=True)
+
+    def set_rules(self, rules):
+        """ Replace the blocking rules of every proxy, replacements are
+        created with the new rules.
+
+        References:
+            :func:`.SquidProxy.set_rules`
+
+        Returns:
+            None
+        """
+        self.settings['rules'] = rules
+        gevent.joinall([gevent.spawn(p.set_rules, rules)
+                        for p in self.proxies], raise_error=True)
+
+    def set_upstreams(self, upstreams, rotation=None, allow_direct=False):
+        """ Replace the parent proxies of every proxy, replacements are
+        created with the new upstreams.
+
+        References:
+            :func:`.SquidProxy.set_upstreams`
+
+        Returns:
+            None
+        """
+        self.settings.update(upstreams=upstreams or [], rotation=rotation,
+                             allow_direct=allow_direct)
+        gevent.joinall([gevent.spawn(p.set_upstreams, upstreams, rotation,
+                                     allow_direct)
+                        for p in self.proxies], raise_error=True)
+
+    def prefetch(self, urls, concurrency=8, assets=True, timeout=30.0):
+        """ Warm the caches of the proxies.
+
+        With the ``hash`` strategy each URL is fetched through the proxy
+        browsers send its site to, otherwise through every proxy.
+
+        References:
+            :func:`.SquidProxy.prefetch`
+
+        Returns:
+            :obj:`.PrefetchResult`
+        """
+        if self.strategy == 'hash':
+            return prefetch(urls, lambda url: self.proxy_for(url)._ip_port,
+                            concurrency, assets, timeout, self.logger)
+        urls = list(urls)
+        results = [p.prefetch(urls, concurrency, assets, timeout)
+                   for p in self.proxies]
+        return sum(results[1:], results[0])
+
+    def stats(self):
+        """ Cache statistics summed over every proxy.
+
+        Returns:
+            :obj:`.CacheStats`
+        """
+        totals = [0] * len(CacheStats._fields)
+        for proxy in self.proxies:
+            totals = [a + b for a, b in zip(totals, proxy.stats())]
+        return CacheStats(*totals)
+
+    def close_container(self):
+        """ Stop the health checks and remove every proxy container.
+
+        Returns:
+            None
+        """
+        if self._monitor is not None:
+            self._monitor.kill(block=False)
+            self._monitor = None
+        gevent.joinall([gevent.spawn(p.close_container)
+                        for p in self.proxies])
+        self.proxies = []
+
+    def quit(self):
+        """ Alias for :func:`~ProxyPool.close_container`.
+
+        Returns:
+            None
+        """
+        self.logger.debug('proxy pool quit')
+        self.close_container()
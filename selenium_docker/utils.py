@@ -20,8 +20,10 @@
 
 import os
 import random
+import shutil
 import string
 import subprocess
+import tarfile
 from functools import partial
 
 import gevent
@@ -34,6 +36,86 @@ if PY2:
 else:  # pragma: no cover
     _range = range
 
+COPY_CHUNK_SIZE = 1024 * 1024
+"""int: bytes copied at a time when streaming files out of containers."""
+
+
+class _ChunkReader(object):
+    """ File-like wrapper around an iterator of byte chunks.
+
+    Args:
+        chunks (Iterable[bytes]): data as returned by the Docker API when
+            streaming a response.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = bytearray()
+        self._offset = 0
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) - self._offset < size:
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                break
+            # drop what was already read before growing the buffer, only
+            # the unread tail is moved and never once per read
+            if self._offset:
+                del self._buffer[:self._offset]
+                self._offset = 0
+            self._buffer += chunk
+        end = len(self._buffer)
+        if 0 <= size < end - self._offset:
+            end = self._offset + size
+        data = bytes(self._buffer[self._offset:end])
+        self._offset = end
+        return data
+
+
+def extract_archive(stream, destination, chunk_size=COPY_CHUNK_SIZE):
+    """ Stream the first file inside a tar archive straight to disk.
+
+    The archive is never held in memory or written to disk as a whole,
+    it's read one chunk at a time and the member's contents are copied to
+    a ``.part`` file next to ``destination`` which is renamed once the copy
+    has completed.
+
+    Args:
+        stream: tar data, as returned by
+            :func:`~docker.models.containers.Container.get_archive`. This
+            can be a file-like object with a ``read`` method or an iterable
+            of byte chunks.
+        destination (str): final file path for the extracted member.
+        chunk_size (int): number of bytes to copy at a time.
+
+    Raises:
+        IOError: when the archive contains no regular files.
+
+    Returns:
+        int: number of bytes written to ``destination``.
+    """
+    if not hasattr(stream, 'read'):
+        stream = _ChunkReader(stream)
+    partial_path = '%s.part' % destination
+    tar = tarfile.open(fileobj=stream, mode='r|')
+    try:
+        for member in tar:
+            if not member.isfile():
+                continue
+            source = tar.extractfile(member)
+            with open(partial_path, 'wb') as out_file:
+                shutil.copyfileobj(source, out_file, chunk_size)
+            if os.path.exists(destination):
+                os.unlink(destination)
+            os.rename(partial_path, destination)
+            return member.size
+    finally:
+        tar.close()
+        if os.path.exists(partial_path):
+            os.unlink(partial_path)
+    raise IOError('no file found in archive for %s' % destination)
+
 
 def gen_uuid(length=4):
     """ Generate a random ID.
@@ -73,21 +155,33 @@ def in_container():
     return any(checks)
 
 
-def ip_port(container, port):
+def ip_port(container, port, network=None):
     """ Returns an updated HostIp and HostPort from the container's
     network properties. Calls container reload on-call.
 
+    When ``network`` is supplied the container's own IP address on that
+    network is returned with the unpublished container port instead. The
+    container is only reloaded if its address isn't known yet.
+
     Args:
         container (Container):
         port (str):
+        network (str): name of a user-defined network the container
+            is attached to.
 
     Returns:
         tuple(str, int):
             IP/hostname and port.
 
     """
-    # make sure it's running, get the newest values
     port = str(port)
+    if network is not None:
+        networks = DotMap(container.attrs).NetworkSettings.Networks
+        if not networks[network].IPAddress:
+            container.reload()
+            networks = DotMap(container.attrs).NetworkSettings.Networks
+        return networks[network].IPAddress, int(port.split('/')[0])
+    # make sure it's running, get the newest values
     container.reload()
     attr = DotMap(container.attrs)
     conn = attr.NetworkSettings.Ports[port][0]
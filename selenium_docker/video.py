@@ -0,0 +1,354 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# >>
+#   Copyright 2018 Vivint, inc.
+#
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#
+#       http://www.apache.org/licenses/LICENSE-2.0
+#
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+#
+#    vivint-selenium-docker, 20017
+# <<
+
+import os
+from collections import OrderedDict, namedtuple
+from logging import getLogger
+
+from gevent.pool import Pool
+
+from selenium_docker.meta import config
+
+__all__ = [
+    'EncodingProfile',
+    'PROFILES',
+    'Segment',
+    'TaskRecording',
+    'VideoExporter',
+    'get_profile',
+    'parse_segment_list',
+    'render_ffserver_conf'
+]
+
+
+class EncodingProfile(object):
+    """ ffmpeg settings used when recording a video driver's screen.
+
+    Args:
+        name (str): identifier of the profile.
+        codec (str): video codec.
+        preset (str): encoder speed preset, faster presets use less CPU
+            but make larger files.
+        crf (int): constant rate factor, higher values give smaller files
+            with a lower quality.
+        qp (int): constant quantizer, used instead of ``crf``.
+        fps (int): frames captured per second, ``None`` to use
+            ``config.ffmpeg_fps``.
+        scale (str): ffmpeg scale filter size, ``WIDTH:HEIGHT``. Use ``-2``
+            for one of them to keep the aspect ratio.
+        keyframe_interval (int): frames between key frames, ``1`` makes
+            every frame a key frame.
+        extra (str): any other output options.
+    """
+
+    def __init__(self, name, codec='libx264', preset='ultrafast', crf=None,
+                 qp=None, fps=None, scale=None, keyframe_interval=None,
+                 extra=None):
+        self.name = name
+        self.codec = codec
+        self.preset = preset
+        self.crf = crf
+        self.qp = qp
+        self.fps = fps
+        self.scale = scale
+        self.keyframe_interval = keyframe_interval
+        self.extra = extra
+
+    def __repr__(self):
+        return '<EncodingProfile(%s: %s)>' % (self.name, self.args)
+
+    @property
+    def args(self):
+        """str: ffmpeg output options for this profile. """
+        args = ['-c:v', self.codec]
+        if self.preset:
+            args += ['-preset', self.preset]
+        if self.qp is not None:
+            args += ['-qp', self.qp]
+        if self.crf is not None:
+            args += ['-crf', self.crf]
+        if self.keyframe_interval:
+            args += ['-g', self.keyframe_interval]
+        if self.scale:
+            args += ['-vf', 'scale=%s' % self.scale]
+        if self.extra:
+            args.append(self.extra)
+        return ' '.join(map(str, args))
+
+    @property
+    def framerate(self):
+        """str: frames captured per second. """
+        return str(self.fps or config.ffmpeg_fps)
+
+
+PROFILES = {
+    'default': EncodingProfile('default', qp=18),
+    'debug': EncodingProfile('debug', crf=35, fps=5, scale='640:-2'),
+    'keyframe': EncodingProfile('keyframe', crf=30, fps=1,
+                                keyframe_interval=1),
+    'high': EncodingProfile('high', preset='veryfast', crf=18),
+}
+""":obj:`dict`: named encoding profiles.
+
+Attributes:
+    default: near lossless at the configured frame rate, the encoding used
+        before profiles existed.
+    debug: low frame rate and half size, enough to see what a test did.
+    keyframe: one key frame per second, every frame can be extracted
+        without decoding the ones before it.
+    high: good quality at a reasonable size for recordings that are kept.
+"""
+
+
+def get_profile(profile=None):
+    """ Look up an encoding profile.
+
+    Args:
+        profile (str or :obj:`.EncodingProfile`): name of one of the
+            :obj:`.PROFILES`, a profile instance or ``None`` for the
+            ``ffmpeg_profile`` setting.
+
+    Raises:
+        ValueError: when there's no profile by that name.
+
+    Returns:
+        :obj:`.EncodingProfile`
+    """
+    if isinstance(profile, EncodingProfile):
+        return profile
+    name = profile or config.ffmpeg_profile
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError('unknown encoding profile %s' % name)
+
+
+class Segment(namedtuple('Segment', ['filename', 'start', 'end'])):
+    """ A finished piece of a segmented recording.
+
+    Attributes:
+        filename (str): name of the file inside the recording directory of
+            the container.
+        start (float): UNIX timestamp of the first frame.
+        end (float): UNIX timestamp of the last frame.
+    """
+    __slots__ = ()
+
+    def overlaps(self, start=None, end=None):
+        """ Check if this segment covers any part of a time range.
+
+        Args:
+            start (float): UNIX timestamp, ``None`` for an open start.
+            end (float): UNIX timestamp, ``None`` for an open end.
+
+        Returns:
+            bool
+        """
+        if start is not None and self.end < start:
+            return False
+        if end is not None and self.start > end:
+            return False
+        return True
+
+
+class TaskRecording(namedtuple('TaskRecording', [
+        'driver', 'filename', 'start', 'end', 'offset', 'segments',
+        'files', 'task'])):
+    """ The part of a video driver's recording that covers one task.
+
+    Attributes:
+        driver (str): name of the driver and container that ran the task.
+        filename (str): name of the recording the task is part of, when the
+            driver records its whole lifetime to a single file.
+        start (float): UNIX timestamp when the task started.
+        end (float): UNIX timestamp when the task finished.
+        offset (float): seconds from the start of ``filename`` to the start
+            of the task, ``None`` for segmented recordings.
+        segments (list(:obj:`.Segment`)): finished segments covering the
+            task.
+        files (list(str)): local copies of ``segments``, only fetched for
+            failed tasks.
+        task (str): identifier of the task, as listed in the
+            :obj:`~selenium_docker.catalog.RecordingCatalog`.
+    """
+    __slots__ = ()
+
+    @property
+    def duration(self):
+        """float: length of the task in seconds. """
+        return self.end - self.start
+
+
+def parse_segment_list(text, epoch=0.0):
+    """ Parse a CSV segment list written by ffmpeg's segment muxer.
+
+    Every line has the format ``filename,start,end`` with times relative to
+    the start of the recording. When segments are wrapped the same filename
+    is reused, only the latest entry for each file is kept.
+
+    Args:
+        text (str): contents of the segment list.
+        epoch (float): UNIX timestamp when the recording started, added to
+            the relative segment times.
+
+    Returns:
+        list(:obj:`.Segment`): ordered from oldest to newest.
+    """
+    segments = OrderedDict()
+    for line in text.splitlines():
+        parts = line.strip().rsplit(',', 2)
+        if len(parts) != 3:
+            continue
+        try:
+            start, end = float(parts[1]), float(parts[2])
+        except ValueError:
+            continue
+        name = os.path.basename(parts[0].strip('"'))
+        segments.pop(name, None)
+        segments[name] = Segment(name, epoch + start, epoch + end)
+    return list(segments.values())
+
+
+class VideoExporter(object):
+    """ Background pipeline for pulling finished recordings out of video
+    driver containers.
+
+    Each export takes ownership of the driver's container: the recording is
+    stopped and streamed to disk, then the container is removed. Only
+    ``size`` exports run at once, additional exports block the caller until
+    a worker is free.
+
+    Args:
+        size (int): maximum number of concurrent exports.
+        logger (:obj:`logging.Logger`):
+        postprocessor (:obj:`~selenium_docker.postprocess.PostProcessor`):
+            every exported file is submitted to it once the export
+            completes. Lifetime recordings are submitted with the tasks
+            the driver marked while recording them.
+
+    Example::
+
+        exporter = VideoExporter(size=4)
+        driver = ChromeVideoDriver(path='/videos', exporter=exporter)
+        driver.get('https://python.org')
+
+        export = driver.quit()  # returns immediately
+        print(export.get())     # final path of the video file
+    """
+
+    def __init__(self, size=2, logger=None, postprocessor=None):
+        self.size = max(1, size)
+        self.logger = logger or getLogger(
+            '%s.VideoExporter' % __name__)
+        self.postprocessor = postprocessor
+        self._pool = Pool(size=self.size)
+
+    def __repr__(self):
+        return '<VideoExporter(size=%d,pending=%d)>' % (
+            self.size, self.pending)
+
+    @property
+    def pending(self):
+        """int: number of exports that haven't finished yet. """
+        return len(self._pool)
+
+    def export(self, driver, path=None, shard_by_date=True):
+        """ Stop the recording of ``driver`` and export it in the background.
+
+        Args:
+            driver (:obj:`~selenium_docker.drivers.VideoDriver`): driver with
+                a recording in progress. Its container is removed once the
+                export completes.
+            path (str): local directory where the video file should be
+                stored, defaults to the driver's ``save_path``.
+            shard_by_date (bool): see
+                :func:`~selenium_docker.drivers.VideoDriver.stop_recording`.
+
+        Returns:
+            :obj:`gevent.Greenlet`:
+                handle for the export, ``get()`` returns the path to the
+                completed recording.
+        """
+        if path is None:
+            path = driver.save_path
+        self.logger.debug('queueing export for %s', driver.name)
+        return self._pool.spawn(self._export, driver, path, shard_by_date)
+
+    def _export(self, driver, path, shard_by_date):
+        try:
+            started = None
+            if getattr(self.postprocessor, 'trim_tasks', None) is not None:
+                started = driver.recording_started
+            destination = driver.stop_recording(path, shard_by_date)
+            self.logger.debug('exported %s to %s', driver.name, destination)
+            if self.postprocessor is not None:
+                # segmented recordings export a list of files
+                if isinstance(destination, list):
+                    for p in destination:
+                        self.postprocessor.submit(p)
+                else:
+                    self.postprocessor.submit(destination, tasks=self._tasks(
+                        driver, destination, started))
+            return destination
+        except Exception as e:
+            self.logger.exception(e, exc_info=True)
+            raise
+        finally:
+            driver.close_container()
+
+    @staticmethod
+    def _tasks(driver, destination, started):
+        """ Where the tasks marked on ``driver`` are in a lifetime
+        recording that began at ``started``. """
+        if started is None:
+            return None
+        return [TaskRecording(driver.name, os.path.basename(destination),
+                              start, end, start - started, [], [], task)
+                for task, start, end in driver.task_marks(started)]
+
+    def join(self, timeout=None):
+        """ Wait for the pending exports to finish.
+
+        Args:
+            timeout (float): seconds to wait, or ``None`` to wait for all
+                of them.
+
+        Returns:
+            bool: ``True`` when every export has finished.
+        """
+        return self._pool.join(timeout=timeout)
+
+
+def render_ffserver_conf(template, **values):
+    """ Fill in the ``{PLACEHOLDERS}`` of an ffserver configuration.
+
+    The ffmpeg images ship ``/opt/ffserver.conf-orig`` with placeholders
+    that have to be replaced before ffserver can be started.
+
+    Args:
+        template (str): contents of the configuration template.
+        **values: replacement for each placeholder, by name.
+
+    Returns:
+        str: the rendered configuration.
+    """
+    for key, value in values.items():
+        template = template.replace('{%s}' % key, str(value))
+    return template
@@ -65,6 +65,10 @@ setup(
     platforms=['any'],
     install_requires=list(requirements),
     extras_require={
+        'capture': [
+            'numpy',
+            'Pillow'
+        ],
         'dev': [
             'pytest',
             'pytest-cov',
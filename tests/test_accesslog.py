@@ -0,0 +1,158 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# >>
+#     vivint-selenium-docker, 2017
+# <<
+
+import pytest
+
+from selenium_docker.accesslog import (
+    OTHER, AccessLog, HarCapture, Histogram, TrafficStats, parse_entry)
+
+LINES = [
+    '1516307452.123    245 172.18.0.3 TCP_MISS/200 5120 GET '
+    'http://www.example.com/ - HIER_DIRECT/93.184.216.34 text/html',
+    '1516307452.301     12 172.18.0.3 TCP_MEM_HIT/200 2048 GET '
+    'http://cdn.example.com/app.js - HIER_NONE/- application/javascript',
+    '1516307452.400     80 172.18.0.4 TCP_DENIED/403 3900 GET '
+    'http://tracker.net/pixel.gif - HIER_NONE/- text/html',
+    '1516307453.000   1500 172.18.0.4 TCP_TUNNEL/200 9000 CONNECT '
+    'secure.example.org:443 - HIER_DIRECT/10.0.0.1 -',
+]
+
+
+def test_parse_entry():
+    entry = parse_entry(LINES[0])
+    assert entry.client == '172.18.0.3'
+    assert entry.cache_status == 'TCP_MISS'
+    assert entry.status == 200
+    assert entry.size == 5120
+    assert entry.host == 'www.example.com'
+    assert entry.started == pytest.approx(1516307451.878)
+    assert not entry.is_hit
+    assert parse_entry(LINES[1]).is_hit
+    assert parse_entry(LINES[3]).host == 'secure.example.org'
+    assert parse_entry('') is None
+    assert parse_entry('garbage ' * 10) is None
+
+
+def test_histogram():
+    hist = Histogram(precision=0.01)
+    assert hist.percentile(50) is None
+    for value in range(1, 1001):
+        hist.add(value)
+    assert hist.count == 1000
+    assert hist.mean == pytest.approx(500.5)
+    assert hist.percentile(50) == pytest.approx(500, rel=0.01)
+    assert hist.percentile(99) == pytest.approx(990, rel=0.01)
+    assert hist.percentile(100) == 1000
+    # the number of buckets doesn't grow with the number of values
+    assert len(hist._buckets) < 700
+    other = Histogram(precision=0.01)
+    other.add(0, count=1000)
+    hist.merge(other)
+    assert hist.count == 2000
+    assert hist.percentile(25) == 0
+    assert hist.percentile(75) == pytest.approx(500, rel=0.01)
+
+
+def test_traffic_stats():
+    stats = TrafficStats()
+    for line in LINES:
+        stats.add(parse_entry(line))
+    assert stats.requests == 4
+    assert stats.bytes == 5120 + 2048 + 3900 + 9000
+    assert stats.hits == 1
+    assert stats.errors == 1
+    assert stats.hit_ratio == 0.25
+    assert stats.cache_status['TCP_MISS'] == 1
+    summary = stats.as_dict()
+    assert summary['latency_ms']['max'] == 1500
+    total = TrafficStats()
+    total.merge(stats)
+    total.merge(stats)
+    assert total.requests == 8
+    assert total.cache_status['TCP_DENIED'] == 2
+
+
+def test_access_log():
+    log = AccessLog(proxy=None, max_keys=2)
+    tracker = log.track('172.18.0.3')
+    log.feed(LINES[0])
+    log.feed(LINES[1])
+    assert log.untrack(tracker, settle=False) is tracker
+    log.feed(LINES[2])
+    log.feed(LINES[3])
+    assert log.feed('not a log line') is None
+    assert log.total.requests == 4
+    assert log.domains['example.com'].requests == 2
+    assert log.domains['tracker.net'].requests == 1
+    # domains over the limit are counted together
+    assert log.domains[OTHER].requests == 1
+    assert log.clients['172.18.0.4'].bytes == 3900 + 9000
+    assert [site for site, _ in log.top()] == ['example.com', 'tracker.net']
+    assert [site for site, _ in log.top(1, key='errors')] == ['tracker.net']
+    summary = tracker.summary()
+    assert summary['requests'] == 2
+    assert summary['domains']['example.com']['hits'] == 1
+    assert not log._trackers
+
+
+def test_access_log_windows():
+    log = AccessLog(proxy=None)
+    # requests of the previous task logged late are left out
+    tracker = log.track('172.18.0.4', since=1516307452.5)
+    log.feed(LINES[2])
+    log.feed(LINES[3])
+    assert tracker.total.requests == 0
+    tracker = log.track('172.18.0.3')
+    log.feed(LINES[0])
+    tracker.until = 1516307452.0
+    # received after the task finished, only logged before it settled
+    log.feed(LINES[1])
+    assert tracker.total.requests == 1
+    assert log.total.requests == 4
+
+
+def test_access_log_resume():
+    log = AccessLog(proxy=None)
+    log._positions['c1'] = (1516307452.2, set())
+    assert [log._resume('c1', line) is not None for line in LINES] == [
+        False, True, True, True]
+    # a restarted reader reads the backlog again
+    assert [log._resume('c1', line) for line in LINES] == [None] * 4
+    assert log.total.requests == 3
+    assert log._resume('c2', LINES[0]) is not None
+
+
+def test_har_capture():
+    log = AccessLog(proxy=None)
+    capture = log.track('172.18.0.4', HarCapture)
+    for line in LINES:
+        log.feed(line)
+    log.untrack(capture, settle=False)
+    har = capture.har('job-1')['log']
+    assert har['version'] == '1.2'
+    assert har['pages'][0]['id'] == 'job-1'
+    assert len(har['entries']) == 2
+    assert har['_dropped'] == 0
+    # entries are ordered by the time the requests started
+    tunnel, denied = har['entries']
+    assert tunnel['request']['method'] == 'CONNECT'
+    assert tunnel['startedDateTime'] == '2018-01-18T20:30:51.500Z'
+    assert tunnel['serverIPAddress'] == '10.0.0.1'
+    assert tunnel['response']['content']['mimeType'] == ''
+    assert denied['response']['status'] == 403
+    assert denied['timings']['wait'] == denied['time'] == 80
+    assert denied['_cacheStatus'] == 'TCP_DENIED'
+    assert 'serverIPAddress' not in denied
+    # requests over the limits are only counted
+    capture = HarCapture('172.18.0.3', max_entries=1)
+    for line in LINES[:2]:
+        capture.add(parse_entry(line))
+    assert len(capture.har()['log']['entries']) == 1
+    assert capture.dropped == 1
+    assert capture.summary()['requests'] == 2
+    capture = HarCapture('172.18.0.3', max_kb=0)
+    capture.add(parse_entry(LINES[0]))
+    assert not capture.entries
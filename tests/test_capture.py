@@ -0,0 +1,74 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# >>
+#     vivint-selenium-docker, 2017
+# <<
+
+import io
+import json
+import os
+
+import gevent
+import pytest
+
+np = pytest.importorskip('numpy')
+Image = pytest.importorskip('PIL.Image')
+
+from selenium_docker.capture import (
+    FrameCapture, frame_difference, to_array)
+
+
+class ScreenDriver(object):
+    """ Serves a scripted sequence of screenshots. """
+    name = 'screen'
+    CAPTURE_SOURCE = 'webdriver'
+
+    def __init__(self, shades):
+        self.shades = list(shades)
+
+    def get_screenshot_as_png(self):
+        shade = self.shades.pop(0) if len(self.shades) > 1 else self.shades[0]
+        return png(shade)
+
+
+def png(shade, size=(320, 200)):
+    buf = io.BytesIO()
+    Image.new('L', size, shade).save(buf, format='PNG')
+    return buf.getvalue()
+
+
+def test_frame_difference():
+    black, white = to_array(png(0)), to_array(png(255))
+    assert black.shape == (100, 160)
+    assert frame_difference(None, black) == 1.0
+    assert frame_difference(black, black) == 0.0
+    assert frame_difference(black, white) == 1.0
+    assert frame_difference(black, to_array(png(0, (100, 100)))) == 1.0
+
+
+def test_frame_capture(tmpdir):
+    driver = ScreenDriver([0, 0, 1, 128, 128, 255])
+    path = str(tmpdir.join('frames'))
+    capture = FrameCapture(driver, path, interval=0.0, threshold=0.1)
+    os.makedirs(path)
+    for _ in range(6):
+        capture._sample()
+    frames = capture.stop()
+    assert [f.index for f in frames] == [0, 1, 2]
+    assert capture.samples == 6
+    with open(os.path.join(path, FrameCapture.TIMELINE)) as f:
+        timeline = json.load(f)
+    assert len(timeline['frames']) == 3
+    assert sorted(os.listdir(path)) == [
+        '00000.png', '00001.png', '00002.png', FrameCapture.TIMELINE]
+
+
+def test_frame_capture_background(tmpdir):
+    driver = ScreenDriver([0, 255, 0, 255])
+    with FrameCapture(driver, str(tmpdir), interval=0.01,
+                      max_frames=3) as capture:
+        gevent.sleep(0.2)
+        assert not capture.is_capturing
+    assert len(capture.frames) == 3
+    with pytest.raises(ValueError):
+        FrameCapture(driver, str(tmpdir), source='nope')
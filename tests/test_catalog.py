@@ -0,0 +1,58 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# >>
+#     vivint-selenium-docker, 2017
+# <<
+
+import os
+
+import pytest
+
+from selenium_docker.catalog import RecordingCatalog
+
+
+@pytest.fixture
+def catalog():
+    c = RecordingCatalog(':memory:')
+    yield c
+    c.close()
+
+
+def test_catalog_add_find(catalog, tmpdir):
+    video = tmpdir.join('chrome.mkv')
+    video.write(b'x' * 10)
+    row = catalog.add(str(video), driver='d1', container='abc',
+                      browser='Chrome', started=100.0, stopped=200.0,
+                      metadata={'title': 'chrome.mkv'},
+                      tasks=['job-1', 'job-2'])
+    catalog.add('/videos/other.mkv', driver='d2', started=300.0,
+                stopped=400.0, tasks=['job-3'])
+    assert len(catalog) == 2
+
+    entry = catalog.get(str(video))
+    assert entry.id == row
+    assert entry.size == 10
+    assert entry.metadata == {'title': 'chrome.mkv'}
+    assert entry.tasks == ['job-1', 'job-2']
+
+    assert [e.driver for e in catalog.find()] == ['d2', 'd1']
+    assert [e.driver for e in catalog.find(task='job-2')] == ['d1']
+    assert [e.driver for e in catalog.find(driver='d2')] == ['d2']
+    assert [e.driver for e in catalog.find(since=250.0)] == ['d2']
+    assert [e.driver for e in catalog.find(until=250.0)] == ['d1']
+    assert len(catalog.find(limit=1)) == 1
+    assert catalog.get('/nope.mkv') is None
+
+
+def test_catalog_prune(catalog, tmpdir):
+    old = tmpdir.join('old.mkv')
+    old.write(b'old')
+    catalog.add(str(old), started=10.0, stopped=20.0, tasks=['a'])
+    catalog.add('/videos/new.mkv', started=100.0, stopped=200.0)
+
+    with pytest.raises(ValueError):
+        catalog.prune()
+    assert catalog.prune(before=50.0, delete_files=True) == 1
+    assert not os.path.exists(str(old))
+    assert len(catalog) == 1
+    assert catalog.find(task='a') == []
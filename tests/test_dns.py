@@ -0,0 +1,48 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# >>
+#     vivint-selenium-docker, 2017
+# <<
+
+from selenium_docker.base import ContainerFactory
+from selenium_docker.dns import DnsCache, DnsStats, parse_dnsmasq_stats
+
+
+def test_parse_dnsmasq_stats():
+    assert parse_dnsmasq_stats('dnsmasq: started, version 2.78') is None
+    stats = parse_dnsmasq_stats('\n'.join([
+        'dnsmasq: time 1516307452',
+        'dnsmasq: cache size 150, 0/5 cache insertions re-used unexpired '
+        'cache entries.',
+        'dnsmasq: queries forwarded 5, queries answered locally 10',
+        'dnsmasq: time 1516307460',
+        'dnsmasq: cache size 150, 2/40 cache insertions re-used unexpired '
+        'cache entries.',
+        'dnsmasq: queries forwarded 40, queries answered locally 120',
+        'dnsmasq: server 127.0.0.11#53: queries sent 40, retried or '
+        'failed 0']))
+    assert stats == DnsStats(150, 2, 40, 40, 120)
+    assert stats.queries == 160
+    assert stats.hit_ratio == 0.75
+    delta = stats.since(DnsStats(150, 0, 5, 5, 10))
+    assert delta == DnsStats(150, 2, 35, 35, 110)
+    assert DnsStats(0, 0, 0, 0, 0).hit_ratio == 0.0
+
+
+def test_dns_cache():
+    f = ContainerFactory(None, 'vivint-dns', make_default=False,
+                         dns={'min_ttl': 600})
+    c = f.start_container({'image': 'selenium/standalone-chrome'},
+                          detach=True)
+    assert isinstance(f.dns, DnsCache)
+    assert '--min-cache-ttl=600' in f.dns.command
+    c.reload()
+    assert c.attrs['HostConfig']['Dns'] == [f.dns.ip]
+    before = f.dns.stats()
+    for _ in range(3):
+        c.exec_run('getent hosts python.org')
+    stats = f.dns.stats().since(before)
+    assert stats.queries >= 3
+    assert stats.answered >= 2
+    f.stop_all_containers()
+    assert f._dns is None
@@ -8,6 +8,7 @@ from gevent.monkey import patch_all
 patch_all()
 
 import os
+import shutil
 
 import pytest
 import requests
@@ -15,6 +16,7 @@ import requests
 from selenium_docker.drivers import DockerDriverBase
 from selenium_docker.drivers.chrome import ChromeDriver, ChromeVideoDriver
 from selenium_docker.drivers.firefox import FirefoxDriver, FirefoxVideoDriver
+from selenium_docker.meta import config
 from selenium_docker.utils import gen_uuid
 
 
@@ -63,3 +65,20 @@ def test_extensions(pack, factory):
     driver = cls(extensions=[path], factory=factory)
     driver.get('https://vivint.com')
     driver.quit()
+
+
+@pytest.mark.parametrize('cls', [ChromeVideoDriver, FirefoxVideoDriver])
+def test_video_recordings_dir(cls, factory):
+    folder = os.path.join('/tmp', gen_uuid(8))
+    mount = os.path.join(folder, 'mount')
+    os.makedirs(mount)
+    driver = cls(folder, recordings_dir=mount, factory=factory)
+    assert os.path.isdir(os.path.join(mount, driver.name))
+    assert driver.segment_retention == config.ffmpeg_segment_retention
+    driver.get('https://vivint.com')
+    path = driver.stop_recording(folder, shard_by_date=False)
+    assert os.path.getsize(path) > 0
+    driver.quit()
+    # the empty per-container directory is removed with the container
+    assert os.listdir(mount) == []
+    shutil.rmtree(folder)
@@ -76,3 +76,40 @@ def test_load_image():
 
     img = f.load_image('hello-world', 'latest')
     assert isinstance(img, Image)
+
+
+def test_factory_network():
+    f = ContainerFactory(None, 'vivint-net', make_default=False,
+                         use_network=True)
+    assert f.network is not None
+    assert f.network.name == f.gen_name('network')
+
+    c = f.start_container({
+        'image': 'selenium/standalone-chrome',
+        'ports': {'4444/tcp': None},
+        'publish_all_ports': True
+    }, detach=True)
+    host, port = f.ip_port(c, '4444/tcp')
+    assert port == 4444
+    assert host != '0.0.0.0'
+    # the network is removed with the last container
+    network_id = f.network.id
+    f.stop_all_containers()
+    assert f.network is None
+    assert not f.docker.networks.list(ids=[network_id])
+
+    # a second factory with the same namespace creates it again, the next
+    #  container of the first one adopts it
+    x = ContainerFactory(None, 'vivint-net', make_default=False,
+                         use_network=True)
+    assert x.network.name == f.gen_name('network')
+    c = f.start_container({'image': 'selenium/standalone-chrome'},
+                          detach=True)
+    assert f.network.id == x.network.id
+    c.reload()
+    assert x.network.name in c.attrs['NetworkSettings']['Networks']
+    f.stop_all_containers()
+    assert f.network is None
+    # already removed along with the containers
+    x.remove_network()
+    assert x.network is None
@@ -7,12 +7,18 @@ import os
 import shutil
 from datetime import datetime
 
+import gevent
 import pytest
+from gevent.queue import Empty
+from selenium.common.exceptions import WebDriverException
 
 from selenium_docker.pool import (
-    DriverPool, DriverPoolValueError, DriverPoolRuntimeException)
-from selenium_docker.drivers.chrome import ChromeVideoDriver
-from selenium_docker.drivers.firefox import FirefoxVideoDriver
+    DomainLimiter, DriverPool, DriverPoolValueError,
+    DriverPoolRuntimeException, DriverPoolTimeout, DriverQueue, PoolJob,
+    TaskResult, url_domain)
+from selenium_docker.drivers.chrome import ChromeDriver, ChromeVideoDriver
+from selenium_docker.drivers.firefox import FirefoxDriver, FirefoxVideoDriver
+from selenium_docker.proxy import SquidProxy
 from selenium_docker.utils import gen_uuid
 
 
@@ -20,6 +26,13 @@ class BogusDriver:
     """ No-op object class. """
 
 
+class StubDriver(object):
+    """ Stand-in for a driver instance in a DriverQueue. """
+
+    def __init__(self, browser):
+        self.BROWSER = browser
+
+
 def get_title(driver, url):
     driver.get(url)
     assert driver.title
@@ -81,6 +94,31 @@ def test_cleanup_browser(proxy, factory):
     assert pool.proxy is None
 
 
+def test_external_proxy(factory):
+    def work(driver, item):
+        return item
+    proxy = SquidProxy.shared('pool', factory=factory)
+    try:
+        for _ in range(2):
+            pool = DriverPool(2, use_proxy=proxy, factory=factory)
+            assert pool.proxy is proxy
+            assert list(pool.execute(work, [1, 2])) == [1, 2]
+            pool.close()
+            assert pool.proxy is proxy
+            proxy.container.reload()
+            assert proxy.container.status == 'running'
+        pool = DriverPool(2, factory=factory, keep_proxy=True)
+        list(pool.execute(work, [1]))
+        kept = pool.proxy
+        assert kept is not None
+        list(pool.execute(work, [2]))
+        assert pool.proxy is kept
+        pool.close()
+        assert pool.proxy is None
+    finally:
+        proxy.quit()
+
+
 def test_async_failures(factory):
     pool = DriverPool(2, factory=factory, use_proxy=False)
 
@@ -91,27 +129,73 @@ def test_async_failures(factory):
         pool.execute_async(int, callback=True)
 
     with pytest.raises(DriverPoolRuntimeException):
-        pool.execute_async(lambda s: s is True, items=[True, True])
-        pool.execute_async(lambda s: s is True, items=[True, True])
-    pool.stop_async()
-    assert not pool.is_processing
+        pool.add_async(True)
 
     with pytest.raises(DriverPoolValueError):
         pool.execute_async(lambda s: s is True)
         pool.add_async()
 
+    job = pool.execute_async(lambda a, b: b)
+    job.stop()
     with pytest.raises(DriverPoolRuntimeException):
-        pool.execute_async(lambda s: s is True)
-        pool.execute(int, [])
+        job.add(True)
 
     pool.quit()
 
 
-def test_async_to_sync_failure(factory):
+def test_async_and_sync_together(factory):
     pool = DriverPool(2, factory=factory, use_proxy=False)
-    pool.execute_async(lambda a, b: b is True, [True])
-    with pytest.raises(DriverPoolRuntimeException):
-        pool.execute(lambda a, b: b is False, [False])
+    first = pool.execute_async(lambda a, b: b is True, [True])
+    second = pool.execute_async(lambda a, b: b is True, [True, True])
+    assert first is not second
+    assert list(pool.execute(lambda a, b: b is False, [False],
+                             auto_clean=False)) == [True]
+    assert list(first.results()) == [True]
+    assert list(second.results()) == [True, True]
+    assert pool.is_processing
+    pool.stop_async()
+    assert not pool.is_processing
+
+
+def test_concurrent_execute(factory):
+    pool = DriverPool(2, factory=factory, use_proxy=False)
+
+    def work(driver, item):
+        gevent.sleep(0.1)
+        return item
+
+    def run(value):
+        return list(pool.execute(work, [value] * 4, auto_clean=False))
+
+    threads = [gevent.spawn(run, 'a'), gevent.spawn(run, 'b')]
+    gevent.joinall(threads)
+    assert threads[0].value == ['a'] * 4
+    assert threads[1].value == ['b'] * 4
+    assert not pool.jobs
+    pool.quit()
+
+
+def test_sync_exception(factory):
+    pool = DriverPool(2, factory=factory, use_proxy=False)
+
+    def work(driver, item):
+        raise KeyError(item)
+
+    with pytest.raises(KeyError):
+        pool.execute(work, [1, 2])
+    assert not pool.is_processing
+
+
+def test_quit_while_running(factory):
+    pool = DriverPool(1, factory=factory, use_proxy=False)
+    job = pool.execute_async(lambda driver, task: gevent.sleep(task), [3])
+    gevent.sleep(0.5)
+    assert job.running == 1
+    # the task outlives the stop timeout, the pool is cleaned up anyway
+    pool.quit()
+    assert not pool.is_processing
+    assert job.stopped
+    assert pool._drivers.empty()
 
 
 def test_async_execution(factory):
@@ -156,6 +240,35 @@ def test_pool_with_video_driver(driver, factory):
     shutil.rmtree(folder)
 
 
+def test_pool_record_tasks(factory):
+    folder = os.path.join('/tmp', gen_uuid(8))
+    os.makedirs(folder)
+    pool = DriverPool(2, ChromeVideoDriver, (folder,),
+                      {'segment_time': ChromeVideoDriver.SEGMENT_PER_TASK},
+                      use_proxy=False, factory=factory)
+
+    def check(driver, url):
+        if url is None:
+            raise WebDriverException('no url')
+        return get_title(driver, url)
+
+    job = pool.execute_async(check, ['https://google.com', None],
+                             record_tasks=True, discard_passed=True,
+                             recordings_path=folder)
+    results = list(job.results())
+    pool.stop_async()
+    assert len(results) == 2
+    for result in results:
+        assert isinstance(result, TaskResult)
+        assert result.recording.end >= result.recording.start
+        assert result.network is None
+        assert result.har is None
+    assert len(job.failed_recordings) == 1
+    for path in job.failed_recordings[0].files:
+        assert os.path.exists(path)
+    pool.quit()
+    shutil.rmtree(folder)
+
 def test_pool_iter(factory):
     pool = DriverPool(2, factory=factory, use_proxy=False)
 
@@ -198,3 +311,229 @@ def test_pool_repr(factory):
     assert 'DriverPool' in s
     assert 'size=2' in s
     assert 'async=False' in s
+
+
+def test_driver_queue_routing():
+    q = DriverQueue(maxsize=3)
+    chrome, firefox = StubDriver('Chrome'), StubDriver('Firefox')
+    q.put(chrome)
+    q.put(firefox)
+    assert q.qsize() == 2
+    assert q.available('firefox') == 1
+    assert q.available(FirefoxDriver) == 1
+    assert q.available('any') == 2
+    assert q.get(browser='firefox') is firefox
+    with pytest.raises(Empty):
+        q.get(block=False, browser=FirefoxDriver)
+    assert q.get(browser=None) is chrome
+    assert q.empty()
+
+
+def test_driver_queue_fifo_waiters():
+    q = DriverQueue(maxsize=2)
+    order = []
+
+    def wait(name, browser):
+        order.append((name, q.get(browser=browser).BROWSER))
+
+    threads = [gevent.spawn(wait, 'first', 'chrome'),
+               gevent.spawn(wait, 'second', None),
+               gevent.spawn(wait, 'third', None)]
+    gevent.sleep(0)
+    q.put(StubDriver('Firefox'))
+    q.put(StubDriver('Chrome'))
+    q.put(StubDriver('Chrome'))
+    gevent.joinall(threads)
+    assert order == [('second', 'Firefox'),
+                     ('first', 'Chrome'),
+                     ('third', 'Chrome')]
+
+    with pytest.raises(Empty):
+        q.get(timeout=0.01)
+    assert not q._waiters
+
+
+def test_heterogeneous_pool(factory):
+    pool = DriverPool(None, {ChromeDriver: 1, FirefoxDriver: 2},
+                      use_proxy=False, factory=factory)
+    assert pool.size == 3
+    assert sorted(pool.browsers) == ['Chrome', 'Firefox']
+
+    def browser(driver, task):
+        return task, driver.BROWSER.lower()
+
+    tasks = ['chrome', 'firefox', 'any', 'chrome', 'firefox', None]
+    results = list(pool.execute(browser, tasks, browser_key=lambda t: t))
+    assert len(results) == len(tasks)
+    for wanted, used in results:
+        assert wanted in (None, 'any', used)
+
+
+def test_unknown_browser(factory):
+    pool = DriverPool(2, factory=factory, use_proxy=False)
+    with pytest.raises(DriverPoolValueError):
+        pool.execute(lambda driver, task: task, ['chrome', 'safari'],
+                     browser_key=lambda task: task)
+    assert not pool.is_processing
+    job = pool.execute_async(lambda driver, task: task,
+                             browser_key=lambda task: task)
+    with pytest.raises(DriverPoolValueError):
+        job.add(FirefoxDriver)
+    pool.quit()
+
+
+def test_driver_queue_stats():
+    q = DriverQueue(maxsize=1)
+    driver = StubDriver('Chrome')
+    q.put(driver)
+    assert q.get() is driver
+    assert q.total == 1
+
+    # spawn_later is timed from the loop's cached clock, refresh it so the
+    #  put doesn't happen early by wall clock time
+    gevent.get_hub().loop.update_now()
+    gevent.spawn_later(0.05, q.put, driver)
+    assert q.get(timeout=1.0) is driver
+    with pytest.raises(Empty):
+        q.get(timeout=0.01)
+    stats = q.stats()
+    assert stats['checkouts'] == 2
+    assert stats['timeouts'] == 1
+    assert stats['leased'] == 1
+    assert stats['wait_max'] > 0.04
+    assert stats['wait_mean'] == stats['wait_total'] / 2
+
+    # a leased driver that can't be replaced leaves the pool
+    q.discard()
+    stats = q.stats()
+    assert stats['leased'] == 0
+    assert q.total == 0
+    assert q.maxsize == 0
+
+    waiter = gevent.spawn(q.get)
+    gevent.sleep(0)
+    q.close()
+    with pytest.raises(DriverPoolRuntimeException):
+        waiter.get()
+
+
+def test_domain_limiter():
+    limiter = DomainLimiter(rate=2, burst=2, concurrency=3,
+                            overrides={'slow.com': {'concurrency': 1}})
+    assert limiter.allows(None)
+    now = 1000.0
+    for _ in range(2):
+        assert limiter.allows('example.com', now)
+        limiter.acquire('example.com', now)
+    # the burst is spent, a token comes back every half second
+    assert not limiter.allows('example.com', now)
+    assert limiter.wait_time(now) == 0.5
+    assert limiter.wait_time(now) is None
+    assert limiter.allows('example.com', now + 0.5)
+    limiter.acquire('example.com', now + 0.5)
+    assert limiter.running('example.com') == 3
+    # concurrency holds tasks back even with tokens
+    assert not limiter.allows('example.com', now + 5)
+    limiter.release('example.com')
+    assert limiter.allows('example.com', now + 5)
+    limiter.acquire('slow.com', now)
+    assert not limiter.allows('slow.com', now + 5)
+    assert limiter.limits('slow.com') == (2, 2, 1)
+    assert url_domain('https://www.example.com/path') == 'example.com'
+
+
+def test_domain_limits_lookahead():
+    limiter = DomainLimiter(concurrency=1)
+    job = PoolJob(None, None, domain_key=True)
+    urls = ['http://a.com/%d' % i for i in range(PoolJob.LOOKAHEAD * 2)]
+    urls += ['http://b.com/%d' % i for i in range(3)]
+    for url in urls:
+        job._append(url)
+
+    def accept(task):
+        return limiter.allows(task[3])
+
+    taken = []
+    for _ in range(3):
+        task = job._take(accept)
+        if task is not None:
+            limiter.acquire(task[3])
+            taken.append(task[1])
+    # the dominant domain doesn't starve the tasks queued behind it
+    assert taken == ['http://a.com/0', 'http://b.com/0']
+
+
+def test_speculative_copy_fails_late():
+    job = PoolJob(None, None, preserve_order=True, speculate_after=0)
+    job._append('item')
+    task = job._take(lambda task: True)
+    copy = job._take(lambda task: True)
+    assert copy is task
+    assert job.speculated == 1
+    job._finish(task, 'done')
+    # the task already succeeded, the copy failing doesn't stop the job
+    job._fail(copy, ValueError('late copy'))
+    assert job.error is None
+    assert not job.stopped
+    assert job.running == 0
+    assert job._results.get(block=False) == 'done'
+
+
+def test_pool_domain_limits(factory):
+    pool = DriverPool(3, factory=factory, use_proxy=False,
+                      domain_limits={'concurrency': 1})
+    running, peak = {}, {}
+
+    def work(driver, task):
+        domain = task[0]
+        running[domain] = running.get(domain, 0) + 1
+        peak[domain] = max(peak.get(domain, 0), running[domain])
+        gevent.sleep(0.1)
+        running[domain] -= 1
+        return task
+
+    tasks = [('a', i) for i in range(4)] + [('b', i) for i in range(2)]
+    results = pool.execute(work, tasks, domain_key=lambda t: t[0])
+    assert sorted(results) == sorted(tasks)
+    assert peak == {'a': 1, 'b': 1}
+
+
+def test_pool_lease(factory):
+    pool = DriverPool(2, factory=factory, use_proxy=False)
+
+    with pool.lease(timeout=60) as driver:
+        driver.get('https://vivint.com')
+        assert pool._drivers.qsize() == 1
+
+    assert pool._drivers.qsize() == 2
+    first = pool.lease()
+    pending = pool.lease_async(browser='chrome')
+    second = pending.get(timeout=5)
+    with pytest.raises(DriverPoolTimeout):
+        pool.lease(timeout=0.1)
+    first.release()
+    second.release()
+    assert pool.lease_stats['timeouts'] == 1
+
+    with pytest.raises(ValueError):
+        with pool.lease() as driver:
+            raise ValueError(driver)
+    assert pool._drivers.qsize() == 2
+    pool.quit()
+
+
+def test_reorder_window(factory):
+    pool = DriverPool(3, factory=factory, use_proxy=False)
+    calls = {}
+
+    def work(driver, item):
+        calls[item] = calls.get(item, 0) + 1
+        if item == 2 and calls[item] == 1:
+            gevent.sleep(5.0)
+        return item
+
+    results = pool.execute(work, iter(range(10)), reorder_window=4,
+                           speculate_after=0.5, no_wait=True)
+    assert list(results) == list(range(10))
+    assert calls[2] == 2
+    assert not pool.is_processing
@@ -0,0 +1,94 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# >>
+#     vivint-selenium-docker, 2017
+# <<
+
+import pytest
+
+from selenium_docker.postprocess import (
+    Duration, FFmpegStage, PostProcessError, PostProcessor, Sprite, Stage,
+    Transcode, Trim, parse_timestamp)
+from selenium_docker.video import TaskRecording
+
+
+class FakeFFmpeg(FFmpegStage):
+    """ Prints ffmpeg style progress reports without running ffmpeg. """
+    name = 'fake'
+    suffix = '.out'
+
+    def __init__(self, code=0):
+        self.code = code
+
+    def command(self, source, output):
+        script = ('for t in 00:00:01.000000 00:00:02.500000; do '
+                  'echo out_time=$t; echo progress=continue; done; '
+                  'echo progress=end; echo oops >&2; exit %d' % self.code)
+        return ['sh', '-c', script]
+
+    def arguments(self, source, output):
+        return []
+
+
+@pytest.mark.parametrize('pack', [
+    ('00:00:01.500000', 1.5),
+    ('01:02:03', 3723.0),
+    ('N/A', None),
+])
+def test_parse_timestamp(pack):
+    value, expected = pack
+    assert parse_timestamp(value) == expected
+
+
+def test_stage_commands():
+    cmd = Transcode('debug').command('/v/a.mkv', '/v/a-debug.mp4')
+    assert cmd[0] == 'ffmpeg'
+    assert cmd[-1] == '/v/a-debug.mp4'
+    assert '640:-2' in ' '.join(cmd)
+    assert Transcode('debug').output('/v/a.mkv') == '/v/a-debug.mp4'
+
+    sprite = Sprite(interval=5, columns=4, rows=3, width=200)
+    assert 'fps=1/5,scale=200:-1,tile=4x3' in sprite.command('a', 'b')
+    assert sprite.output('/v/a.mkv') == '/v/a-sprite.jpg'
+
+    assert Duration().output('/v/a.mkv') is None
+    assert Duration().result(None, '12.5\n') == 12.5
+
+    recording = TaskRecording('d', 'a.mkv', 100.0, 110.0, 30.0, [], [],
+                              'job-1')
+    trim = Trim.task(recording, padding=2.0)
+    assert (trim.start, trim.end) == (28.0, 42.0)
+    assert trim.output('/v/a.mkv') == '/v/a-job-1.mkv'
+    assert Trim.task(recording._replace(offset=None)) is None
+
+    with pytest.raises(TypeError):
+        Stage()
+
+
+def test_postprocessor_trim_tasks():
+    post = PostProcessor([Duration()], trim_tasks=1.0)
+    post.run = lambda stage, source: stage
+    tasks = [TaskRecording('d', 'a.mkv', 100.0, 110.0, 30.0, [], [], 'job-1'),
+             TaskRecording('d', None, 110.0, 115.0, None, [], [], 'job-2')]
+    stages = post.submit('/v/a.mkv', tasks=tasks).get()
+    assert list(stages) == ['duration', 'job-1']
+    assert (stages['job-1'].start, stages['job-1'].end) == (29.0, 41.0)
+    # the default stages aren't changed
+    assert post.stages == [stages['duration']]
+    assert list(post.submit('/v/b.mkv').get()) == ['duration']
+
+
+def test_postprocessor():
+    events = []
+    post = PostProcessor([FakeFFmpeg()], size=2, progress=events.append)
+    jobs = [post.submit('/v/%d.mkv' % i) for i in range(3)]
+    assert post.join(timeout=10.0)
+    assert [j.get()['fake'] for j in jobs] == [
+        '/v/%d.out' % i for i in range(3)]
+    first = [e for e in events if e.source == '/v/0.mkv']
+    assert [e.position for e in first] == [1.0, 2.5, 2.5]
+    assert [e.finished for e in first] == [False, False, True]
+
+    with pytest.raises(PostProcessError) as e:
+        post.run(FakeFFmpeg(code=3), '/v/bad.mkv')
+    assert 'oops' in str(e.value)
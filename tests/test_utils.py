@@ -4,13 +4,17 @@
 #     vivint-selenium-docker, 2017
 # <<
 
+import io
+import os
 import random
+import tarfile
 
 import pytest
 from docker.errors import ImageNotFound
 
 from selenium_docker.base import ContainerFactory
 from selenium_docker.utils import *
+from selenium_docker.utils import _ChunkReader
 
 
 @pytest.mark.parametrize('i', range(100))
@@ -92,3 +96,77 @@ def test_load_docker_image(bg, factory):
 def test_parse_metadata(pack):
     meta, expected = pack
     assert expected == parse_metadata(meta)
+
+
+class FakeContainer(object):
+    """ Stand-in for a Container that counts calls to ``reload``. """
+
+    def __init__(self, attrs, reloaded=None):
+        self.attrs = attrs
+        self.reloaded = reloaded or attrs
+        self.reloads = 0
+
+    def reload(self):
+        self.reloads += 1
+        self.attrs = self.reloaded
+
+
+def test_ip_port_network():
+    attrs = {'NetworkSettings': {'Networks': {
+        'selenium-ns-network': {'IPAddress': '172.18.0.4'}}}}
+    c = FakeContainer(attrs)
+    host, port = ip_port(c, '4444/tcp', network='selenium-ns-network')
+    assert host == '172.18.0.4'
+    assert port == 4444
+    assert c.reloads == 0
+
+
+def test_ip_port_network_reload():
+    c = FakeContainer({}, {'NetworkSettings': {'Networks': {
+        'net': {'IPAddress': '172.18.0.5'}}}})
+    assert ip_port(c, '3128/tcp', network='net') == ('172.18.0.5', 3128)
+    assert c.reloads == 1
+
+
+def _make_tar(name, data):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode='w') as tar:
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+def test_chunk_reader():
+    data = os.urandom(10000)
+    reader = _ChunkReader(data[i:i + 3000] for i in range(0, len(data), 3000))
+    parts = [reader.read(512)]
+    parts.append(reader.read(5000))
+    assert [len(p) for p in parts] == [512, 5000]
+    parts.append(reader.read())
+    assert b''.join(parts) == data
+    assert reader.read(512) == b''
+
+
+@pytest.mark.parametrize('chunked', [True, False])
+def test_extract_archive(tmpdir, chunked):
+    data = os.urandom(100000)
+    raw = _make_tar('video.mkv', data)
+    if chunked:
+        stream = (raw[i:i + 4096] for i in range(0, len(raw), 4096))
+    else:
+        stream = io.BytesIO(raw)
+    dest = str(tmpdir.join('out.mkv'))
+    assert extract_archive(stream, dest, chunk_size=1024) == len(data)
+    with open(dest, 'rb') as f:
+        assert f.read() == data
+    assert not os.path.exists(dest + '.part')
+
+
+def test_extract_archive_empty(tmpdir):
+    buf = io.BytesIO()
+    tarfile.open(fileobj=buf, mode='w').close()
+    dest = str(tmpdir.join('out.mkv'))
+    with pytest.raises(IOError):
+        extract_archive([buf.getvalue()], dest)
+    assert not os.path.exists(dest)
@@ -0,0 +1,149 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+# >>
+#     vivint-selenium-docker, 2017
+# <<
+
+import os
+import re
+
+import gevent
+import pytest
+
+from selenium_docker.meta import config
+from selenium_docker.video import (
+    EncodingProfile, PROFILES, Segment, VideoExporter, get_profile,
+    parse_segment_list, render_ffserver_conf)
+
+
+class FakeVideoDriver(object):
+    """ Records the order of calls made by an exporter. """
+    active = 0
+    peak = 0
+
+    def __init__(self, name, fail=False):
+        self.name = name
+        self.save_path = '/videos'
+        self.fail = fail
+        self.closed = False
+
+    def stop_recording(self, path, shard_by_date=True):
+        cls = FakeVideoDriver
+        cls.active += 1
+        cls.peak = max(cls.peak, cls.active)
+        gevent.sleep(0.05)
+        cls.active -= 1
+        if self.fail:
+            raise IOError('broken stream')
+        return '%s/%s.mkv' % (path, self.name)
+
+    def close_container(self):
+        self.closed = True
+
+    recording_started = 1000.0
+
+    def task_marks(self, start=None, end=None):
+        marks = [('job-0', 990.0, 995.0), ('job-1', 1010.0, 1020.0)]
+        return [m for m in marks if start is None or m[2] >= start]
+
+
+def test_video_exporter():
+    exporter = VideoExporter(size=2)
+    drivers = [FakeVideoDriver('d%d' % i) for i in range(5)]
+    exports = [exporter.export(d) for d in drivers]
+    assert exporter.join(timeout=5.0)
+    assert FakeVideoDriver.peak == 2
+    assert [e.get() for e in exports] == [
+        '/videos/d%d.mkv' % i for i in range(5)]
+    assert all(d.closed for d in drivers)
+    assert exporter.pending == 0
+
+
+def test_video_exporter_tasks():
+    class FakePostProcessor(object):
+        trim_tasks = 1.0
+        submitted = []
+
+        def submit(self, source, stages=None, tasks=None):
+            self.submitted.append((source, tasks))
+
+    post = FakePostProcessor()
+    exporter = VideoExporter(postprocessor=post)
+    exporter.export(FakeVideoDriver('d0')).get()
+    [(source, tasks)] = post.submitted
+    assert source == '/videos/d0.mkv'
+    assert [(t.task, t.filename, t.offset) for t in tasks] == [
+        ('job-1', 'd0.mkv', 10.0)]
+
+
+def test_video_exporter_failure():
+    exporter = VideoExporter(size=1)
+    driver = FakeVideoDriver('bad', fail=True)
+    export = exporter.export(driver, path='/elsewhere')
+    with pytest.raises(IOError):
+        export.get()
+    # the container is removed even when the export fails
+    assert driver.closed
+
+
+def test_parse_segment_list():
+    text = '\n'.join([
+        'chrome-1-00000.mkv,0.000000,10.000000',
+        'chrome-1-00001.mkv,10.000000,20.000000',
+        'chrome-1-00002.mkv,20.000000,30.000000',
+        # wrapped, replaces the first segment
+        'chrome-1-00000.mkv,30.000000,40.000000',
+        'garbage',
+        ''])
+    segments = parse_segment_list(text, epoch=1000.0)
+    assert segments == [
+        Segment('chrome-1-00001.mkv', 1010.0, 1020.0),
+        Segment('chrome-1-00002.mkv', 1020.0, 1030.0),
+        Segment('chrome-1-00000.mkv', 1030.0, 1040.0)]
+
+
+@pytest.mark.parametrize('pack', [
+    ((None, None), True),
+    ((5.0, None), True),
+    ((None, 5.0), False),
+    ((15.0, 18.0), True),
+    ((20.5, 30.0), False),
+    ((0.0, 10.0), True),
+])
+def test_segment_overlaps(pack):
+    bounds, expected = pack
+    assert Segment('a.mkv', 10.0, 20.0).overlaps(*bounds) is expected
+
+
+@pytest.mark.parametrize('image', [
+    'standalone-chrome-ffmpeg', 'standalone-firefox-ffmpeg'])
+def test_render_ffserver_conf(image):
+    path = os.path.join(os.path.dirname(__file__), '..', 'dockerfiles',
+                        image, 'ffserver.conf-orig')
+    with open(path) as f:
+        template = f.read()
+    keys = set(re.findall(r'{([A-Z_]+)}', template))
+    assert keys
+    conf = render_ffserver_conf(template, **{k: 1 for k in keys})
+    assert not re.findall(r'{([A-Z_]+)}', conf)
+    assert 'HTTPPort             8090' in conf
+
+
+def test_encoding_profiles():
+    default = get_profile()
+    assert default is PROFILES[config.ffmpeg_profile]
+    assert get_profile('default').args == \
+        '-c:v libx264 -preset ultrafast -qp 18'
+    assert get_profile('default').framerate == config.ffmpeg_fps
+
+    debug = get_profile('debug')
+    assert debug.framerate == '5'
+    assert '-vf scale=640:-2' in debug.args
+    assert '-g 1' in get_profile('keyframe').args
+
+    custom = EncodingProfile('custom', codec='libvpx', preset=None, crf=10)
+    assert get_profile(custom) is custom
+    assert custom.args == '-c:v libvpx -crf 10'
+
+    with pytest.raises(ValueError):
+        get_profile('nope')